@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput and latency of client calls against the fake BFF.
+Results are printed and written as JSON to diff between versions.
+`--transport memory` skips sockets to measure the client overhead alone.
+Usage: bench_e2e.py [--requests N] [--concurrency N] [--transport tcp|memory]
+                    [--output FILE] [OP ...]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from statistics import mean
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_bff import FakeBFF  # noqa: E402 # pylint: disable=wrong-import-position
+
+from metis_client import (  # noqa: E402 # pylint: disable=wrong-import-position
+    MetisAPI,
+    MetisAPIAsync,
+    MetisNoAuth,
+    __version__,
+)
+
+Op = Callable[[], Awaitable[Any]]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    "Nearest rank percentile"
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(op: Op, requests: int, concurrency: int) -> Dict[str, float]:
+    "Run op `requests` times by `concurrency` workers"
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = perf_counter()
+            await op()
+            latencies.append(perf_counter() - started)
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    return {
+        "requests": requests,
+        "throughput": requests / elapsed,
+        "mean_ms": mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    "Run benchmarks"
+    bff = FakeBFF(args.latency, args.payload_size, args.items, args.calc_time)
+    content = "x" * args.payload_size
+    results: Dict[str, Any] = {}
+    async with TestServer(bff.create_app()) as server:
+        base_url = server.make_url("")
+        executor = ThreadPoolExecutor(args.concurrency)
+        sync_client = MetisAPI(base_url, auth=MetisNoAuth())
+        # the in-process transport serves the clients of its event loop only
+        memory = args.transport == "memory"
+        transport = bff.memory_transport() if memory else None
+        async with MetisAPIAsync(
+            base_url, auth=MetisNoAuth(), transport=transport
+        ) as client:
+            data_id = next(iter(bff.datasources))
+            loop = asyncio.get_running_loop()
+            ops: Dict[str, Op] = {
+                "create": lambda: client.v0.datasources.create(content),
+                "list": client.v0.datasources.list,
+                "get": lambda: client.v0.datasources.get(data_id),
+                "create_get_results": lambda: (
+                    client.v0.calculations.create_get_results(data_id)
+                ),
+                "sync_create": lambda: loop.run_in_executor(
+                    executor, sync_client.v0.datasources.create, content
+                ),
+                "sync_list": lambda: loop.run_in_executor(
+                    executor, sync_client.v0.datasources.list
+                ),
+            }
+            if memory:
+                ops = {k: v for k, v in ops.items() if not k.startswith("sync_")}
+            for name in args.ops or ops:
+                await ops[name]()  # warm up
+                results[name] = await measure(
+                    ops[name], args.requests, args.concurrency
+                )
+                print(
+                    f"{name:20} {results[name]['throughput']:9.1f} req/s "
+                    f"p50 {results[name]['p50_ms']:8.2f} ms "
+                    f"p99 {results[name]['p99_ms']:8.2f} ms"
+                )
+        executor.shutdown()
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "ops")},
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    "Parse command line"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("ops", nargs="*", help="operations, all by default")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--payload-size", type=int, default=1024)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--calc-time", type=float, default=0)
+    parser.add_argument("--transport", choices=["tcp", "memory"], default="tcp")
+    parser.add_argument("--output", default="bench_e2e.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    "Run benchmarks, write the report"
+    args = parse_args()
+    report = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
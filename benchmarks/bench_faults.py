@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of client calls against the fake BFF under faults.
+Every fault profile runs against a fresh server, failed or timed out calls
+are counted as errors. Results are printed and written as JSON.
+Usage: bench_faults.py [--requests N] [--concurrency N] [--op OP]
+                       [--timeout SECONDS] [--output FILE] [PROFILE ...]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_e2e import percentile  # noqa: E402 # pylint: disable=wrong-import-position
+from fake_bff import (  # noqa: E402 # pylint: disable=wrong-import-position
+    FakeBFF,
+    Faults,
+)
+
+from metis_client import (  # noqa: E402 # pylint: disable=wrong-import-position
+    MetisAPIAsync,
+    MetisNoAuth,
+    __version__,
+)
+from metis_client.exc import (  # noqa: E402 # pylint: disable=wrong-import-position
+    MetisException,
+)
+
+PROFILES: Dict[str, Faults] = {
+    "none": Faults(),
+    "jitter": Faults(jitter=0.05),
+    "errors": Faults(error_rate=0.05),
+    "unauthorized": Faults(unauthorized_rate=0.05),
+    # every 429 costs the client a 10 seconds pause
+    "rate_limit": Faults(rate_limit_rate=0.01),
+    "sse_drop": Faults(drop_rate=0.05),
+    "sse_truncate": Faults(truncate_rate=0.05),
+    "drip": Faults(drip_rate=256 * 1024),
+}
+
+
+async def measure(
+    op: Callable[[], Awaitable[Any]], requests: int, concurrency: int, timeout: float
+) -> Dict[str, float]:
+    "Run op `requests` times by `concurrency` workers, count failures"
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = perf_counter()
+            try:
+                await asyncio.wait_for(op(), timeout)
+            except (Exception, MetisException):  # pylint: disable=broad-except
+                errors += 1
+            latencies.append(perf_counter() - started)
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": (requests - errors) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_profile(args: argparse.Namespace, faults: Faults) -> Dict[str, float]:
+    "Run op against a fresh server with faults"
+    bff = FakeBFF(payload_size=args.payload_size, faults=faults)
+    content = "x" * args.payload_size
+    async with TestServer(bff.create_app()) as server:
+        async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+            data_id = next(iter(bff.datasources))
+            ops = {
+                "create": lambda: client.v0.datasources.create(content),
+                "get_content": lambda: client.v0.datasources.get_content(data_id),
+                "create_get_results": lambda: (
+                    client.v0.calculations.create_get_results(data_id)
+                ),
+            }
+            return await measure(
+                ops[args.op], args.requests, args.concurrency, args.timeout
+            )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    "Run benchmarks"
+    results: Dict[str, Any] = {}
+    for name in args.profiles or PROFILES:
+        results[name] = await run_profile(args, PROFILES[name])
+        print(
+            f"{name:14} {results[name]['throughput']:9.1f} req/s "
+            f"p50 {results[name]['p50_ms']:8.2f} ms "
+            f"p99 {results[name]['p99_ms']:8.2f} ms "
+            f"errors {results[name]['errors']}"
+        )
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": {
+            k: v for k, v in vars(args).items() if k not in ("output", "profiles")
+        },
+        "profiles": {k: asdict(PROFILES[k]) for k in results},
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    "Parse command line"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "profiles", nargs="*", help=f"{', '.join(PROFILES)}, all by default"
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--op",
+        choices=["create", "get_content", "create_get_results"],
+        default="create",
+    )
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--payload-size", type=int, default=1024)
+    parser.add_argument("--output", default="bench_faults.json")
+    args = parser.parse_args()
+    unknown = set(args.profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main() -> None:
+    "Run fault profiles, write the report"
+    args = parse_args()
+    report = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
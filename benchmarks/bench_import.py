@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Import time of the package and its clients by `python -X importtime`,
+the median of fresh interpreter runs without the interpreter startup imports.
+Exits with an error if a median exceeds its budget, leaving room
+for noisy machines, or the bare package import loads a forbidden module.
+Usage: bench_import.py [--runs N] [--budget-package MS] [--budget-async MS]
+                       [--budget-sync MS] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Set, Tuple
+
+from metis_client import __version__
+
+SCENARIOS = {
+    "package": "import metis_client",
+    "async": "from metis_client import MetisAPIAsync",
+    "sync": "from metis_client import MetisAPI",
+}
+# must not be loaded by the bare package import
+FORBIDDEN = ("aiohttp", "yarl", "camel_converter", "multidict")
+
+
+def import_times(code: str) -> List[Tuple[str, int]]:
+    "Top level imports of code with cumulative microseconds"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    result = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented
+        if not name.startswith("  ", 1):
+            result.append((name.strip(), int(cumulative)))
+    return result
+
+
+def modules(code: str) -> Set[str]:
+    "All modules loaded by code"
+    proc = subprocess.run(
+        [sys.executable, "-c", f"{code}; import sys; print(*sys.modules)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return set(proc.stdout.split())
+
+
+def measure(code: str, runs: int) -> Dict[str, Any]:
+    "Median import time of code in milliseconds"
+    startup = {name for name, _ in import_times("pass")}
+    totals = [
+        sum(us for name, us in import_times(code) if name not in startup) / 1000
+        for _ in range(runs)
+    ]
+    return {
+        "median_ms": median(totals),
+        "min_ms": min(totals),
+        "modules": len(modules(code) - modules("pass")),
+    }
+
+
+def main() -> int:
+    "Run benchmarks, check budgets"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    for name, budget in (("package", 40.0), ("async", 300.0), ("sync", 320.0)):
+        parser.add_argument(f"--budget-{name}", type=float, default=budget)
+    parser.add_argument("--output", default="bench_import.json")
+    args = parser.parse_args()
+
+    failed = False
+    results: Dict[str, Any] = {}
+    for name, code in SCENARIOS.items():
+        results[name] = measure(code, args.runs)
+        budget = getattr(args, f"budget_{name}")
+        over = results[name]["median_ms"] > budget
+        failed |= over
+        print(
+            f"{name:8} {results[name]['median_ms']:8.1f} ms "
+            f"(min {results[name]['min_ms']:6.1f}, budget {budget:6.1f}) "
+            f"{results[name]['modules']:4} modules{'  OVER BUDGET' if over else ''}"
+        )
+    loaded = sorted(
+        x for x in modules(SCENARIOS["package"]) if x.split(".")[0] in FORBIDDEN
+    )
+    if loaded:
+        failed = True
+        print(f"forbidden modules loaded by the package: {', '.join(loaded)}")
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": vars(args),
+        "results": results,
+        "forbidden": loaded,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Throughput of SSE reading and decoding of big single-line events.
+Usage: bench_sse.py [SIZE_MB ...], defaults to 1 10 100
+"""
+
+import asyncio
+import json
+import sys
+from time import perf_counter
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from yarl import URL
+
+from metis_client.client import MetisClient
+from metis_client.models import MetisMessageEvent, MetisNoAuth
+
+SIZES_MB = [int(x) for x in sys.argv[1:]] or [1, 10, 100]
+
+
+def make_body(size_mb: int) -> bytes:
+    "Make datasources event of about `size_mb` megabytes"
+    item = {"id": 1, "name": "x" * 1000, "createdAt": "2024-01-01T00:00:00"}
+    items = [item] * (size_mb * 2**20 // len(json.dumps(item)))
+    data = json.dumps({"reqId": "1", "data": items, "total": len(items)})
+    return f"event: datasources\ndata: {data}\n\n".encode()
+
+
+async def bench(size_mb: int) -> None:
+    "Read and decode a single event"
+    body = make_body(size_mb)
+
+    async def handler(_):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(_)
+        await resp.write(body)
+        await asyncio.sleep(3600)
+        return resp
+
+    app = web.Application()
+    app.router.add_get("/stream", handler)
+    async with TestServer(app) as server, ClientSession() as session:
+        client = MetisClient(session, URL(str(server.make_url("/"))), MetisNoAuth())
+        timings = {}
+
+        def on_message(evt: MetisMessageEvent):
+            timings["read"] = perf_counter() - started
+            evt.to_dto()
+            timings["decode"] = perf_counter() - started - timings["read"]
+            task.cancel()
+
+        started = perf_counter()
+        task = asyncio.create_task(client.sse(URL("/stream"), on_message))
+        await asyncio.gather(task, return_exceptions=True)
+
+    mbytes = len(body) / 2**20
+    print(
+        f"{mbytes:8.1f} MB  read {timings['read']:7.3f} s "
+        f"({mbytes / timings['read']:7.1f} MB/s)  decode {timings['decode']:7.3f} s"
+    )
+
+
+async def main():
+    "Run benchmarks of all sizes"
+    for size_mb in SIZES_MB:
+        await bench(size_mb)
+
+
+asyncio.run(main())
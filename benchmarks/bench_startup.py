@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Client startup cost: construction time, background tasks per client
+and construction with a call of `calculations.supported()` and close,
+as done by the sync client for every call.
+Usage: bench_startup.py [--clients N]
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from aiohttp import ClientSession, web
+
+from metis_client import MetisAPIAsync, MetisMemoryTransport, MetisNoAuth
+
+BASE_URL = "http://localhost/"
+
+
+async def run(clients: int) -> None:
+    "Measure startup"
+    transport = MetisMemoryTransport()
+
+    async def supported(_):
+        return web.json_response(["dummy"])
+
+    transport.add_route("GET", "/calculations/supported", supported)
+    async with ClientSession() as session:
+        tasks = len(asyncio.all_tasks())
+        started = perf_counter()
+        apis = [
+            MetisAPIAsync(
+                BASE_URL, session=session, auth=MetisNoAuth(), transport=transport
+            )
+            for _ in range(clients)
+        ]
+        elapsed = perf_counter() - started
+        tasks = len(asyncio.all_tasks()) - tasks
+        for api in apis:
+            await api.close()
+        print(f"construction      {elapsed / clients * 1e6:9.1f} us")
+        print(f"tasks per client  {tasks / clients:9.1f}")
+
+        started = perf_counter()
+        for _ in range(clients):
+            async with MetisAPIAsync(
+                BASE_URL, session=session, auth=MetisNoAuth(), transport=transport
+            ) as api:
+                await api.calculations.supported()
+        elapsed = perf_counter() - started
+        print(f"construct+call    {elapsed / clients * 1e6:9.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=2000)
+    asyncio.run(run(parser.parse_args().clients))
@@ -0,0 +1,178 @@
+"""
+Micro-benchmark harness: `bench` fixture measuring the best time per call
+and the peak traced memory, compared with stored baselines.
+
+Peak memory does not depend on the machine, only on the Python version,
+so its baseline is committed per Python version. Timings are stored
+apart and stay local, they are only comparable on the same machine.
+
+    pytest benchmarks --save-baseline   # on the reference revision
+    pytest benchmarks                   # fails on regressions
+"""
+
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict
+
+import pytest
+
+BASELINES = Path(__file__).parent / "baselines"
+PYTHON = f"{sys.version_info.major}.{sys.version_info.minor}"
+MEMORY_BASELINE = BASELINES / f"micro-memory-py{PYTHON}.json"
+TIME_BASELINE = BASELINES / "micro-time.json"
+RESULTS: Dict[str, Dict[str, float]] = {}
+MEMORY_KEYS = ("peak",)
+TIME_KEYS = ("time",)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    "Add micro-benchmark options"
+    group = parser.getgroup("micro-benchmarks")
+    group.addoption(
+        "--memory-baseline",
+        default=str(MEMORY_BASELINE),
+        help="memory baseline JSON file, committed",
+    )
+    group.addoption(
+        "--time-baseline",
+        default=str(TIME_BASELINE),
+        help="timing baseline JSON file, local to the machine",
+    )
+    group.addoption(
+        "--save-baseline", action="store_true", help="store results as baselines"
+    )
+    group.addoption(
+        "--max-time-regression",
+        type=float,
+        default=0.25,
+        help="allowed relative slowdown, 0.25 by default",
+    )
+    group.addoption(
+        "--max-memory-regression",
+        type=float,
+        default=0.1,
+        help="allowed relative growth of peak memory, 0.1 by default",
+    )
+    group.addoption("--rounds", type=int, default=5, help="timing rounds")
+
+
+def read_baseline(path: Path) -> Dict[str, Dict[str, float]]:
+    "Read baseline file, empty if missing"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_baseline(config: pytest.Config) -> Dict[str, Dict[str, float]]:
+    "Load memory and timing baselines merged by benchmark"
+    if config.getoption("--save-baseline"):
+        return {}
+    merged = read_baseline(Path(config.getoption("--memory-baseline")))
+    timings = read_baseline(Path(config.getoption("--time-baseline")))
+    for name, result in timings.items():
+        merged.setdefault(name, {}).update(result)
+    return merged
+
+
+def measure_time(func: Callable[[], Any], rounds: int) -> float:
+    "Best seconds per call, loops are calibrated to take at least 20 ms"
+    loops = 1
+    while True:
+        started = perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = perf_counter() - started
+        if elapsed >= 0.02:
+            break
+        loops *= 10
+    best = elapsed
+    for _ in range(rounds - 1):
+        started = perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, perf_counter() - started)
+    return best / loops
+
+
+def measure_memory(func: Callable[[], Any]) -> int:
+    "Peak bytes traced during a call"
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def check(result: Dict[str, float], baseline: Dict[str, float], config: pytest.Config):
+    "Fail on regression of any measure with a baseline"
+    limits = {
+        "time": config.getoption("--max-time-regression"),
+        "peak": config.getoption("--max-memory-regression"),
+    }
+    for key, limit in limits.items():
+        if key not in baseline:
+            continue
+        allowed = baseline[key] * (1 + limit)
+        message = f"{key} regressed: {result[key]:.7g}, baseline {baseline[key]:.7g}"
+        assert result[key] <= allowed, message
+
+
+@pytest.fixture
+def bench(request: pytest.FixtureRequest) -> Callable[[Callable[[], Any]], None]:
+    "Measure callable, fail on regression against the baselines"
+    config = request.config
+    baseline = load_baseline(config).get(request.node.name)
+
+    def run(func: Callable[[], Any]) -> None:
+        # timing runs warm up the caches before memory is traced,
+        # the least peak of the rounds leaves out lazy allocations of the runtime
+        rounds = config.getoption("--rounds")
+        result = {
+            "time": measure_time(func, rounds),
+            "peak": min(measure_memory(func) for _ in range(rounds)),
+        }
+        RESULTS[request.node.name] = result
+        if baseline:
+            check(result, baseline, config)
+
+    return run
+
+
+def save_baseline(path: Path, keys: Any) -> None:
+    "Update baseline file with the measures of the keys"
+    stored = read_baseline(path)
+    for name, result in RESULTS.items():
+        stored[name] = {key: result[key] for key in keys}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(stored, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    "Store baselines if asked"
+    config = session.config
+    if not config.getoption("--save-baseline") or not RESULTS:
+        return
+    save_baseline(Path(config.getoption("--memory-baseline")), MEMORY_KEYS)
+    save_baseline(Path(config.getoption("--time-baseline")), TIME_KEYS)
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config) -> None:
+    "Report results and changes against the baselines"
+    if not RESULTS:
+        return
+    baseline = load_baseline(config)
+    terminalreporter.section("micro-benchmarks")
+    for name, result in sorted(RESULTS.items()):
+        line = f"{name:48} {result['time'] * 1e6:12.1f} us {result['peak']:12} B"
+        for key in ("time", "peak"):
+            if key in baseline.get(name, {}):
+                change = result[key] / (baseline[name][key] or 1) - 1
+                line += f" {change:+7.1%}"
+        terminalreporter.write_line(line)
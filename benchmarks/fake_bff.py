@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Fake Metis BFF for benchmarks and local experiments.
+Implements the endpoints used by the client, events are sent over `/stream`
+and resent after `Last-Event-ID` on reconnect. Faults are injected
+at the rates of `--error-rate`, `--drop-rate` etc., see `Faults`.
+Usage: fake_bff.py [--port PORT] [--latency SECONDS] [--payload-size BYTES]
+                   [--FAULT RATE ...]
+"""
+
+import argparse
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass, fields
+from datetime import datetime
+from itertools import count
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from aiohttp import web
+
+from metis_client import MetisMemoryTransport
+from metis_client.dtos import DataSourceType
+from metis_client.helpers import metis_json_encoder
+
+USER = {
+    "id": 1,
+    "first_name": "Bench",
+    "last_name": "Mark",
+    "email": "bench@example.com",
+    "email_verified": True,
+    "role_label": "Admin",
+    "role_slug": "admin",
+    "permissions": {},
+    "provider": "local",
+}
+ENGINES = ["dummy"]
+HISTORY_SIZE = 10000
+
+
+@dataclass
+class Faults:
+    """
+    Faults injected by the fake BFF, rates are probabilities per request or event.
+    `jitter` is a random latency up to the given seconds, `error_rate` of 503,
+    `rate_limit_rate` of 429 and `unauthorized_rate` of 401 responses,
+    `drop_rate` of stream connections closed before an event,
+    `truncate_rate` of the ones closed in the middle of an event,
+    `drip_rate` bytes per second of slowly written bodies and events.
+    """
+
+    jitter: float = 0
+    error_rate: float = 0
+    rate_limit_rate: float = 0
+    unauthorized_rate: float = 0
+    drop_rate: float = 0
+    truncate_rate: float = 0
+    drip_rate: float = 0
+
+
+class FakeBFF:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    """
+    In-memory BFF state.
+    `latency` seconds are added to every request but the stream,
+    `payload_size` is the size of generated data source contents,
+    `items` data sources are preloaded, `calc_time` is a calculation duration,
+    `faults` are injected with the random generator of `seed`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        payload_size: int = 1024,
+        items: int = 10,
+        calc_time: float = 0,
+        faults: Optional[Faults] = None,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.payload_size = payload_size
+        self.calc_time = calc_time
+        self.faults = faults or Faults()
+        self.random = random.Random(seed)
+        self.ids = count(1)
+        self.event_ids = count(1)
+        self.history: Deque[Tuple[int, str]] = deque(maxlen=HISTORY_SIZE)
+        self.datasources: Dict[int, Dict[str, Any]] = {}
+        self.calculations: Dict[int, Dict[str, Any]] = {}
+        self.collections: Dict[int, Dict[str, Any]] = {}
+        self.streams: Set["asyncio.Queue[str]"] = set()
+        self.tasks: Set["asyncio.Task[None]"] = set()
+        for _ in range(items):
+            self.add_datasource("x" * payload_size)
+
+    def add_datasource(
+        self, content: str, ds_type: int = DataSourceType.STRUCTURE, parent: int = 0
+    ) -> Dict[str, Any]:
+        "Store a data source"
+        now = datetime.now()
+        ds_id = next(self.ids)
+        self.datasources[ds_id] = {
+            "id": ds_id,
+            "parents": [parent] if parent else [],
+            "children": [],
+            "user_id": USER["id"],
+            "user_first_name": USER["first_name"],
+            "user_last_name": USER["last_name"],
+            "user_email": USER["email"],
+            "name": f"data {ds_id}",
+            "content": content,
+            "type": int(ds_type),
+            "collections": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        return self.datasources[ds_id]
+
+    def publish(self, evt_type: str, data: Any, req_id: Optional[str] = None) -> None:
+        "Send event to all stream connections"
+        payload: Dict[str, Any] = {"data": data}
+        if isinstance(data, list):
+            payload.update(total=len(data), types=[])
+        if req_id:
+            payload["req_id"] = req_id
+        evt_id = next(self.event_ids)
+        msg = (
+            f"id: {evt_id}\nevent: {evt_type}\ndata: {metis_json_encoder(payload)}\n\n"
+        )
+        self.history.append((evt_id, msg))
+        for queue in self.streams:
+            queue.put_nowait(msg)
+
+    def respond(self, evt_type: str, data: Any) -> web.Response:
+        "Answer with request id, publish the result to the stream"
+        req_id = uuid4().hex
+        self.publish(evt_type, data, req_id)
+        return web.json_response({"reqId": req_id})
+
+    def later(self, delay: float, func, *args) -> None:
+        "Run function in background after delay"
+
+        async def run():
+            await asyncio.sleep(delay)
+            func(*args)
+
+        task = asyncio.create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    @web.middleware
+    async def latency_middleware(self, request: web.Request, handler):
+        "Add latency to requests but the stream"
+        if self.latency and request.path != "/stream":
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def chance(self, rate: float) -> bool:
+        "Roll the dice"
+        return bool(rate) and self.random.random() < rate
+
+    @web.middleware
+    async def fault_middleware(self, request: web.Request, handler):
+        "Add jitter and failures before handling, drip response bodies"
+        faults = self.faults
+        if faults.jitter:
+            await asyncio.sleep(self.random.uniform(0, faults.jitter))
+        if self.chance(faults.rate_limit_rate):
+            raise web.HTTPTooManyRequests()
+        if self.chance(faults.error_rate):
+            raise web.HTTPServiceUnavailable()
+        # 401 of the stream is fatal for the client, not a fault to recover from
+        if request.path != "/stream" and self.chance(faults.unauthorized_rate):
+            raise web.HTTPUnauthorized()
+        resp = await handler(request)
+        if not faults.drip_rate or not isinstance(resp, web.Response) or not resp.body:
+            return resp
+        dripped = web.StreamResponse(status=resp.status, headers=resp.headers)
+        await dripped.prepare(request)
+        await self.drip(dripped, resp.body)
+        await dripped.write_eof()
+        return dripped
+
+    async def drip(self, resp: web.StreamResponse, data: bytes) -> None:
+        "Write data at `drip_rate` bytes per second if set"
+        if not self.faults.drip_rate:
+            await resp.write(data)
+            return
+        # a tick per 10 ms
+        size = max(1, int(self.faults.drip_rate / 100))
+        for pos in range(0, len(data), size):
+            await resp.write(data[pos : pos + size])
+            await asyncio.sleep(0.01)
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        "SSE endpoint"
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        resp = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-store"}
+        )
+        await resp.prepare(request)
+        await resp.write(b": connected\n\n")
+        last_id = request.headers.get("Last-Event-ID", "")
+        if last_id.isdigit():
+            for evt_id, msg in self.history:
+                if evt_id > int(last_id):
+                    queue.put_nowait(msg)
+        self.streams.add(queue)
+        try:
+            while True:
+                data = (await queue.get()).encode()
+                if self.chance(self.faults.drop_rate):
+                    break
+                if self.chance(self.faults.truncate_rate):
+                    await resp.write(data[: len(data) // 2])
+                    break
+                await self.drip(resp, data)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.streams.discard(queue)
+        return resp
+
+    async def ping(self, _: web.Request) -> web.Response:
+        "Ping endpoint, answers with pong event"
+        self.publish("pong", None)
+        return web.Response()
+
+    async def login(self, _: web.Request) -> web.Response:
+        "Password authentication"
+        resp = web.json_response({})
+        resp.set_cookie("_sid", uuid4().hex)
+        return resp
+
+    async def whoami(self, _: web.Request) -> web.Response:
+        "Current user"
+        return web.Response(
+            text=metis_json_encoder(USER), content_type="application/json"
+        )
+
+    async def supported(self, _: web.Request) -> web.Response:
+        "Calculation engines"
+        return web.json_response(ENGINES)
+
+    async def create_datasource(self, request: web.Request) -> web.Response:
+        "Create data source"
+        payload = await request.json()
+        ds = self.add_datasource(payload.get("content") or "x" * self.payload_size)
+        return self.respond("datasources", [ds])
+
+    async def list_datasources(self, _: web.Request) -> web.Response:
+        "List data sources"
+        return self.respond("datasources", list(self.datasources.values()))
+
+    async def get_datasource(self, request: web.Request) -> web.Response:
+        "Get data source content"
+        ds = self.datasources.get(int(request.match_info["id"]))
+        if ds is None:
+            raise web.HTTPNotFound()
+        return web.json_response({"content": ds["content"]})
+
+    async def delete_datasource(self, request: web.Request) -> web.Response:
+        "Delete data source"
+        self.datasources.pop(int(request.match_info["id"]), None)
+        return self.respond("datasources", [])
+
+    def finish_calculation(self, calc: Dict[str, Any]) -> None:
+        "Replace calculation with its result"
+        self.calculations.pop(calc["id"], None)
+        result = self.add_datasource(
+            "x" * self.payload_size, DataSourceType.PROPERTY, calc["parent"]
+        )
+        self.publish("calculations", list(self.calculations.values()))
+        self.publish("datasources", [result])
+
+    async def create_calculation(self, request: web.Request) -> web.Response:
+        "Create calculation, finish it after `calc_time`"
+        payload = await request.json()
+        now = datetime.now()
+        calc_id = next(self.ids)
+        calc = self.calculations[calc_id] = {
+            "id": calc_id,
+            "name": f"calculation {calc_id}",
+            "user_id": USER["id"],
+            "progress": 0,
+            "parent": payload["dataId"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.later(self.calc_time, self.finish_calculation, calc)
+        return self.respond("calculations", [calc])
+
+    async def list_calculations(self, _: web.Request) -> web.Response:
+        "List calculations"
+        return self.respond("calculations", list(self.calculations.values()))
+
+    async def cancel_calculation(self, request: web.Request) -> web.Response:
+        "Cancel calculation"
+        self.calculations.pop(int(request.match_info["id"]), None)
+        return self.respond("calculations", list(self.calculations.values()))
+
+    async def put_collection(self, request: web.Request) -> web.Response:
+        "Create or edit collection"
+        payload = await request.json()
+        now = datetime.now()
+        coll_id = payload.get("id") or next(self.ids)
+        self.collections[coll_id] = {
+            "id": coll_id,
+            "title": payload["title"],
+            "type_id": payload["typeId"],
+            "description": payload.get("description", ""),
+            "visibility": payload.get("visibility", "private"),
+            "data_sources": payload.get("dataSources", []),
+            "users": payload.get("users", []),
+            "user_id": USER["id"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        return self.respond("collections", [self.collections[coll_id]])
+
+    async def list_collections(self, _: web.Request) -> web.Response:
+        "List collections"
+        return self.respond("collections", list(self.collections.values()))
+
+    async def delete_collection(self, request: web.Request) -> web.Response:
+        "Delete collection"
+        self.collections.pop(int(request.match_info["id"]), None)
+        return self.respond("collections", [])
+
+    def create_app(self) -> web.Application:
+        "Create web application"
+        app = web.Application(
+            middlewares=[self.latency_middleware, self.fault_middleware]
+        )
+        app.router.add_get("/stream", self.stream)
+        app.router.add_head("/v0", self.ping)
+        app.router.add_post("/v0/auth", self.login)
+        app.router.add_get("/v0/auth", self.whoami)
+        app.router.add_get("/calculations/supported", self.supported)
+        app.router.add_post("/v0/datasources", self.create_datasource)
+        app.router.add_get("/v0/datasources", self.list_datasources)
+        app.router.add_get("/v0/datasources/{id}", self.get_datasource)
+        app.router.add_delete("/v0/datasources/{id}", self.delete_datasource)
+        app.router.add_post("/v0/calculations", self.create_calculation)
+        app.router.add_get("/v0/calculations", self.list_calculations)
+        app.router.add_delete("/v0/calculations/{id}", self.cancel_calculation)
+        app.router.add_put("/v0/collections", self.put_collection)
+        app.router.add_get("/v0/collections", self.list_collections)
+        app.router.add_delete("/v0/collections/{id}", self.delete_collection)
+        return app
+
+    def memory_transport(self) -> MetisMemoryTransport:
+        "In-process transport to this BFF, no sockets, no latency"
+        transport = MetisMemoryTransport(self.streams)
+        for route in self.create_app().router.routes():
+            if route.resource is not None and route.resource.canonical != "/stream":
+                transport.add_route(
+                    route.method, route.resource.canonical, route.handler
+                )
+        return transport
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    "Parse command line"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--payload-size", type=int, default=1024)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--calc-time", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    for field in fields(Faults):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=float, default=0)
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    "Serve the fake BFF"
+    args = parse_args()
+    faults = Faults(**{x.name: getattr(args, x.name) for x in fields(Faults)})
+    bff = FakeBFF(
+        args.latency, args.payload_size, args.items, args.calc_time, faults, args.seed
+    )
+    web.run_app(bff.create_app(), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
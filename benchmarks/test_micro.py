@@ -0,0 +1,135 @@
+"Micro-benchmarks of JSON, timestamp and key conversion helpers"
+
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pytest
+
+from metis_client.helpers import (
+    convert_dict_values_from_dt,
+    convert_dict_values_to_dt,
+    metis_json_decoder,
+    metis_json_encoder,
+    parse_rfc3339,
+)
+from metis_client.models import MetisMessageEvent
+
+SIZES = [1, 100, 1000]
+STARTED = datetime(2024, 1, 1, 12, 0, 0, 123456)
+
+
+def datasource(idx: int) -> Dict[str, Any]:
+    "Data source as sent by the BFF"
+    return {
+        "id": idx,
+        "parents": [idx - 1] if idx else [],
+        "children": [idx + 1],
+        "user_id": 1,
+        "user_first_name": "Bench",
+        "user_last_name": "Mark",
+        "user_email": "bench@example.com",
+        "name": f"data {idx}",
+        "content": "x" * 256,
+        "type": 1,
+        "collections": [],
+        "created_at": STARTED + timedelta(seconds=idx),
+        "updated_at": STARTED + timedelta(seconds=idx),
+    }
+
+
+def calculation(idx: int) -> Dict[str, Any]:
+    "Calculation as sent by the BFF"
+    return {
+        "id": idx,
+        "name": f"calculation {idx}",
+        "user_id": 1,
+        "progress": idx % 100,
+        "parent": idx,
+        "created_at": STARTED + timedelta(seconds=idx),
+        "updated_at": STARTED + timedelta(seconds=idx),
+    }
+
+
+def collection(idx: int) -> Dict[str, Any]:
+    "Collection as sent by the BFF"
+    return {
+        "id": idx,
+        "title": f"collection {idx}",
+        "type_id": 1,
+        "description": "",
+        "visibility": "private",
+        "data_sources": list(range(10)),
+        "users": [1],
+        "user_id": 1,
+        "created_at": STARTED + timedelta(seconds=idx),
+        "updated_at": STARTED + timedelta(seconds=idx),
+    }
+
+
+FACTORIES = {
+    "datasources": datasource,
+    "calculations": calculation,
+    "collections": collection,
+}
+
+
+def make_payload(kind: str, size: int) -> Dict[str, Any]:
+    "Listing event payload of `size` entities of the kind"
+    items: List[Dict[str, Any]] = [FACTORIES[kind](x) for x in range(size)]
+    return {"req_id": "1", "data": items, "total": size, "types": []}
+
+
+params = pytest.mark.parametrize(
+    "kind, size", [(kind, size) for kind in FACTORIES for size in SIZES]
+)
+
+
+@params
+def test_json_decoder(bench, kind: str, size: int):
+    "Decode listing JSON"
+    text = metis_json_encoder(make_payload(kind, size))
+    bench(lambda: metis_json_decoder(text))
+
+
+@params
+def test_json_encoder(bench, kind: str, size: int):
+    "Encode listing JSON"
+    payload = make_payload(kind, size)
+    bench(lambda: metis_json_encoder(payload))
+
+
+@params
+def test_event_to_dto(bench, kind: str, size: int):
+    "Decode raw stream event"
+    data = metis_json_encoder(make_payload(kind, size)).encode()
+    msg = MetisMessageEvent(kind, "", data, "", "")
+    bench(msg.to_dto)
+
+
+@params
+def test_convert_to_dt(bench, kind: str, size: int):
+    "Convert timestamps of listing to datetimes"
+    payload = json.loads(metis_json_encoder(make_payload(kind, size)))
+    bench(lambda: convert_dict_values_to_dt(payload))
+
+
+@params
+def test_convert_from_dt(bench, kind: str, size: int):
+    "Convert datetimes of listing to timestamps"
+    payload = make_payload(kind, size)
+    bench(lambda: convert_dict_values_from_dt(payload))
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2024-01-01T12:00:00.123456",
+        "2024-01-01T12:00:00Z",
+        "2024-01-01 12:00:00.123+0000",
+        "not a date",
+    ],
+)
+def test_parse_rfc3339(bench, value: str):
+    "Parse timestamp"
+    bench(lambda: parse_rfc3339(value))
@@ -1,7 +1,60 @@
 """Metis API client"""
 
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
 from .const import PROJECT_VERSION as __version__
-from .dtos import MetisErrorDTO
-from .metis import MetisAPI
-from .metis_async import MetisAPIAsync
-from .models import MetisLocalUserAuth, MetisNoAuth, MetisTokenAuth
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .dtos import MetisErrorDTO
+    from .metis import MetisAPI
+    from .metis_async import MetisAPIAsync
+    from .models import (
+        MetisFileCredentialsStore,
+        MetisLocalUserAuth,
+        MetisLoopWatchdog,
+        MetisMemoryCredentialsStore,
+        MetisMemoryTransport,
+        MetisMetrics,
+        MetisNoAuth,
+        MetisNoopTracer,
+        MetisOpenTelemetryTracer,
+        MetisRecorder,
+        MetisRecordingTracer,
+        MetisReplayTransport,
+        MetisTokenAuth,
+    )
+
+# clients pull in `aiohttp`, imported on first use
+# to keep `import metis_client` cheap for short-lived processes
+_LAZY = {
+    "MetisErrorDTO": ".dtos",
+    "MetisAPI": ".metis",
+    "MetisAPIAsync": ".metis_async",
+    "MetisFileCredentialsStore": ".models",
+    "MetisLocalUserAuth": ".models",
+    "MetisLoopWatchdog": ".models",
+    "MetisMemoryCredentialsStore": ".models",
+    "MetisMemoryTransport": ".models",
+    "MetisMetrics": ".models",
+    "MetisNoAuth": ".models",
+    "MetisNoopTracer": ".models",
+    "MetisOpenTelemetryTracer": ".models",
+    "MetisRecorder": ".models",
+    "MetisRecordingTracer": ".models",
+    "MetisReplayTransport": ".models",
+    "MetisTokenAuth": ".models",
+}
+
+__all__ = ["__version__", *_LAZY]
+
+
+def __getattr__(name: str) -> Any:
+    "Import public names on first use"
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_LAZY[name], __name__), name)
+
+
+def __dir__() -> List[str]:
+    return __all__
@@ -1,45 +1,87 @@
 """Low level http and SSE client"""
 
 import json
-from asyncio import CancelledError
+import re
+from asyncio import CancelledError, Task
 from asyncio import TimeoutError as AsyncioTimeoutError
-from asyncio import sleep
+from asyncio import create_task, sleep
 from concurrent.futures import TimeoutError as FuturesTimeoutError
-from datetime import timedelta
-from typing import Any, Optional, Union
+from http import HTTPStatus
+from inspect import isawaitable, iscoroutinefunction
+from time import monotonic
+from typing import TYPE_CHECKING, Any, AsyncIterable, Optional, Tuple, Union
 
 import aiohttp
-from aiohttp import ClientResponse, ClientTimeout, RequestInfo
+from aiohttp import ClientResponse, RequestInfo
 from aiohttp.client import _RequestContextManager
 from aiohttp.client_exceptions import (
     ClientConnectionError,
     ClientPayloadError,
     ClientResponseError,
 )
-from aiohttp.web_exceptions import (
-    HTTPInternalServerError,
-    HTTPTooManyRequests,
-    HTTPUnauthorized,
-)
-from aiohttp_sse_client import client as sse_client
+from aiohttp.hdrs import ACCEPT, CACHE_CONTROL, CONTENT_TYPE, LAST_EVENT_ID
 from yarl import URL
 
-from .compat import Callable, Dict, Mapping, NotRequired, TypedDict, Unpack
-from .const import HttpMethods
+from .compat import (
+    Awaitable,
+    Callable,
+    Dict,
+    Mapping,
+    NotRequired,
+    TypedDict,
+    Unpack,
+)
+from .const import DEFAULT_STREAM_MAX_RETRIES, HttpMethods
 from .exc import MetisConnectionException, MetisException
 from .helpers import http_to_metis_error_map, metis_json_decoder, metis_json_encoder
-from .models import BaseAuthenticator, MetisBase, MetisNoAuth
+from .models import (
+    BaseAuthenticator,
+    BaseTracer,
+    BaseTransport,
+    MetisAiohttpTransport,
+    MetisBase,
+    MetisEventStreamParser,
+    MetisLoopWatchdog,
+    MetisMessageEvent,
+    MetisMetrics,
+    MetisNoAuth,
+    MetisNoopMetrics,
+    MetisNoopTracer,
+    MetisNoopWatchdog,
+    MetisSpan,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .models import MetisRecorder
+
+SSE_CONTENT_TYPE = "text/event-stream"
+# first stream reconnect delay in seconds, grows on failures
+SSE_BACKOFF = 0.1
+# numeric path segments are ids, not endpoints
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
 
 
 class ClientRequestKwargs(TypedDict):
     "MetisClient.create kwargs"
+
     json: NotRequired[Any]
-    data: NotRequired[Union[str, bytes]]
+    data: NotRequired[Union[str, bytes, Callable[[], AsyncIterable[bytes]]]]
     headers: NotRequired[Mapping[str, Any]]
     method: NotRequired[HttpMethods]
     params: NotRequired[Dict[str, Any]]
     timeout: NotRequired[float]
     auth_required: NotRequired[bool]
+    stream: NotRequired[bool]
+
+
+class MetisClientKwargs(TypedDict):
+    "MetisClient instrumentation and transport options"
+
+    tracer: NotRequired[Optional[BaseTracer]]
+    metrics: NotRequired[Optional[MetisMetrics]]
+    watchdog: NotRequired[Optional[MetisLoopWatchdog]]
+    recorder: NotRequired[Optional["MetisRecorder"]]
+    transport: NotRequired[Optional[BaseTransport]]
 
 
 class MetisClient(MetisBase):
@@ -49,13 +91,20 @@ class MetisClient(MetisBase):
     """
 
     _auth: BaseAuthenticator
+    _auth_refresh_task: Optional[Task] = None
     _base_url: URL
+    tracer: BaseTracer
+    metrics: MetisMetrics
+    watchdog: MetisLoopWatchdog
+    recorder: Optional["MetisRecorder"]
+    transport: BaseTransport
 
     def __init__(
         self,
         session: aiohttp.ClientSession,
         base_url: URL,
         auth: Optional[BaseAuthenticator] = None,
+        **opts: Unpack[MetisClientKwargs],
     ) -> None:
         """
         Initialize the Metis API client.
@@ -63,8 +112,21 @@ class MetisClient(MetisBase):
         `session`: The aiohttp client session to use for making requests.
         `base_url`: Root URL in form of `yarl.URL`.
         `auth`: Authenticator, subclass of `BaseAuthenticator`.
+        **Keyword arguments:**
+        `tracer`: Tracer, subclass of `BaseTracer`, no tracing by default.
+        `metrics`: Metrics registry, no metrics by default.
+        `watchdog`: Event loop blocking detector, disabled by default.
+        `recorder`: Recorder of responses and stream events, none by default.
+        `transport`: Transport of requests and streams, `session` by default.
         """
         self._session = session
+        self.tracer = opts.get("tracer") or MetisNoopTracer()
+        self.metrics = opts.get("metrics") or MetisNoopMetrics()
+        self.watchdog = opts.get("watchdog") or MetisNoopWatchdog()
+        self.recorder = opts.get("recorder")
+        self.transport = opts.get("transport") or MetisAiohttpTransport(session)
+        if self.watchdog.metrics is None and self.metrics.enabled:
+            self.watchdog.metrics = self.metrics
         if self._session.json_serialize is not metis_json_encoder:
             self._session._json_serialize = metis_json_encoder
         self._auth = auth or MetisNoAuth()
@@ -81,9 +143,39 @@ class MetisClient(MetisBase):
         return (self._base_url / url.path).with_query(url.query)
 
     async def _do_auth(self, force: bool = False) -> None:
+        # lock-free fast path, refresh credentials in background before expiry
+        if not force and self._auth.is_valid(self._session):
+            if self._auth.needs_refresh(self._session) and (
+                self._auth_refresh_task is None or self._auth_refresh_task.done()
+            ):
+                self._auth_refresh_task = create_task(
+                    self._refresh_auth(), name="AuthRefreshTask"
+                )
+            return
+
         async with self._auth.lock:
             if force or await self._auth.should_update(self._session, self._base_url):
-                await self._auth.authenticate(self._session, self._base_url)
+                await self._authenticate("expired")
+
+    async def _authenticate(self, reason: str) -> None:
+        self.metrics.inc("metis_auth_refreshes_total", reason=reason)
+        await self._auth.authenticate(self._session, self._base_url)
+
+    async def _reauth(self, generation: int) -> None:
+        # single flight: only the first waiter of a generation re-authenticates,
+        # the rest wait for the lock and reuse its credentials
+        async with self._auth.lock:
+            if self._auth.generation(self._session) == generation:
+                self._auth.invalidate(self._session)
+                await self._authenticate("unauthorized")
+
+    async def _refresh_auth(self) -> None:
+        try:
+            async with self._auth.lock:
+                if self._auth.needs_refresh(self._session):
+                    await self._authenticate("refresh")
+        except (Exception, MetisException) as exc:  # pylint: disable=broad-except
+            self.logger.warning("Authentication refresh failed: %s", exc)
 
     @staticmethod
     def _raise_for_status(
@@ -97,6 +189,49 @@ class MetisClient(MetisBase):
             req_info, message=msg, status=status, history=()
         )
 
+    async def _send(
+        self, method: str, url: URL, aio_opts: Dict[str, Any], stream: bool = False
+    ) -> ClientResponse:
+        # body factories produce a fresh stream for every attempt
+        if callable(aio_opts.get("data")):
+            aio_opts = {**aio_opts, "data": aio_opts["data"]()}
+        if self.recorder is not None and not stream:
+            started = self.recorder.now()
+            result = await self._measure(method, url, aio_opts)
+            self.recorder.record_response(
+                started,
+                method,
+                url,
+                result.status,
+                result.content_type,
+                await result.read(),
+            )
+            return result
+        return await self._measure(method, url, aio_opts)
+
+    async def _measure(
+        self, method: str, url: URL, aio_opts: Dict[str, Any]
+    ) -> ClientResponse:
+        if not self.metrics.enabled:
+            return await self.transport.request(method, url, **aio_opts)
+        endpoint = _ID_SEGMENT.sub("/{id}", url.path)
+        status = "error"
+        started = monotonic()
+        try:
+            result = await self.transport.request(method, url, **aio_opts)
+            status = str(result.status)
+            return result
+        finally:
+            self.metrics.observe(
+                "metis_request_duration_seconds",
+                monotonic() - started,
+                method=method,
+                endpoint=endpoint,
+            )
+            self.metrics.inc(
+                "metis_requests_total", method=method, endpoint=endpoint, status=status
+            )
+
     async def _request(
         self, url: URL, **opts: Unpack[ClientRequestKwargs]
     ) -> ClientResponse:
@@ -113,44 +248,66 @@ class MetisClient(MetisBase):
         }
         aio_opts["raise_for_status"] = False
 
-        # preauthenticate
-        if auth_required:
-            await self._do_auth()
+        with self.tracer.span(
+            "metis.http", {"http.method": method, "http.url": str(url)}
+        ) as span:
+            # preauthenticate
+            if auth_required:
+                await self._do_auth()
 
-        try:
-            result = await self._session.request(method, url, **aio_opts)
-
-            # redo if failed because of auth
-            if result.status == HTTPUnauthorized.status_code:
-                # forced auth for first request
-                # normal auth (only if needed) for all other
-                await self._do_auth(force=not self._auth.lock.locked())
-                result.close()
-                result = await self._session.request(method, url, **aio_opts)
-            # rate limit - redo all
-            if result.status == HTTPTooManyRequests.status_code:
-                await sleep(10)
-                result.close()
-                return await self._request(url, **opts)
-
-        except ClientConnectionError as exc:
-            raise MetisConnectionException(
-                f"Request exception for {str(url)!r} with - {exc}"
-            ) from exc
+            try:
+                generation = self._auth.generation(self._session)
+                stream = opts.get("stream", False)
+                result = await self._send(method, url, aio_opts, stream)
 
-        except (TimeoutError, AsyncioTimeoutError, FuturesTimeoutError):
-            raise MetisConnectionException(
-                f"Timeout of {opts.get('timeout')} reached while waiting for {str(url)}"
-            ) from None
+                # redo once the credentials of a newer generation land
+                if result.status == HTTPStatus.UNAUTHORIZED:
+                    result.close()
+                    span.set_attribute("metis.reauth", True)
+                    self.metrics.inc("metis_retries_total", reason="unauthorized")
+                    await self._reauth(generation)
+                    result = await self._send(method, url, aio_opts, stream)
+                # rate limit - redo all
+                if result.status == HTTPStatus.TOO_MANY_REQUESTS:
+                    self.metrics.inc("metis_retries_total", reason="rate_limit")
+                    await sleep(10)
+                    result.close()
+                    return await self._request(url, **opts)
 
-        except BaseException as exc:  # pragma: no cover  # noqa: B036
-            raise MetisException(
-                f"Unexpected exception for {str(url)!r} with - {exc}"
-            ) from exc
+            except ClientConnectionError as exc:
+                raise MetisConnectionException(
+                    f"Request exception for {str(url)!r} with - {exc}"
+                ) from exc
+
+            except (TimeoutError, AsyncioTimeoutError, FuturesTimeoutError):
+                raise MetisConnectionException(
+                    f"Timeout of {opts.get('timeout')} reached "
+                    f"while waiting for {str(url)}"
+                ) from None
 
+            except BaseException as exc:  # pragma: no cover  # noqa: B036
+                raise MetisException(
+                    f"Unexpected exception for {str(url)!r} with - {exc}"
+                ) from exc
+
+            span.set_attribute("http.status_code", result.status)
+
+            # leave successful response body unread for streaming
+            if opts.get("stream", False) and result.status < 400:
+                return result
+
+            msg = await self._read_message(result, url, span)
+            self._raise_for_status(result.status, result.request_info, msg)
+
+            return result
+
+    @staticmethod
+    async def _read_message(
+        result: ClientResponse, url: URL, span: MetisSpan
+    ) -> Optional[str]:
+        "Read response body, get the error message of the response if any"
         msg = None
         try:
-            body = None
             if result.content_type.startswith("application/json"):
                 body = await result.json(
                     encoding="utf-8",
@@ -159,6 +316,8 @@ class MetisClient(MetisBase):
                 )
                 if isinstance(body, dict) and body.get("error", None):
                     msg = str(body.get("error"))
+                if isinstance(body, dict) and body.get("req_id"):
+                    span.set_attribute("metis.req_id", str(body["req_id"]))
             elif result.content_type.startswith("text/"):
                 msg = await result.text("utf-8")
             else:
@@ -171,10 +330,7 @@ class MetisClient(MetisBase):
             raise MetisException(
                 f"Could not handle response data from {str(url)!r} with - {exc}"
             ) from exc
-
-        self._raise_for_status(result.status, result.request_info, msg)
-
-        return result
+        return msg
 
     # pylint: disable=too-many-arguments
     def request(
@@ -190,7 +346,7 @@ class MetisClient(MetisBase):
         -  `url` (Required): The API endpoint to call.
         **Optional arguments**:
         - `data`: The data to include in the request body. Can be a dictionary,
-           a string, or None.
+           a string, a factory of async iterable of bytes chunks, or None.
         - `headers`: The headers to include in the request. Can be a dictionary or None.
         - `method`: The HTTP method to use for the request. Defaults to GET.
         - `params`: The query parameters to include in the request.
@@ -198,83 +354,161 @@ class MetisClient(MetisBase):
         - `timeout`: The maximum amount of time to wait for the request to complete,
           in seconds. Can be an integer or None.
         - `auth_required`: Flag that auth requered for this request
+        - `stream`: Do not read the body of successful response
         Returns:
         A `aiohttp.client._RequestContextManager` object representing the API response
         """
         return _RequestContextManager(self._request(url, **opts))
 
+    async def _dispatch(
+        self,
+        evt: MetisMessageEvent,
+        on_message: Callable[[MetisMessageEvent], Union[None, Awaitable[None]]],
+    ) -> None:
+        if self.recorder is not None:
+            self.recorder.record_event(evt)
+        if iscoroutinefunction(on_message):
+            # awaited outside of the measure, as waiting for the stream
+            # consumers is not blocking, the callback times its synchronous work
+            await on_message(evt)
+            return
+        # a synchronous callback is measured, an awaitable it returns is not
+        with self.watchdog.measure("callback", evt.event_type):
+            result = on_message(evt)
+        if isawaitable(result):
+            await result
+
+    async def _sse_connect(
+        self,
+        url: URL,
+        parser: MetisEventStreamParser,
+        on_message: Callable[[MetisMessageEvent], Union[None, Awaitable[None]]],
+        on_open: Callable[[float], None],
+        opts: Tuple[Optional[Dict[str, Any]], Optional[float]],
+    ) -> None:
+        "Connect to the stream with params and timeout, dispatch events till its end"
+        started = monotonic()
+        headers: Dict[str, str] = {ACCEPT: SSE_CONTENT_TYPE, CACHE_CONTROL: "no-cache"}
+        if parser.last_event_id:
+            headers[LAST_EVENT_ID] = parser.last_event_id
+        async with self.transport.sse(url, opts[0], headers, opts[1]) as resp:
+            if resp.content_type != SSE_CONTENT_TYPE:
+                raise MetisConnectionException(
+                    f"Connection error for {str(url)!r} with - "
+                    f"wrong Content-Type: {resp.headers.get(CONTENT_TYPE)}"
+                )
+            parser.reset(str(resp.real_url.origin()))
+            on_open(monotonic() - started)
+            async for chunk in resp.content.iter_any():
+                for evt in parser.feed(chunk):
+                    await self._dispatch(evt, on_message)
+
     async def sse(
         self,
         url: URL,
-        on_message: Callable[[sse_client.MessageEvent], None],
+        on_message: Callable[[MetisMessageEvent], Union[None, Awaitable[None]]],
         on_open: Optional[Callable[[], None]] = None,
         params: Optional[Dict[str, Any]] = None,
         timeout: Optional[float] = None,
+        max_retries: Optional[int] = DEFAULT_STREAM_MAX_RETRIES,
+        last_event_id: str = "",
     ) -> None:
         """
-        Creates `aiohttp_sse_client.client.EventSource` object with sensible defaults.
+        Listens to `text/event-stream` endpoint, reconnects on end of stream.
+        Timeouts, connection errors, 429 and 5xx responses are retried
+        with backoff, `MetisConnectionException` is raised after
+        `max_retries` consecutive failures.
+        Event data is passed to `on_message` as raw bytes.
         **Arguments**:
         - `url` (Required): The API endpoint to connect.
-        - `on_message`: Message callback
+        - `on_message`: Message callback, sync or async.
+           Sync callbacks are timed by the watchdog, async ones time themselves
         **Optional arguments**:
         - `on_open`: Callback when connected
         - `params`: The query parameters to include in the request.
            Can be a dictionary or None.
         - `timeout`: Stream timeout, None for infinity
+        - `max_retries`: Reconnect budget, None for infinity
+        - `last_event_id`: Event id to resume the stream from
         Returns: None
         """
         url = self._url_rel_to_abs(url)
-        original_backoff = 0.1
-        backoff = original_backoff
+        backoff = SSE_BACKOFF
+        parser = MetisEventStreamParser()
+        parser.last_event_id = last_event_id
+        failures = 0
+        error: BaseException
+        span: MetisSpan
+
+        def opened(connect_time: float) -> None:
+            nonlocal backoff, failures
+            span.set_attribute("metis.connect_time", connect_time)
+            if on_open:
+                on_open()
+            backoff = SSE_BACKOFF
+            failures = 0
 
-        es_timeout = ClientTimeout(total=timeout, sock_connect=600, sock_read=None)
         while True:
             try:
-                if backoff > original_backoff:
+                if backoff > SSE_BACKOFF:
                     await sleep(backoff)
-                await self._do_auth()
-                async with sse_client.EventSource(
-                    str(url),
-                    reconnection_time=timedelta(seconds=original_backoff),
-                    max_connect_retry=0,
-                    on_open=on_open,
-                    session=self._session,
-                    params=params,
-                    timeout=es_timeout,
-                    read_bufsize=2**19,
-                    raise_for_status=True,
-                ) as evt_src:
-                    backoff = original_backoff
-                    async for evt in evt_src:
-                        on_message(evt)
+                with self.tracer.span(
+                    "metis.sse",
+                    {
+                        "http.url": str(url),
+                        "metis.retry": failures,
+                        "metis.last_event_id": parser.last_event_id,
+                    },
+                ) as span:
+                    await self._do_auth()
+                    await self._sse_connect(
+                        url, parser, on_message, opened, (params, timeout)
+                    )
+                # end of stream - reconnect
+                self.metrics.inc("metis_stream_reconnects_total", reason="end")
+                await sleep(parser.retry or SSE_BACKOFF)
+                continue
 
-            except (TimeoutError, AsyncioTimeoutError, FuturesTimeoutError):
+            except (TimeoutError, AsyncioTimeoutError, FuturesTimeoutError) as exc:
                 backoff *= 1.5
                 self.logger.warning(
                     "%s endpoint timeouted - reconnecting", self._base_url
                 )
-                continue
+                error = exc
 
             except CancelledError:
                 # task is cancelled - abort
                 break
 
-            except (ClientConnectionError, ConnectionError) as exc:
-                raise MetisConnectionException(
-                    f"Connection error for {str(url)!r} with - {exc}"
-                ) from exc
+            except (ClientConnectionError, ClientPayloadError, ConnectionError) as exc:
+                backoff *= 2
+                self.logger.warning(
+                    "%s connection error %s - reconnecting in %s seconds",
+                    url,
+                    exc,
+                    backoff,
+                )
+                error = exc
 
-            except ClientResponseError as err:
-                if err.status and (
-                    err.status == HTTPTooManyRequests.status_code
-                    or err.status >= HTTPInternalServerError.status_code
+            except ClientResponseError as exc:
+                if not exc.status or (
+                    exc.status != HTTPStatus.TOO_MANY_REQUESTS
+                    and exc.status < HTTPStatus.INTERNAL_SERVER_ERROR
                 ):
-                    backoff *= 2
-                    self.logger.warning(
-                        "%s connection error %s - reconnecting in %s seconds",
-                        url,
-                        err,
-                        backoff,
-                    )
-                    continue
-                self._raise_for_status(err.status, err.request_info, err.message)
+                    self._raise_for_status(exc.status, exc.request_info, exc.message)
+                backoff *= 2
+                self.logger.warning(
+                    "%s connection error %s - reconnecting in %s seconds",
+                    url,
+                    exc,
+                    backoff,
+                )
+                error = exc
+
+            failures += 1
+            if max_retries is not None and failures > max_retries:
+                raise MetisConnectionException(
+                    f"Connection error for {str(url)!r} with - {error}, "
+                    f"gave up after {max_retries} retries"
+                ) from error
+            self.metrics.inc("metis_stream_reconnects_total", reason="error")
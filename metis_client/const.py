@@ -26,3 +26,33 @@ HttpMethods = Union[
     Literal["PUT"],
     Literal["TRACE"],
 ]
+
+# Default limit of raw events waiting for decoding in a stream
+DEFAULT_STREAM_BUFFER_SIZE = 1024
+
+# Default size of event data to decode in an executor, if any
+DEFAULT_STREAM_DECODE_THRESHOLD = 2**20
+
+# Default seconds of stream silence before a forced reconnect
+DEFAULT_STREAM_STALL_TIMEOUT = 60
+
+# Default number of consecutive stream reconnect failures before giving up
+DEFAULT_STREAM_MAX_RETRIES = 5
+
+# Default polling fallback intervals and duration of a poll in seconds
+DEFAULT_STREAM_POLL_INTERVAL = 1
+DEFAULT_STREAM_POLL_MAX_INTERVAL = 30
+DEFAULT_STREAM_POLL_DURATION = 5
+
+# Default limits of the stream hub history of events of expected requests
+DEFAULT_HUB_HISTORY_SIZE = 64
+DEFAULT_HUB_HISTORY_TTL = 60
+DEFAULT_HUB_HISTORY_MAX_BYTES = 2**24
+
+# Default upper bounds of latency histogram buckets in seconds
+DEFAULT_METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Default seconds a synchronous stage or the event loop lag may take
+# before it is reported as blocking, and the loop lag probe interval
+DEFAULT_SLOW_OPERATION_THRESHOLD = 0.1
+DEFAULT_LOOP_LAG_INTERVAL = 0.5
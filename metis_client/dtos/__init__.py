@@ -1,6 +1,6 @@
 """All data transfer objects"""
 
-from .auth import MetisAuthCredentialsRequestDTO
+from .auth import MetisAuthCredentialsRequestDTO, MetisStoredCredentialsDTO
 from .base import MetisTimestampsDTO
 from .calculation import MetisCalculationDTO
 from .collection import (
@@ -26,4 +26,5 @@ from .event import (
     MetisPongEventDTO,
 )
 from .resp import MetisRequestIdDTO
+from .stream import MetisStreamHealthDTO, MetisStreamTransport
 from .user import MetisUserDTO
@@ -1,9 +1,17 @@
 """Authentication DTOs"""
 
-from ..compat import TypedDict
+from typing import Optional
+
+from ..compat import Dict, TypedDict
 
 
 class MetisAuthCredentialsRequestDTO(TypedDict):
     "Authentication request payload"
     email: str
     password: str
+
+
+class MetisStoredCredentialsDTO(TypedDict):
+    "Persisted session credentials"
+    cookies: Dict[str, str]
+    expires_at: Optional[float]
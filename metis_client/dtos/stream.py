@@ -0,0 +1,20 @@
+"""Stream DTOs"""
+
+from typing import Literal, Optional, Union
+
+from ..compat import TypedDict
+
+MetisStreamTransport = Union[Literal["sse"], Literal["polling"]]
+
+
+class MetisStreamHealthDTO(TypedDict):
+    "Stream health DTO"
+
+    transport: MetisStreamTransport
+    connected: bool
+    last_event_age: Optional[float]
+    reconnects: int
+    stalls: int
+    buffered: int
+    reader_lag: float
+    decoder_lag: float
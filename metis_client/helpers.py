@@ -3,22 +3,28 @@
 import json
 import re
 import sys
+import zlib
+from codecs import getincrementaldecoder
 from contextlib import suppress
 from copy import deepcopy
 from datetime import datetime
 from functools import wraps
-from typing import Any, Optional, Type, TypeVar
-
-from aiohttp.web_exceptions import (
-    HTTPBadRequest,
-    HTTPForbidden,
-    HTTPMisdirectedRequest,
-    HTTPNotFound,
-    HTTPPaymentRequired,
-    HTTPUnauthorized,
+from http import HTTPStatus
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterator,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
 )
-from camel_converter import dict_to_camel, dict_to_snake
 
+from camel_converter import dict_to_camel, dict_to_snake, to_snake
+
+from .compat import Mapping
 from .dtos import (
     MetisErrorDTO,
     MetisErrorEventDataDTO,
@@ -123,6 +129,60 @@ def metis_json_decoder(obj, *args, **kwargs):
     return payload
 
 
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+_json_decoder = json.JSONDecoder()
+
+
+def _metis_json_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return convert_dict_values_to_dt(dict_to_snake(value))
+    if isinstance(value, str):
+        return parse_rfc3339(value) or value
+    if isinstance(value, list):
+        return [_metis_json_value(x) if isinstance(x, dict) else x for x in value]
+    return value
+
+
+def _json_expect(text: str, pos: int, chars: str) -> Tuple[str, int]:
+    "Skip whitespace and one of `chars`, return the char and the next position"
+    pos = _JSON_WS.match(text, pos).end()  # type: ignore[union-attr]
+    char = text[pos : pos + 1]
+    if not char or char not in chars:
+        raise json.JSONDecodeError(f"Expecting one of {chars!r}", text, pos)
+    return char, _JSON_WS.match(text, pos + 1).end()  # type: ignore[union-attr]
+
+
+def metis_json_iter_items(
+    doc: Union[str, bytes], key: str = "data"
+) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Decode JSON object field by field, converting them as `metis_json_decoder`.
+    Yields `(name, value)` pairs, items of the `key` array are yielded
+    one by one as `(None, item)` pairs, so the whole list is never built.
+    """
+    text = doc.decode() if isinstance(doc, bytes) else doc
+    char, pos = _json_expect(text, 0, "{")
+    if text[pos : pos + 1] == "}":
+        return
+    while char != "}":
+        name, pos = _json_decoder.raw_decode(text, pos)
+        if not isinstance(name, str):
+            raise json.JSONDecodeError("Expecting property name", text, pos)
+        _, pos = _json_expect(text, pos, ":")
+        if name == key and text[pos : pos + 1] == "[":
+            char, pos = _json_expect(text, pos, "[")
+            if text[pos : pos + 1] == "]":
+                char, pos = _json_expect(text, pos, "]")
+            while char != "]":
+                item, pos = _json_decoder.raw_decode(text, pos)
+                yield None, _metis_json_value(item)
+                char, pos = _json_expect(text, pos, ",]")
+        else:
+            value, pos = _json_decoder.raw_decode(text, pos)
+            yield to_snake(name), _metis_json_value(value)
+        char, pos = _json_expect(text, pos, ",}")
+
+
 def metis_json_encoder(obj, *args, **kwargs):
     "Json encoder but with conversion to camel case"
     payload = obj
@@ -131,6 +191,86 @@ def metis_json_encoder(obj, *args, **kwargs):
     return json.dumps(payload, *args, **kwargs)
 
 
+async def metis_json_stream_encoder(
+    key: str, chunks: AsyncIterable[Union[str, bytes]], fields: Mapping[str, Any]
+) -> AsyncIterator[bytes]:
+    """
+    Json encoder of an object with string value of `key` assembled from chunks
+    and other `fields` converted to camel case.
+    Byte chunks are decoded as UTF-8, only one chunk is kept in memory.
+    """
+    tail = metis_json_encoder(dict(fields))[1:]
+    yield f'{{{json.dumps(key)}: "'.encode()
+    decoder = getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        if text:
+            yield json.dumps(text, ensure_ascii=False)[1:-1].encode()
+    decoder.decode(b"", final=True)  # raise on truncated UTF-8 sequence
+    yield ('"}' if tail == "}" else f'", {tail}').encode()
+
+
+_JSON_STREAM_HEAD = re.compile(r'\s*\{\s*"((?:[^"\\]|\\.)*)"\s*:\s*(\S)')
+# complete string content: unescaped runs and escape sequences
+_JSON_STRING_PART = re.compile(r'(?:[^"\\]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+_JSON_HIGH_SURROGATE = re.compile(r"(?<!\\)(?:\\\\)*\\u[dD][89abAB][0-9a-fA-F]{2}$")
+
+
+async def metis_json_stream_decoder(
+    key: str, chunks: AsyncIterable[bytes]
+) -> AsyncIterator[str]:
+    """
+    Json decoder of the string value of `key` as unescaped text chunks,
+    the counterpart of `metis_json_stream_encoder`. When `key` is
+    the first field, only one chunk is kept in memory, otherwise
+    the whole object is decoded, raising on MetisErrorDTO.
+    """
+    decoder = getincrementaldecoder("utf-8")()
+    pending = ""
+    streaming = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if not streaming:
+            head = _JSON_STREAM_HEAD.match(pending)
+            if head is None or head.group(1) != key or head.group(2) != '"':
+                continue
+            streaming = True
+            pending = pending[head.end() :]
+        end = _JSON_STRING_PART.match(pending).end()  # type: ignore[union-attr]
+        if pending[end : end + 1] == '"':
+            if end:
+                yield json.loads('"' + pending[:end] + '"')
+            return
+        # keep an escape sequence or a surrogate pair split by the chunk
+        if _JSON_HIGH_SURROGATE.search(pending, 0, end):
+            end -= 6
+        if len(pending) - end > 12:
+            raise json.JSONDecodeError("Invalid escape", pending, end)
+        if end:
+            yield json.loads('"' + pending[:end] + '"')
+            pending = pending[end:]
+    pending += decoder.decode(b"", final=True)
+    if streaming:
+        raise json.JSONDecodeError("Unterminated string", pending, len(pending))
+    payload = metis_json_decoder(pending)
+    if is_metis_error_dto(payload):
+        metis_error_to_raise(payload)
+    value = payload.get(key) if isinstance(payload, dict) else None
+    if not isinstance(value, str):
+        raise MetisPayloadException(status=None, message=f"No {key} in the payload")
+    yield value
+
+
+async def gzip_stream_encoder(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    "Compress chunks with gzip"
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
 def is_metis_error_error_dto(something) -> TypeGuard[MetisErrorMessageDTO]:
     "MetisErrorMessageDTO type guard"
     return (
@@ -177,15 +317,15 @@ def is_metis_errors_evt_dto(something) -> TypeGuard[MetisErrorEventDTO]:
 def http_to_metis_error_map(status: int) -> Type[MetisError]:
     "Map HTTP exception to MetisError"
     err = MetisError
-    if status in (HTTPForbidden.status_code, HTTPUnauthorized.status_code):
+    if status in (HTTPStatus.FORBIDDEN, HTTPStatus.UNAUTHORIZED):
         err = MetisAuthenticationException
-    if status == HTTPNotFound.status_code:
+    if status == HTTPStatus.NOT_FOUND:
         err = MetisNotFoundException
-    if status == HTTPBadRequest.status_code:
+    if status == HTTPStatus.BAD_REQUEST:
         err = MetisPayloadException
-    if status == HTTPPaymentRequired.status_code:
+    if status == HTTPStatus.PAYMENT_REQUIRED:
         err = MetisQuotaException
-    if status == HTTPMisdirectedRequest.status_code:
+    if status == HTTPStatus.MISDIRECTED_REQUEST:
         err = MetisError
     return err
 
@@ -214,17 +354,21 @@ def raise_on_metis_error(func):
     return wrapped
 
 
+def raise_on_metis_errors_evt(evt: Any) -> None:
+    "Raise on the last MetisErrorDTO in MetisEventDTO, if any"
+    if is_metis_errors_evt_dto(evt):
+        errors = evt.get("data", {}).get("data", [])
+        if errors:
+            metis_error_to_raise(errors[-1])
+
+
 def raise_on_metis_error_in_event(func):
     "Raise on MetisErrorDTO in MetisEventDTO"
 
     @wraps(func)
     async def wrapped(*args, **kwargs):
         result = await func(*args, **kwargs)
-        if is_metis_errors_evt_dto(result):
-            errors = result.get("data", {}).get("data", [])
-            if errors:
-                metis_error_to_raise(errors[-1])
-
+        raise_on_metis_errors_evt(result)
         return result
 
     return wrapped
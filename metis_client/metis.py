@@ -3,6 +3,7 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial, wraps
+from os import PathLike
 from typing import Any, Literal, Optional, Sequence, TypeVar, Union, cast
 from warnings import warn
 
@@ -145,6 +146,19 @@ class MetisV0DatasourcesNamespaceSync(MetisNamespaceSyncBase):
         "Create data source and wait for the result"
         return await client.v0.datasources.create(content, fmt, name)
 
+    @to_sync_with_metis_client
+    async def create_from_file(
+        self,
+        client: MetisAPIAsync,
+        path: Union[str, "PathLike[str]"],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+        timeout: TimeoutType = None,
+    ):
+        "Create data source from the file and wait for the result"
+        return await client.v0.datasources.create_from_file(path, fmt, name, compress)
+
     @to_sync_with_metis_client
     async def delete(
         self, client: MetisAPIAsync, data_id: int, timeout: TimeoutType = None
@@ -185,6 +199,17 @@ class MetisV0DatasourcesNamespaceSync(MetisNamespaceSyncBase):
         "Get data source by id"
         return await client.v0.datasources.get_content(data_id)
 
+    @to_sync_with_metis_client
+    async def download_content(
+        self,
+        client: MetisAPIAsync,
+        data_id: int,
+        path: Union[str, "PathLike[str]"],
+        timeout: TimeoutType = None,
+    ) -> int:
+        "Download data source content by id to the file"
+        return await client.v0.datasources.download_content(data_id, path)
+
 
 class MetisV0CalculationsNamespaceSync(MetisNamespaceSyncBase):
     """Calculations endpoints namespace"""
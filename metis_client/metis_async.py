@@ -1,7 +1,7 @@
 """Main Metis API async client"""
 
 from types import TracebackType
-from typing import Literal, Optional, Type, Union
+from typing import TYPE_CHECKING, Literal, Optional, Type, Union
 
 import aiohttp
 from aiohttp import ClientSession, ClientTimeout, TraceConfig
@@ -12,20 +12,36 @@ from yarl import URL
 from .client import MetisClient
 from .compat import List, NotRequired, TypedDict, Unpack
 from .const import DEFAULT_USER_AGENT
-from .models import BaseAuthenticator, MetisBase
+from .models import (
+    BaseAuthenticator,
+    BaseTracer,
+    BaseTransport,
+    MetisBase,
+    MetisLoopWatchdog,
+    MetisMetrics,
+)
 from .namespaces.calculations import MetisCalculationsNamespace
 from .namespaces.root import MetisRootNamespace
 from .namespaces.stream import MetisStreamNamespace
 from .namespaces.v0 import MetisV0Namespace
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .models import MetisRecorder
+
 
 class MetisAPIKwargs(TypedDict):
     "MetisAPI init kwargs"
+
     auth: BaseAuthenticator
     headers: NotRequired[LooseHeaders]
     timeout: NotRequired[Union[float, Literal[False], None]]
     client_name: NotRequired[str]
     trace_configs: NotRequired[List[TraceConfig]]
+    tracer: NotRequired[BaseTracer]
+    metrics: NotRequired[MetisMetrics]
+    watchdog: NotRequired[MetisLoopWatchdog]
+    recorder: NotRequired["MetisRecorder"]
+    transport: NotRequired[BaseTransport]
 
 
 class MetisAPIAsync(MetisBase):
@@ -62,6 +78,26 @@ class MetisAPIAsync(MetisBase):
         `client_name` (Optional)
         Optional string for user agent.
         Used if `session` is omitted.
+
+        `tracer` (Optional)
+        Tracer of requests, stream connections and events, e.g.
+        `MetisOpenTelemetryTracer`. No tracing by default.
+
+        `metrics` (Optional)
+        `MetisMetrics` registry of requests, retries and stream health.
+        No metrics by default.
+
+        `watchdog` (Optional)
+        `MetisLoopWatchdog` reporting slow decoding, predicates, callbacks
+        and event loop lag. Disabled by default.
+
+        `recorder` (Optional)
+        `MetisRecorder` capturing responses and stream events to be replayed
+        by `MetisReplayTransport`. Not recording by default.
+
+        `transport` (Optional)
+        Transport of requests and event streams, e.g. in-process
+        `MetisMemoryTransport` or `MetisReplayTransport`. `session` by default.
         """
         headers = opts.get("headers")
         if session is None:
@@ -82,7 +118,16 @@ class MetisAPIAsync(MetisBase):
         base_url = URL(base_url)
         if not base_url.is_absolute():
             raise TypeError("Base URL should be absolute")
-        client = MetisClient(session, base_url, opts["auth"])
+        client = MetisClient(
+            session,
+            base_url,
+            opts["auth"],
+            tracer=opts.get("tracer"),
+            metrics=opts.get("metrics"),
+            watchdog=opts.get("watchdog"),
+            recorder=opts.get("recorder"),
+            transport=opts.get("transport"),
+        )
         self._ns_root = MetisRootNamespace(client, base_url)
 
     @property
@@ -116,6 +161,6 @@ class MetisAPIAsync(MetisBase):
 
     async def close(self) -> None:
         "Close stream and http session"
-        self.stream.close()
+        self._ns_root.close()
         if self._session and self._close_session:
             await self._session.close()
@@ -1,7 +1,53 @@
 """Models"""
 
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from .auth import BaseAuthenticator, MetisLocalUserAuth, MetisNoAuth, MetisTokenAuth
 from .base import MetisBase
-from .event import MetisMessageEvent
+from .credentials import (
+    BaseCredentialsStore,
+    MetisFileCredentialsStore,
+    MetisMemoryCredentialsStore,
+)
+from .event import MetisEventStreamParser, MetisMessageEvent
 from .hub import MetisHub
-from .subscription import MetisSubscription, act_and_get_result_from_stream
+from .metrics import MetisMetrics, MetisNoopMetrics
+from .subscription import (
+    MetisOverflowPolicy,
+    MetisQueuePolicy,
+    MetisSubscription,
+    act_and_get_result_from_stream,
+    act_and_iter_items_from_stream,
+)
+from .tracer import (
+    BaseTracer,
+    MetisNoopTracer,
+    MetisOpenTelemetryTracer,
+    MetisRecordedSpan,
+    MetisRecordingTracer,
+    MetisSpan,
+)
+from .transport import BaseTransport, MetisAiohttpTransport
+from .watchdog import MetisLoopWatchdog, MetisNoopWatchdog
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .memory import MetisMemoryRequest, MetisMemoryResponse, MetisMemoryTransport
+    from .recording import MetisRecorder, MetisReplayTransport, load_recording
+
+# testing tools, the in-process transport pulls in `aiohttp.web`
+_LAZY = {
+    "MetisMemoryRequest": ".memory",
+    "MetisMemoryResponse": ".memory",
+    "MetisMemoryTransport": ".memory",
+    "MetisRecorder": ".recording",
+    "MetisReplayTransport": ".recording",
+    "load_recording": ".recording",
+}
+
+
+def __getattr__(name: str) -> Any:
+    "Import testing tools on first use"
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_LAZY[name], __name__), name)
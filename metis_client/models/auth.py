@@ -1,24 +1,50 @@
 """Authenticators"""
 
 from abc import abstractmethod
-from asyncio import Lock, sleep
+from asyncio import Lock, get_running_loop, sleep
+from contextlib import suppress
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from http.cookies import Morsel
+from math import inf
+from time import time
+from typing import Any, Callable, Optional, TypeVar
+from weakref import WeakKeyDictionary
 
 from aiohttp import ClientSession
-from aiohttp.hdrs import METH_POST
-from aiohttp.web_exceptions import HTTPTooManyRequests
+from aiohttp.hdrs import AUTHORIZATION, METH_POST
 from yarl import URL
 
 from ..dtos import MetisAuthCredentialsRequestDTO
 from .base import MetisBase
+from .credentials import BaseCredentialsStore
+
+_T = TypeVar("_T")
 
 
 class BaseAuthenticator(MetisBase):
-    """Base authentication class"""
+    """
+    Base authentication class.
+
+    Besides the lock-protected `authenticate()` and `should_update()` pair,
+    authenticators keep a per-session expiry timestamp, so the hot path
+    can check validity with `is_valid()` without taking the lock,
+    and a generation counter bumped on every credentials change.
+    An optional `store` lets authenticators persist session credentials
+    and reuse them in other clients and processes.
+    """
 
     lock: Lock
+    refresh_margin: float = 60
+    store: Optional[BaseCredentialsStore]
+    _expires_at: "WeakKeyDictionary[ClientSession, float]"
+    _generation: "WeakKeyDictionary[ClientSession, int]"
 
-    def __init__(self):
+    def __init__(self, store: Optional[BaseCredentialsStore] = None):
         self.lock = Lock()
+        self.store = store
+        self._expires_at = WeakKeyDictionary()
+        self._generation = WeakKeyDictionary()
 
     @abstractmethod
     async def authenticate(self, session: ClientSession, base_url: URL) -> bool:
@@ -28,6 +54,28 @@ class BaseAuthenticator(MetisBase):
     async def should_update(self, session: ClientSession, base_url: URL) -> bool:
         "Check if authentication needed"
 
+    def is_valid(self, session: ClientSession) -> bool:
+        "Check without locking if session credentials are not expired"
+        return time() < self._expires_at.get(session, 0)
+
+    def needs_refresh(self, session: ClientSession) -> bool:
+        "Check without locking if session credentials are about to expire"
+        return time() >= self._expires_at.get(session, 0) - self.refresh_margin
+
+    def generation(self, session: ClientSession) -> int:
+        "Get session credentials generation"
+        return self._generation.get(session, 0)
+
+    def set_valid(self, session: ClientSession, expires_at: float = inf) -> None:
+        "Mark session credentials valid until `expires_at` timestamp"
+        self._expires_at[session] = expires_at
+        self._generation[session] = self.generation(session) + 1
+
+    def invalidate(self, session: ClientSession) -> None:
+        "Mark session credentials invalid"
+        self._expires_at.pop(session, None)
+        self._generation[session] = self.generation(session) + 1
+
 
 class MetisNoAuth(BaseAuthenticator):
     """No authentication (noop)"""
@@ -38,22 +86,34 @@ class MetisNoAuth(BaseAuthenticator):
     async def should_update(self, *_) -> bool:
         return False
 
+    def is_valid(self, *_) -> bool:
+        return True
+
+    def needs_refresh(self, *_) -> bool:
+        return False
+
 
 class MetisTokenAuth(BaseAuthenticator):
     """Token based authentication"""
 
     _token: str
+    _header: str
 
     def __init__(self, token: str, **kwargs) -> None:
         super().__init__(**kwargs)
         self._token = token
+        self._header = f"Bearer {token}"
 
     async def authenticate(self, session: ClientSession, *_) -> bool:
-        session.headers["Authorization"] = f"Bearer {self._token}"
+        session.headers[AUTHORIZATION] = self._header
+        self.set_valid(session)
         return True
 
-    async def should_update(self, *_) -> bool:
-        return True
+    async def should_update(self, session: ClientSession, *_) -> bool:
+        return (
+            not self.is_valid(session)
+            or session.headers.get(AUTHORIZATION) != self._header
+        )
 
 
 class MetisLocalUserAuth(BaseAuthenticator):
@@ -76,21 +136,90 @@ class MetisLocalUserAuth(BaseAuthenticator):
     def _get_cookie(cls, session: ClientSession, base_url: URL):
         return session.cookie_jar.filter_cookies(base_url).get(cls._cookie_name)
 
+    @staticmethod
+    def _get_expires_at(morsel: "Optional[Morsel[str]]") -> float:
+        "Get cookie expiration timestamp, infinity for session cookies"
+        if morsel is None:
+            return inf
+        with suppress(ValueError):
+            if morsel["max-age"]:
+                return time() + int(morsel["max-age"])
+        with suppress(TypeError, ValueError):
+            if morsel["expires"]:
+                return parsedate_to_datetime(morsel["expires"]).timestamp()
+        return inf
+
+    def _get_store_key(self, base_url: URL) -> str:
+        return f"{base_url}|{self._credentials['email']}"
+
+    async def _call_store(self, func: Callable[..., _T], *args: Any) -> _T:
+        "Call the store method, in the default executor if the store blocks"
+        if self.store is not None and self.store.blocking:
+            return await get_running_loop().run_in_executor(None, func, *args)
+        return func(*args)
+
+    async def _load(self, session: ClientSession, base_url: URL) -> bool:
+        "Adopt a stored session cookie unless it is expired or already in use"
+        if self.store is None:
+            return False
+        stored = await self._call_store(self.store.load, self._get_store_key(base_url))
+        if not stored:
+            return False
+        value = stored["cookies"].get(self._cookie_name)
+        expires_at = stored.get("expires_at") or inf
+        cookie = self._get_cookie(session, base_url)
+        if not value or expires_at <= time() or (cookie and cookie.value == value):
+            return False
+        session.cookie_jar.update_cookies({self._cookie_name: value}, base_url)
+        self.set_valid(session, expires_at)
+        return True
+
+    async def _save(self, session: ClientSession, base_url: URL) -> None:
+        cookie = self._get_cookie(session, base_url)
+        if self.store is None or cookie is None:
+            return
+        expires_at = self._expires_at.get(session, inf)
+        await self._call_store(
+            self.store.save,
+            self._get_store_key(base_url),
+            {
+                "cookies": {self._cookie_name: cookie.value},
+                "expires_at": None if expires_at == inf else expires_at,
+            },
+        )
+
     async def authenticate(self, session: ClientSession, base_url: URL) -> bool:
+        # another client could have logged in already
+        if await self._load(session, base_url):
+            return True
         async with session.request(
             METH_POST,
             base_url / self._endpoint,
             json=self._credentials,
             raise_for_status=False,
         ) as resp:
-            if resp.status == HTTPTooManyRequests.status_code:
+            if resp.status == HTTPStatus.TOO_MANY_REQUESTS:
                 await sleep(10)
                 return await self.authenticate(session, base_url)
-            if not resp.ok:
+            if not resp.ok or not self._get_cookie(session, base_url):
                 session.cookie_jar.clear(lambda x: x.key == self._cookie_name)
+                self.invalidate(session)
+                if self.store is not None:
+                    await self._call_store(
+                        self.store.delete, self._get_store_key(base_url)
+                    )
                 return False
-            return bool(self._get_cookie(session, base_url))
+            self.set_valid(
+                session, self._get_expires_at(resp.cookies.get(self._cookie_name))
+            )
+            await self._save(session, base_url)
+            return True
 
     async def should_update(self, session: ClientSession, base_url: URL) -> bool:
         session.cookie_jar.update_cookies({}, base_url)
-        return not bool(self._get_cookie(session, base_url))
+        cookie = self._get_cookie(session, base_url)
+        if not cookie:
+            return not await self._load(session, base_url)
+        if not self.is_valid(session):
+            self.set_valid(session, self._get_expires_at(cookie))
+        return False
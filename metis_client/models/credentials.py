@@ -0,0 +1,115 @@
+"""Credentials stores"""
+
+import json
+import os
+from abc import abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from ..compat import Dict
+from ..dtos import MetisStoredCredentialsDTO
+from .base import MetisBase
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+class BaseCredentialsStore(MetisBase):
+    """
+    Base credentials store class.
+    Methods of `blocking` stores are run in the default executor
+    by authenticators, not to block the event loop.
+    """
+
+    blocking: bool = False
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[MetisStoredCredentialsDTO]:
+        "Load credentials by key"
+
+    @abstractmethod
+    def save(self, key: str, credentials: MetisStoredCredentialsDTO) -> None:
+        "Save credentials by key"
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        "Delete credentials by key"
+
+
+class MetisMemoryCredentialsStore(BaseCredentialsStore):
+    """In-memory credentials store, shared by clients of the same process"""
+
+    _data: Dict[str, MetisStoredCredentialsDTO]
+
+    def __init__(self) -> None:
+        self._data = {}
+
+    def load(self, key: str) -> Optional[MetisStoredCredentialsDTO]:
+        return self._data.get(key)
+
+    def save(self, key: str, credentials: MetisStoredCredentialsDTO) -> None:
+        self._data[key] = credentials
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class MetisFileCredentialsStore(BaseCredentialsStore):
+    """
+    JSON file credentials store, shared by processes.
+    Access is serialized with an advisory lock on a sidecar `.lock` file
+    where supported, the file is replaced atomically on every write.
+    """
+
+    blocking = True
+    _path: Path
+    _lock_path: Path
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        self._path = Path(path)
+        self._lock_path = self._path.with_name(f"{self._path.name}.lock")
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with open(self._lock_path, "a", encoding="utf-8") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, MetisStoredCredentialsDTO]:
+        try:
+            with open(self._path, encoding="utf-8") as data_file:
+                data = json.load(data_file)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data: Dict[str, MetisStoredCredentialsDTO]) -> None:
+        tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as data_file:
+            json.dump(data, data_file)
+        os.replace(tmp_path, self._path)
+
+    def load(self, key: str) -> Optional[MetisStoredCredentialsDTO]:
+        with self._locked(exclusive=False):
+            return self._read().get(key)
+
+    def save(self, key: str, credentials: MetisStoredCredentialsDTO) -> None:
+        with self._locked(exclusive=True):
+            data = self._read()
+            data[key] = credentials
+            self._write(data)
+
+    def delete(self, key: str) -> None:
+        with self._locked(exclusive=True):
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
@@ -1,10 +1,10 @@
 """SSE models"""
 
 import json
+import re
 from dataclasses import dataclass
 from functools import partial
-
-from aiohttp_sse_client.client import MessageEvent
+from typing import List, Optional, Union
 
 from ..dtos import (
     MetisCalculationsEventDTO,
@@ -16,20 +16,25 @@ from ..dtos import (
     MetisPongEventDTO,
 )
 from ..helpers import metis_json_decoder
+from .base import MetisBase
+
+_PONG = ("pong", b"pong")
+_REQ_ID = re.compile(r'"req(?:Id|_id)"\s*:\s*"([^"]*)"')
+_REQ_ID_BYTES = re.compile(rb'"req(?:Id|_id)"\s*:\s*"([^"]*)"')
 
 
 @dataclass(frozen=True)
-class MetisMessageEvent(MessageEvent):
-    "SSE Message Event"
+class MetisMessageEvent:
+    "SSE Message Event, data is kept raw until decoded"
 
-    type: str
+    type: Optional[str]
     message: str
-    data: str
+    data: Union[str, bytes]
     origin: str
     last_event_id: str
 
     @classmethod
-    def from_dto(cls, data: MessageEvent) -> "MetisMessageEvent":
+    def from_dto(cls, data: "MetisMessageEvent") -> "MetisMessageEvent":
         "Create model from DTO"
         return cls(
             type=data.type,
@@ -39,10 +44,34 @@ class MetisMessageEvent(MessageEvent):
             last_event_id=data.last_event_id,
         )
 
+    @property
+    def event_type(self) -> str:
+        "Get type of the DTO to be created, without decoding the data"
+        if self.type is None and self.message == "" and self.data in _PONG:
+            return "pong"
+        for evt_type in ("errors", "datasources", "calculations", "collections"):
+            if evt_type in (self.type, self.message):
+                return evt_type
+        return "errors"
+
+    @property
+    def req_id(self) -> Optional[str]:
+        "Get request id of the event without decoding the data"
+        return self.find_req_id(self.data)
+
+    @staticmethod
+    def find_req_id(data: Union[str, bytes]) -> Optional[str]:
+        "Find request id in raw JSON without decoding it"
+        if isinstance(data, bytes):
+            found = _REQ_ID_BYTES.search(data)
+            return found.group(1).decode() if found else None
+        match = _REQ_ID.search(data)
+        return match.group(1) if match else None
+
     def to_dto(self) -> MetisEventDTO:
         "Create DTO from model"
         try:
-            if self.type is None and self.message == "" and self.data == "pong":
+            if self.type is None and self.message == "" and self.data in _PONG:
                 return MetisPongEventDTO(type="pong", data=None)
             for dto in (
                 partial(MetisErrorEventDTO, type="errors"),
@@ -67,3 +96,84 @@ class MetisMessageEvent(MessageEvent):
             type="errors",
             data={"req_id": "", "data": [MetisErrorDTO(status=400, error=message)]},
         )
+
+
+class MetisEventStreamParser(MetisBase):
+    """
+    Incremental `text/event-stream` parser.
+
+    Chunks are accumulated in a single `bytearray` which is scanned
+    for event boundaries only past the already scanned part,
+    so a multi-megabyte single-line event costs a linear number of copies.
+    Event data is handed out as raw `bytes`, ready for the JSON decoder.
+    """
+
+    _boundary = re.compile(rb"\r?\n\r?\n")
+
+    origin: str
+    last_event_id: str = ""
+    retry: Optional[float] = None
+    _buffer: bytearray
+    _scanned: int = 0
+
+    def __init__(self, origin: str = "") -> None:
+        self.origin = origin
+        self._buffer = bytearray()
+
+    def reset(self, origin: str = "") -> None:
+        "Drop incomplete event, e.g. on reconnect"
+        self.origin = origin
+        self._buffer.clear()
+        self._scanned = 0
+
+    def feed(self, chunk: bytes) -> List[MetisMessageEvent]:
+        "Feed chunk, get complete events"
+        buffer = self._buffer
+        buffer += chunk
+        events: List[MetisMessageEvent] = []
+        pos = max(self._scanned - 3, 0)
+        while match := self._boundary.search(buffer, pos):
+            evt = self._parse(buffer, match.start())
+            del buffer[: match.end()]
+            pos = 0
+            if evt is not None:
+                events.append(evt)
+        self._scanned = len(buffer)
+        return events
+
+    def _parse(self, buffer: bytearray, size: int) -> Optional[MetisMessageEvent]:
+        # the event is the first `size` bytes of the buffer, read in place
+        event_type = ""
+        data: List[bytes] = []
+        start = 0
+        with memoryview(buffer) as view:
+            while start < size:
+                end = buffer.find(b"\n", start, size)
+                end = size if end < 0 else end
+                line_end = end - 1 if buffer[end - 1 : end] == b"\r" else end
+                colon = buffer.find(b":", start, line_end)
+                if colon < 0:
+                    name, value = bytes(view[start:line_end]), b""
+                else:
+                    name = bytes(view[start:colon])
+                    colon += 2 if buffer[colon + 1 : colon + 2] == b" " else 1
+                    # the only copy of the (possibly huge) value
+                    value = bytes(view[colon:line_end])
+                start = end + 1
+                if name == b"data":
+                    data.append(value)
+                elif name == b"event":
+                    event_type = value.decode()
+                elif name == b"id" and b"\x00" not in value:
+                    self.last_event_id = value.decode()
+                elif name == b"retry" and value.isdigit():
+                    self.retry = int(value) / 1000
+        if not data:
+            return None
+        return MetisMessageEvent(
+            type=event_type or None,
+            message=event_type,
+            data=data[0] if len(data) == 1 else b"\n".join(data),
+            origin=self.origin,
+            last_event_id=self.last_event_id,
+        )
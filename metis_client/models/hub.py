@@ -1,21 +1,203 @@
 "Stream hub"
 
-from asyncio import Event
-from typing import TYPE_CHECKING, Set
+from asyncio import Event, Future, TimerHandle, gather, get_running_loop, wait_for
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    ContextManager,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
+from ..compat import Dict, List
+from ..const import (
+    DEFAULT_HUB_HISTORY_MAX_BYTES,
+    DEFAULT_HUB_HISTORY_SIZE,
+    DEFAULT_HUB_HISTORY_TTL,
+)
 from ..dtos import MetisEventDTO
 from .base import MetisBase
+from .event import MetisMessageEvent
+from .metrics import MetisMetrics, MetisMetricSample, MetisNoopMetrics
+from .tracer import BaseTracer, MetisNoopTracer, MetisSpan
+from .watchdog import MetisLoopWatchdog, MetisNoopWatchdog
 
 if TYPE_CHECKING:  # pragma: no cover
     from .subscription import MetisSubscription
 
 
+class MetisHubHistory:
+    """
+    The first events of expected requests by req_id, up to `size` events,
+    `max_bytes` of raw data and `ttl` seconds. Events are decoded lazily.
+
+    Only the requests announced with `expect()`, or fired within `firing()`
+    while their req_id is unknown yet, are recorded. Expected requests and
+    events expire on a timer, even if the history is not used.
+    """
+
+    size: int
+    ttl: float
+    max_bytes: int
+    _entries: "OrderedDict[str, List[Any]]"
+    _expected: "OrderedDict[str, float]"
+    _firing: int = 0
+    _bytes: int = 0
+    _timer: Optional[TimerHandle] = None
+
+    def __init__(
+        self,
+        size: int = DEFAULT_HUB_HISTORY_SIZE,
+        ttl: float = DEFAULT_HUB_HISTORY_TTL,
+        max_bytes: int = DEFAULT_HUB_HISTORY_MAX_BYTES,
+    ) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._expected = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def pending(self) -> int:
+        "Number of expected requests without an event yet"
+        return len(self._expected) + self._firing
+
+    def records(self, evt_type: Optional[str], req_id: Optional[str]) -> bool:
+        "Check if the event of the type and request is kept"
+        return (
+            self.size > 0
+            and evt_type != "pong"
+            and (self._firing > 0 or req_id in self._expected)
+        )
+
+    def expect(self, req_id: str) -> None:
+        "Record the event of the request, unless it is already kept"
+        if req_id not in self._entries:
+            self._expected[req_id] = monotonic()
+            self._schedule()
+
+    @contextmanager
+    def firing(self) -> Iterator[None]:
+        "Record all events while a request is fired, its req_id is not known yet"
+        self._firing += 1
+        try:
+            yield
+        finally:
+            self._firing -= 1
+
+    def _schedule(self) -> None:
+        # expire the oldest on time, sooner if the ttl has been shortened
+        started = []
+        if self._entries:
+            started.append(next(iter(self._entries.values()))[0])
+        if self._expected:
+            started.append(next(iter(self._expected.values())))
+        if not started:
+            return
+        loop = get_running_loop()
+        when = loop.time() + max(min(started) + self.ttl - monotonic(), 0)
+        if self._timer is not None:
+            if self._timer.when() <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._expire)
+
+    def _expire(self) -> None:
+        self._timer = None
+        self.trim()
+        self._schedule()
+
+    def trim(self) -> None:
+        "Drop the oldest events over the limits and the expired requests"
+        expire_at = monotonic() - self.ttl
+        while self._expected and next(iter(self._expected.values())) <= expire_at:
+            self._expected.popitem(last=False)
+        while self._entries:
+            recorded_at, msg, _ = next(iter(self._entries.values()))
+            if (
+                len(self._entries) <= self.size
+                and self._bytes <= self.max_bytes
+                and recorded_at > expire_at
+            ):
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= len(msg.data)
+
+    def add(
+        self, req_id: str, msg: MetisMessageEvent, dto: Optional[MetisEventDTO] = None
+    ) -> None:
+        "Keep the event unless the request already has one, limits are not applied"
+        self._expected.pop(req_id, None)
+        if req_id not in self._entries:
+            self._entries[req_id] = [monotonic(), msg, dto]
+            self._bytes += len(msg.data)
+            self._schedule()
+
+    def peek(self, req_id: str) -> Optional[MetisEventDTO]:
+        "Get the decoded event of a request as kept, limits are not applied"
+        entry = self._entries.get(req_id)
+        if entry is None:
+            return None
+        if entry[2] is None:
+            entry[2] = entry[1].to_dto()
+        return cast(MetisEventDTO, entry[2])
+
+    def get(self, req_id: str) -> Optional[MetisEventDTO]:
+        "Get the decoded event of a request within the limits"
+        self.trim()
+        return self.peek(req_id)
+
+
 class MetisHub(MetisBase):
-    "Stream hub"
+    """
+    Stream hub.
+    Subscriptions are indexed by the declared event types,
+    so events are offered only to the interested ones.
+    Raw and decoded events are routed separately.
+
+    The hub also keeps the first event of expected requests by req_id,
+    up to `history_size` events, `history_max_bytes` of raw data and
+    `history_ttl` seconds, so the result of a request can be found
+    after the event has been published. History events are decoded lazily.
+    Publishing is traced with `tracer`, subscriptions report to `metrics`
+    and their predicates are timed by `watchdog`.
+    """
+
+    history: MetisHubHistory
     _subscriptions: "Set[MetisSubscription]"
+    _routes: "Dict[Tuple[bool, Optional[str]], Set[MetisSubscription]]"
+    _waiters: "Dict[str, List[Future]]"
+    tracer: BaseTracer
+    metrics: MetisMetrics
+    watchdog: MetisLoopWatchdog
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        history_size: int = DEFAULT_HUB_HISTORY_SIZE,
+        history_ttl: float = DEFAULT_HUB_HISTORY_TTL,
+        history_max_bytes: int = DEFAULT_HUB_HISTORY_MAX_BYTES,
+        tracer: Optional[BaseTracer] = None,
+        metrics: Optional[MetisMetrics] = None,
+        watchdog: Optional[MetisLoopWatchdog] = None,
+    ) -> None:
+        self.tracer = tracer or MetisNoopTracer()
+        self.metrics = metrics or MetisNoopMetrics()
+        self.watchdog = watchdog or MetisNoopWatchdog()
+        self.history = MetisHubHistory(history_size, history_ttl, history_max_bytes)
         self._subscriptions = set()
+        self._routes = {}
+        self._waiters = {}
         self._connected_event = Event()
 
     def __len__(self) -> int:
@@ -38,17 +220,49 @@ class MetisHub(MetisBase):
         "Wait connected event"
         await self._connected_event.wait()
 
+    @staticmethod
+    def _route_types(
+        subscription: "MetisSubscription",
+    ) -> "Collection[Optional[str]]":
+        # no types means all types, empty types means none
+        return (None,) if subscription.types is None else subscription.types
+
     def subscribe(self, subscription: "MetisSubscription") -> None:
         "Register subscription"
         self._subscriptions.add(subscription)
+        for evt_type in self._route_types(subscription):
+            self._routes.setdefault((subscription.raw, evt_type), set()).add(
+                subscription
+            )
 
     def unsubscribe(self, subscription: "MetisSubscription") -> None:
         "Unsubscribe subscription"
         self._subscriptions.discard(subscription)
+        for evt_type in self._route_types(subscription):
+            key = (subscription.raw, evt_type)
+            subs = self._routes.get(key)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._routes[key]
 
     def unsubscribe_all(self) -> None:
         "Unsubscribe all subscriptions"
         self._subscriptions.clear()
+        self._routes.clear()
+
+    def wants(self, evt_type: Optional[str], raw: bool = False) -> bool:
+        "Check if any subscription is interested in the event type"
+        return (raw, evt_type) in self._routes or (raw, None) in self._routes
+
+    def route(
+        self, evt_type: Optional[str], raw: bool = False
+    ) -> "Tuple[MetisSubscription, ...]":
+        "Get subscriptions interested in the event type"
+        return (
+            *self._routes.get((raw, evt_type), ()),
+            *self._routes.get((raw, None), ()),
+        )
 
     async def close(self) -> None:
         "Close all subscriptions"
@@ -57,7 +271,129 @@ class MetisHub(MetisBase):
         for sub in subs:
             await sub.close()
 
+    def _trace_publish(
+        self,
+        evt: Union[MetisEventDTO, MetisMessageEvent],
+        subs: "Tuple[MetisSubscription, ...]",
+    ) -> ContextManager[MetisSpan]:
+        if not self.tracer.enabled:
+            return self.tracer.span("metis.publish")
+        if isinstance(evt, MetisMessageEvent):
+            evt_type, req_id = evt.event_type, evt.req_id
+        else:
+            data: Any = evt.get("data")
+            evt_type = evt["type"]
+            req_id = data.get("req_id") if isinstance(data, dict) else None
+        attributes = {
+            "metis.event_type": evt_type,
+            "metis.raw": isinstance(evt, MetisMessageEvent),
+            "metis.subscribers": len(subs),
+        }
+        if req_id:
+            attributes["metis.req_id"] = str(req_id)
+        return self.tracer.span("metis.publish", attributes)
+
     def publish(self, evt: MetisEventDTO) -> None:
         "Publish message to subscriptions"
+        subs = self.route(evt["type"])
+        with self._trace_publish(evt, subs):
+            for sub in subs:
+                sub.put_nowait(evt)
+
+    async def publish_async(self, evt: Union[MetisEventDTO, MetisMessageEvent]) -> None:
+        "Publish decoded or raw message to subscriptions, wait for blocking ones"
+        if isinstance(evt, MetisMessageEvent):
+            subs = self.route(evt.event_type, raw=True)
+        else:
+            subs = self.route(evt["type"])
+        with self._trace_publish(evt, subs):
+            blocking = []
+            for sub in subs:
+                if sub.policy.overflow == "block" and sub.queue.full():
+                    blocking.append(sub.put(evt))
+                else:
+                    sub.put_nowait(evt)
+            if blocking:
+                await gather(*blocking)
+
+    def fail(self, exc: BaseException) -> None:
+        """
+        Fail subscriptions and result waiters, e.g. when the stream is lost.
+        Failed subscriptions are unsubscribed and get no more events.
+        """
+        for sub in list(self._subscriptions):
+            sub.fail(exc)
+            self.unsubscribe(sub)
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+
+    def collect(self) -> List[MetisMetricSample]:
+        "Sample subscribers and queue depths, a metrics collector"
+        depths: Dict[str, int] = {}
         for sub in self._subscriptions:
-            sub.put_nowait(evt)
+            types = "*" if sub.types is None else ",".join(sorted(sub.types))
+            depths[types] = max(depths.get(types, 0), sub.queue.qsize())
+        return [
+            ("metis_hub_subscribers", {}, len(self._subscriptions)),
+            ("metis_hub_waiters", {}, len(self._waiters)),
+            *(
+                ("metis_subscription_queue_depth", {"types": types}, depth)
+                for types, depth in depths.items()
+            ),
+        ]
+
+    @property
+    def waiting(self) -> int:
+        "Number of requests waited for with `wait_result()`"
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        "Check if no subscription, result waiter or expected request needs events"
+        return (
+            not self._subscriptions and not self._waiters and not self.history.pending
+        )
+
+    def records(self, evt_type: Optional[str], req_id: Optional[str]) -> bool:
+        "Check if the event of the type and request is kept in history or waited for"
+        return self.history.records(evt_type, req_id) or (
+            evt_type != "pong" and req_id in self._waiters
+        )
+
+    def record(self, msg: MetisMessageEvent, dto: Optional[MetisEventDTO] = None):
+        "Keep the first event of an expected request in history, resolve its waiters"
+        req_id = msg.req_id
+        if not req_id or not self.records(msg.event_type, req_id):
+            return
+        self.history.add(req_id, msg, dto)
+        waiters = self._waiters.pop(req_id, [])
+        if waiters:
+            result = self.history.peek(req_id)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+        self.history.trim()
+
+    def get_result(self, req_id: str) -> Optional[MetisEventDTO]:
+        "Get the first event of a request from history"
+        return self.history.get(req_id)
+
+    async def wait_result(
+        self, req_id: str, timeout: Optional[float] = None
+    ) -> MetisEventDTO:
+        "Get the first event of a request from history or wait for it"
+        result = self.get_result(req_id)
+        if result is not None:
+            return result
+        waiter = get_running_loop().create_future()
+        self._waiters.setdefault(req_id, []).append(waiter)
+        try:
+            return await wait_for(waiter, timeout)
+        finally:
+            waiters = self._waiters.get(req_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[req_id]
@@ -0,0 +1,268 @@
+"""In-process transport without sockets"""
+
+import json
+import re
+from asyncio import Queue
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    cast,
+)
+from uuid import uuid4
+
+from aiohttp import ClientResponse, ClientResponseError, RequestInfo
+from aiohttp.hdrs import CONTENT_TYPE
+from aiohttp.web_exceptions import HTTPException
+from aiohttp.web_response import Response, json_response
+from multidict import CIMultiDict, CIMultiDictProxy, MultiDictProxy
+from yarl import URL
+
+from ..compat import Callable, Dict, Mapping
+from ..helpers import metis_json_encoder
+from .base import MetisBase
+from .transport import BaseTransport
+
+SSE_CONTENT_TYPE = "text/event-stream"
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class _MemoryContent:
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+
+    def iter_any(self) -> AsyncIterator[bytes]:
+        "Iterate over chunks"
+        return self._chunks
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        "Iterate over data by chunks of `size` bytes"
+        async for chunk in self._chunks:
+            for pos in range(0, len(chunk), size):
+                yield chunk[pos : pos + size]
+
+
+async def _iter_body(body: bytes) -> AsyncIterator[bytes]:
+    yield body
+
+
+class MetisMemoryResponse(MetisBase):  # pylint: disable=too-many-instance-attributes
+    """In-memory response, mimics `aiohttp.ClientResponse`"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        method: str,
+        url: URL,
+        status: int,
+        content_type: str,
+        body: bytes = b"",
+        chunks: Optional[AsyncIterator[bytes]] = None,
+    ) -> None:
+        self.method = method
+        self.url = self.real_url = url
+        self.status = status
+        self.content_type = content_type
+        self.headers = CIMultiDictProxy(CIMultiDict({CONTENT_TYPE: content_type}))
+        self.request_info = RequestInfo(
+            url, method, CIMultiDictProxy(CIMultiDict()), url
+        )
+        self.content = _MemoryContent(chunks or _iter_body(body))
+        self._body = body
+
+    @property
+    def ok(self) -> bool:  # pylint: disable=invalid-name
+        "Is status less than 400"
+        return self.status < 400
+
+    def raise_for_status(self) -> None:
+        "Raise `ClientResponseError` if status is 400 or higher"
+        if not self.ok:
+            raise ClientResponseError(
+                self.request_info, (), status=self.status, message=self._body.decode()
+            )
+
+    async def read(self) -> bytes:
+        "Read body"
+        return self._body
+
+    async def text(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        "Read body as text"
+        return self._body.decode(encoding, errors)
+
+    async def json(
+        self,
+        *,
+        encoding: Optional[str] = None,
+        loads: Callable[[str], Any] = json.loads,
+        content_type: Optional[str] = None,  # pylint: disable=unused-argument
+    ) -> Any:
+        "Read body as JSON"
+        return loads(self._body.decode(encoding or "utf-8"))
+
+    def release(self) -> None:
+        "Release connection, nothing to do"
+
+    def close(self) -> None:
+        "Close connection, nothing to do"
+
+    async def wait_for_close(self) -> None:
+        "Wait for connection release, nothing to do"
+
+    async def __aenter__(self) -> "MetisMemoryResponse":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        self.release()
+
+
+class MetisMemoryRequest(MetisBase):
+    """Request passed to the handlers, a subset of `aiohttp.web.Request`"""
+
+    def __init__(
+        self, method: str, url: URL, match_info: Dict[str, str], body: bytes
+    ) -> None:
+        self.method = method
+        self.rel_url = url
+        self.path = url.path
+        self.query: MultiDictProxy[str] = url.query
+        self.match_info = match_info
+        self._body = body
+
+    async def read(self) -> bytes:
+        "Read body"
+        return self._body
+
+    async def text(self) -> str:
+        "Read body as text"
+        return self._body.decode()
+
+    async def json(self, *, loads: Callable[[str], Any] = json.loads) -> Any:
+        "Read body as JSON"
+        return loads(self._body.decode())
+
+
+MetisMemoryHandler = Callable[[MetisMemoryRequest], Awaitable[Response]]
+
+
+class MetisMemoryTransport(BaseTransport):
+    """
+    In-process transport, e.g. for CPU-only benchmarks and fast tests.
+
+    Requests are routed by method and path with `{name}` placeholders
+    to `aiohttp.web` style handlers, returning `Response`
+    or raising `HTTPException`. As the BFF does, `respond` answers with
+    a request id and publishes the result with it to the event `streams`,
+    which may be shared with a fake server.
+    """
+
+    streams: Set["Queue[str]"]
+    _routes: Dict[str, List[Tuple[Pattern[str], MetisMemoryHandler]]]
+
+    def __init__(self, streams: Optional[Set["Queue[str]"]] = None) -> None:
+        self.streams = set() if streams is None else streams
+        self._routes = {}
+
+    def add_route(self, method: str, path: str, handler: MetisMemoryHandler) -> None:
+        "Route requests to handler"
+        parts = _PLACEHOLDER.split(path)
+        # odd parts are placeholder names
+        pattern = "".join(
+            f"(?P<{x}>[^/]+)" if idx % 2 else re.escape(x)
+            for idx, x in enumerate(parts)
+        )
+        routes = self._routes.setdefault(method.upper(), [])
+        routes.append((re.compile(pattern), handler))
+
+    def publish(self, evt_type: str, data: Any, req_id: Optional[str] = None) -> None:
+        "Send event to all stream connections"
+        payload: Dict[str, Any] = {"data": data}
+        if isinstance(data, list):
+            payload.update(total=len(data), types=[])
+        if req_id:
+            payload["req_id"] = req_id
+        msg = f"event: {evt_type}\ndata: {metis_json_encoder(payload)}\n\n"
+        for queue in self.streams:
+            queue.put_nowait(msg)
+
+    def respond(self, evt_type: str, data: Any) -> Response:
+        "Answer with request id, publish the result to the streams"
+        req_id = uuid4().hex
+        self.publish(evt_type, data, req_id)
+        return json_response({"reqId": req_id})
+
+    async def _dispatch(self, method: str, url: URL, body: bytes) -> Response:
+        for pattern, handler in self._routes.get(method, ()):
+            found = pattern.fullmatch(url.path)
+            if found:
+                request = MetisMemoryRequest(method, url, found.groupdict(), body)
+                try:
+                    return await handler(request)
+                except HTTPException as exc:
+                    return exc
+        return Response(status=404, text="404: Not Found")
+
+    async def request(self, method: str, url: URL, **opts: Any) -> ClientResponse:
+        method = method.upper()
+        url = URL(url)
+        if opts.get("params"):
+            url = url.update_query(opts["params"])
+        data = opts.get("data")
+        if opts.get("json") is not None:
+            body = metis_json_encoder(opts["json"]).encode()
+        elif isinstance(data, str):
+            body = data.encode()
+        elif data is None or isinstance(data, bytes):
+            body = data or b""
+        else:
+            body = b"".join([x async for x in data])
+
+        resp = await self._dispatch(method, url, body)
+        result = MetisMemoryResponse(
+            method,
+            url,
+            resp.status,
+            resp.content_type,
+            cast(bytes, resp.body or b""),
+        )
+        if opts.get("raise_for_status"):
+            result.raise_for_status()
+        return cast(ClientResponse, result)
+
+    async def _stream(self, queue: "Queue[str]") -> AsyncIterator[bytes]:
+        while True:
+            # send all queued events at once
+            msgs = [await queue.get()]
+            while not queue.empty():
+                msgs.append(queue.get_nowait())
+            yield "".join(msgs).encode()
+
+    @asynccontextmanager
+    async def _connect(self, url: URL) -> AsyncIterator[ClientResponse]:
+        queue: "Queue[str]" = Queue()
+        self.streams.add(queue)
+        try:
+            yield cast(
+                ClientResponse,
+                MetisMemoryResponse(
+                    "GET", url, 200, SSE_CONTENT_TYPE, chunks=self._stream(queue)
+                ),
+            )
+        finally:
+            self.streams.discard(queue)
+
+    def sse(
+        self,
+        url: URL,
+        params: Optional[Dict[str, Any]],
+        headers: Mapping[str, str],
+        timeout: Optional[float],
+    ) -> AsyncContextManager[ClientResponse]:
+        return self._connect(url)
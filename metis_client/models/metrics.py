@@ -0,0 +1,175 @@
+"""Metrics registry"""
+
+from bisect import bisect_left
+from typing import Any, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from ..compat import Callable, Dict
+from ..const import DEFAULT_METRICS_BUCKETS
+from .base import MetisBase
+
+MetisMetricLabels = Tuple[Tuple[str, str], ...]
+MetisMetricSample = Tuple[str, Dict[str, Any], float]
+MetisMetricsCollector = Callable[[], Iterable[MetisMetricSample]]
+
+# name: (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "metis_requests_total": ("counter", "HTTP requests by method, endpoint, status"),
+    "metis_request_duration_seconds": (
+        "histogram",
+        "Seconds to HTTP response headers by method and endpoint",
+    ),
+    "metis_retries_total": ("counter", "HTTP requests retried on 401 or 429"),
+    "metis_auth_refreshes_total": ("counter", "Authentications by reason"),
+    "metis_stream_reconnects_total": ("counter", "Stream reconnects by reason"),
+    "metis_stream_events_total": ("counter", "Stream events received by type"),
+    "metis_stream_decode_seconds": ("histogram", "Seconds to decode events by type"),
+    "metis_subscription_dropped_total": (
+        "counter",
+        "Events dropped by full subscription queues by overflow policy",
+    ),
+    "metis_subscription_coalesced_total": (
+        "counter",
+        "Events replaced by newer ones in coalescing subscription queues",
+    ),
+    "metis_subscription_queue_depth": (
+        "gauge",
+        "Deepest queue of subscriptions by event types",
+    ),
+    "metis_hub_subscribers": ("gauge", "Stream hub subscriptions"),
+    "metis_hub_waiters": ("gauge", "Requests waited for in the stream hub history"),
+    "metis_slow_operations_total": (
+        "counter",
+        "Synchronous stages blocking the event loop by stage and event type",
+    ),
+    "metis_loop_lag_seconds": ("histogram", "Event loop lag"),
+}
+
+
+def _labels(labels: Dict[str, Any]) -> MetisMetricLabels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quote(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return '"' + escaped + '"'
+
+
+def _format_sample(name: str, labels: MetisMetricLabels, value: float) -> str:
+    pairs = [f"{k}={_quote(v)}" for k, v in labels]
+    value = float(value)
+    text = str(int(value)) if value.is_integer() else repr(value)
+    return f"{name}{{{','.join(pairs)}}} {text}" if pairs else f"{name} {text}"
+
+
+class MetisMetrics(MetisBase):
+    """
+    In-process metrics registry of counters and histograms.
+    Gauges are sampled on export from the registered collectors,
+    e.g. the stream hub. Rates, e.g. events per second by type,
+    are left for the monitoring system.
+    """
+
+    enabled: bool = True
+    buckets: Sequence[float]
+    _counters: Dict[str, Dict[MetisMetricLabels, float]]
+    _histograms: Dict[str, Dict[MetisMetricLabels, List[float]]]
+    _collectors: Set[MetisMetricsCollector]
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_METRICS_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = set()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        "Increment counter"
+        series = self._counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        "Observe histogram value"
+        series = self._histograms.setdefault(name, {})
+        key = _labels(labels)
+        hist = series.get(key)
+        if hist is None:
+            # bucket counts, +Inf, sum
+            hist = series[key] = [0] * (len(self.buckets) + 2)
+        hist[bisect_left(self.buckets, value)] += 1
+        hist[-1] += value
+
+    def register(self, collector: MetisMetricsCollector) -> None:
+        "Register gauges collector"
+        self._collectors.add(collector)
+
+    def unregister(self, collector: MetisMetricsCollector) -> None:
+        "Unregister gauges collector"
+        self._collectors.discard(collector)
+
+    def collect(self) -> List[MetisMetricSample]:
+        "Sample gauges"
+        return [x for collector in self._collectors for x in collector()]
+
+    def value(self, name: str, **labels: Any) -> Optional[float]:
+        """
+        Get counter or gauge value, number of histogram observations,
+        None if not recorded
+        """
+        key = _labels(labels)
+        if key in self._counters.get(name, {}):
+            return self._counters[name][key]
+        if key in self._histograms.get(name, {}):
+            return sum(self._histograms[name][key][:-1])
+        values = [x[2] for x in self.collect() if x[0] == name and _labels(x[1]) == key]
+        return sum(values) if values else None
+
+    def _format_histogram(
+        self, name: str, key: MetisMetricLabels, hist: List[float]
+    ) -> List[str]:
+        lines = []
+        total = 0.0
+        bounds: List[Union[float, str]] = [*self.buckets, "+Inf"]
+        for idx, bound in enumerate(bounds):
+            total += hist[idx]
+            lines.append(
+                _format_sample(f"{name}_bucket", (*key, ("le", str(bound))), total)
+            )
+        lines.append(_format_sample(f"{name}_sum", key, hist[-1]))
+        lines.append(_format_sample(f"{name}_count", key, total))
+        return lines
+
+    def to_prometheus(self) -> str:
+        "Export metrics in Prometheus text format"
+        samples: Dict[str, List[str]] = {}
+        for name, series in self._counters.items():
+            samples[name] = [_format_sample(name, k, v) for k, v in series.items()]
+        for name, hists in self._histograms.items():
+            lines = samples.setdefault(name, [])
+            for key, hist in hists.items():
+                lines.extend(self._format_histogram(name, key, hist))
+        for name, labels, value in self.collect():
+            samples.setdefault(name, []).append(
+                _format_sample(name, _labels(labels), value)
+            )
+        text = []
+        for name in sorted(samples):
+            metric_type, help_text = METRICS.get(name, ("untyped", name))
+            text.append(f"# HELP {name} {help_text}")
+            text.append(f"# TYPE {name} {metric_type}")
+            text.extend(samples[name])
+        return "".join(f"{x}\n" for x in text)
+
+
+class MetisNoopMetrics(MetisMetrics):
+    """Metrics registry recording nothing, the default"""
+
+    enabled = False
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        pass
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        pass
+
+    def register(self, collector: MetisMetricsCollector) -> None:
+        pass
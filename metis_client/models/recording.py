@@ -0,0 +1,239 @@
+"""Recording and replay of HTTP responses and stream events"""
+
+import gzip
+import json
+from asyncio import Event, get_running_loop, sleep
+from collections import deque
+from pathlib import Path
+from time import monotonic
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Deque,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
+
+from aiohttp import ClientResponse
+from yarl import URL
+
+from ..compat import Dict, Mapping
+from .base import MetisBase
+from .event import MetisMessageEvent
+from .memory import SSE_CONTENT_TYPE, MetisMemoryResponse
+from .transport import BaseTransport
+
+MetisRecordEntry = Dict[str, Any]
+
+
+def _text(data: Union[str, bytes]) -> str:
+    return data if isinstance(data, str) else data.decode("utf-8", "surrogateescape")
+
+
+def load_recording(path: Union[str, Path]) -> List[MetisRecordEntry]:
+    "Load entries recorded by `MetisRecorder`"
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class MetisRecorder(MetisBase):
+    """
+    Recorder of HTTP responses and stream events with their timestamps
+    into a gzipped JSON lines file at `path`, see `MetisReplayTransport`.
+    Response bodies are read whole while recording.
+    """
+
+    path: Path
+    _file: Optional[IO[str]] = None
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._started = monotonic()
+
+    def _write(self, entry: MetisRecordEntry) -> None:
+        if self._file is None:
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def now(self) -> float:
+        "Seconds since the recording started"
+        return monotonic() - self._started
+
+    # pylint: disable=too-many-arguments
+    def record_response(
+        self,
+        started: float,
+        method: str,
+        url: URL,
+        status: int,
+        content_type: str,
+        body: bytes,
+    ) -> None:
+        "Record HTTP response to a request sent at `started`"
+        text = _text(body)
+        self._write(
+            {
+                "t": round(started, 6),
+                "d": round(self.now() - started, 6),
+                "kind": "http",
+                "method": method,
+                "url": str(url.relative()),
+                "status": status,
+                "type": content_type,
+                "body": text,
+                "req_id": MetisMessageEvent.find_req_id(text),
+            }
+        )
+
+    def record_event(self, evt: MetisMessageEvent) -> None:
+        "Record stream event"
+        self._write(
+            {
+                "t": round(self.now(), 6),
+                "kind": "sse",
+                "event": evt.type,
+                "data": _text(evt.data),
+                "id": evt.last_event_id,
+                "req_id": evt.req_id,
+            }
+        )
+
+    def close(self) -> None:
+        "Flush and close the file"
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "MetisRecorder":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class MetisReplayTransport(BaseTransport):
+    """
+    Replay of a recording, no network.
+
+    Responses are matched by method and relative URL in the recorded order,
+    the last one is repeated when exhausted, 404 if none.
+    Stream connections get the recorded events in order: an event of
+    a request is sent after its response was replayed, others at their
+    recorded time. Delays are replayed at `speed`, e.g. 10 is 10 times
+    faster, `None` is as fast as possible.
+    """
+
+    speed: Optional[float]
+    _started: Optional[float] = None
+
+    def __init__(
+        self,
+        recording: Union[str, Path, Iterable[MetisRecordEntry]],
+        speed: Optional[float] = 1,
+    ) -> None:
+        entries = (
+            load_recording(recording)
+            if isinstance(recording, (str, Path))
+            else list(recording)
+        )
+        self.speed = speed
+        self._responses: Dict[Tuple[str, str], Deque[MetisRecordEntry]] = {}
+        self._events = [x for x in entries if x["kind"] == "sse"]
+        self._cursor = 0
+        # recorded ends of the responses by request ids
+        self._acks: Dict[str, float] = {}
+        self._served: Dict[str, float] = {}
+        self._served_event = Event()
+        for entry in entries:
+            if entry["kind"] == "http":
+                key = (entry["method"], entry["url"])
+                self._responses.setdefault(key, deque()).append(entry)
+                if entry.get("req_id"):
+                    self._acks[entry["req_id"]] = entry["t"] + entry["d"]
+
+    def _now(self) -> float:
+        now = get_running_loop().time()
+        if self._started is None:
+            self._started = now
+        return now
+
+    async def _sleep_until(self, deadline: float) -> None:
+        if self.speed is not None:
+            await sleep(max(deadline - self._now(), 0))
+
+    def _scale(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0
+
+    async def request(self, method: str, url: URL, **opts: Any) -> ClientResponse:
+        started = self._now()
+        url = URL(url)
+        if opts.get("params"):
+            url = url.update_query(opts["params"])
+        path = url.relative() if url.is_absolute() else url
+        queue = self._responses.get((method.upper(), str(path)))
+        if not queue:
+            resp = MetisMemoryResponse(method, url, 404, "text/plain", b"Not Found")
+        else:
+            entry = queue[0] if len(queue) == 1 else queue.popleft()
+            await self._sleep_until(started + self._scale(entry["d"]))
+            body = entry["body"].encode("utf-8", "surrogateescape")
+            resp = MetisMemoryResponse(
+                method, url, entry["status"], entry["type"], body
+            )
+            if entry.get("req_id"):
+                self._served[entry["req_id"]] = self._now()
+                self._served_event.set()
+        if opts.get("raise_for_status"):
+            resp.raise_for_status()
+        return cast(ClientResponse, resp)
+
+    async def _wait_served(self, req_id: str) -> float:
+        while req_id not in self._served:
+            self._served_event.clear()
+            await self._served_event.wait()
+        return self._served[req_id]
+
+    async def _stream(self) -> AsyncIterator[bytes]:
+        while self._cursor < len(self._events):
+            entry = self._events[self._cursor]
+            req_id = entry.get("req_id")
+            if req_id in self._acks:
+                served = await self._wait_served(req_id)
+                delay = entry["t"] - self._acks[req_id]
+            else:
+                served = self._now() if self._started is None else self._started
+                delay = entry["t"]
+            await self._sleep_until(served + self._scale(delay))
+            self._cursor += 1
+            lines = [f"event: {entry['event']}"] if entry["event"] else []
+            lines.extend(f"data: {x}" for x in entry["data"].split("\n"))
+            if entry["id"]:
+                lines.append(f"id: {entry['id']}")
+            yield ("\n".join(lines) + "\n\n").encode("utf-8", "surrogateescape")
+        # keep the stream open
+        await Event().wait()
+
+    def sse(
+        self,
+        url: URL,
+        params: Optional[Dict[str, Any]],
+        headers: Mapping[str, str],
+        timeout: Optional[float],
+    ) -> AsyncContextManager[ClientResponse]:
+        resp = MetisMemoryResponse(
+            "GET", url, 200, SSE_CONTENT_TYPE, chunks=self._stream()
+        )
+        return cast(AsyncContextManager[ClientResponse], resp)
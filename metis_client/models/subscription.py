@@ -1,58 +1,331 @@
 "Stream subscription"
 
-from asyncio import CancelledError, Queue, QueueFull
-from contextlib import asynccontextmanager
+from asyncio import FIRST_COMPLETED, CancelledError, Future, Queue, QueueFull
+from asyncio import TimeoutError as AsyncioTimeoutError
+from asyncio import ensure_future, get_running_loop, wait, wait_for
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
 from types import TracebackType
-from typing import TYPE_CHECKING, Optional, Type
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Collection,
+    FrozenSet,
+    Hashable,
+    List,
+    Literal,
+    Optional,
+    Type,
+    Union,
+    cast,
+)
 
-from ..compat import Awaitable, Callable
+from ..compat import Awaitable, Callable, Dict, NotRequired, TypedDict
 from ..dtos import MetisEventDTO, MetisRequestIdDTO
-from ..helpers import raise_on_metis_error_in_event
+from ..helpers import (
+    metis_json_iter_items,
+    raise_on_metis_error_in_event,
+    raise_on_metis_errors_evt,
+)
 from .base import MetisBase
+from .event import MetisMessageEvent
 
 if TYPE_CHECKING:  # pragma: no cover
     from .hub import MetisHub
 
 SubscribeCallable = Callable[[], "MetisSubscription"]
 RequestIdCallable = Callable[[], Awaitable[MetisRequestIdDTO]]
+CoalesceKeyCallable = Callable[[MetisEventDTO], Hashable]
+MetisSubscriptionItem = Union[MetisEventDTO, MetisMessageEvent]
+
+MetisOverflowPolicy = Union[
+    Literal["block"],
+    Literal["drop_oldest"],
+    Literal["drop_newest"],
+    Literal["coalesce"],
+]
+
+
+def default_coalesce_key(message: MetisEventDTO) -> Hashable:
+    "Events of the same type and request with the same entity ids supersede"
+    data: Any = message.get("data")
+    if not isinstance(data, dict):
+        return (message["type"],)
+    ids = tuple(x.get("id") for x in data.get("data", []) if isinstance(x, dict))
+    return (message["type"], data.get("req_id"), ids)
+
+
+class MetisSubscriptionKwargs(TypedDict):
+    "MetisSubscription kwargs"
+
+    types: NotRequired[Optional[Collection[str]]]
+    ids: NotRequired[Optional[Collection[int]]]
+    raw: NotRequired[bool]
+    queue_size: NotRequired[int]
+    policy: NotRequired["MetisQueuePolicy"]
 
 
 @raise_on_metis_error_in_event
 async def act_and_get_result_from_stream(
     sub_func: SubscribeCallable, func: RequestIdCallable
 ) -> MetisEventDTO:
-    "Do a request and get response from stream"
-    async with sub_func() as sub:
-        resp = await func()
-        async for msg in sub:
-            data = msg.get("data")
-            if isinstance(data, dict) and data.get("req_id") == resp.get("req_id"):
-                return msg
+    """
+    Do a request and get response from stream.
+    Traced as an operation of subscribing, the request and waiting for the event.
+    """
+    subscription = sub_func()
+    tracer = subscription.hub.tracer
+    with tracer.span("metis.operation") as span:
+        async with AsyncExitStack() as stack:
+            with tracer.span("metis.subscribe"):
+                sub = await stack.enter_async_context(subscription)
+            resp = await func()
+            req_id = resp.get("req_id")
+            span.set_attribute("metis.req_id", str(req_id))
+            with tracer.span("metis.wait", {"metis.req_id": str(req_id)}):
+                async for msg in sub:
+                    data = msg.get("data")
+                    if isinstance(data, dict) and data.get("req_id") == req_id:
+                        return msg
     raise CancelledError  # pragma: no cover
 
 
+async def act_and_iter_items_from_stream(
+    sub_func: SubscribeCallable, func: RequestIdCallable
+) -> AsyncIterator[Any]:
+    """
+    Do a request and yield items of the response listing from stream
+    as they are decoded. `sub_func` should subscribe to raw events.
+    """
+    async with sub_func() as sub:
+        req_id = (await func()).get("req_id")
+        async for msg in cast(AsyncIterator[MetisMessageEvent], sub):
+            # find the request cheaply, events of other requests are not decoded
+            if msg.req_id != req_id:
+                continue
+            if msg.event_type == "errors":
+                raise_on_metis_errors_evt(msg.to_dto())
+                return  # pragma: no cover
+            for name, value in metis_json_iter_items(msg.data):
+                if name is None:
+                    yield value
+            return
+
+
+class MetisSubscriptionQueue(Queue):
+    "Subscription queue counting messages lost on overflow"
+
+    dropped: int = 0
+    coalesced: int = 0
+
+
+class MetisCoalescingQueue(MetisSubscriptionQueue):
+    "Queue replacing a waiting message by a newer one with the same key"
+
+    _queue: Any
+    _slots: Dict[Hashable, List[Any]]
+
+    def __init__(self, maxsize: int, key: CoalesceKeyCallable) -> None:
+        self._key = key
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)  # type: ignore[misc]
+        self._slots = {}
+
+    def _put(self, item: MetisEventDTO) -> None:
+        if isinstance(item, BaseException):
+            # failure wake-up, never coalesced
+            self._queue.append([None, item])
+            return
+        slot = [self._key(item), item]
+        self._slots[slot[0]] = slot
+        self._queue.append(slot)
+
+    def _get(self) -> MetisEventDTO:
+        key, item = slot = self._queue.popleft()
+        if self._slots.get(key) is slot:
+            del self._slots[key]
+        return cast(MetisEventDTO, item)
+
+    def coalesce(self, item: Any) -> bool:
+        "Replace waiting message with the same key, if any"
+        slot = self._slots.get(self._key(item))
+        if slot is None:
+            return False
+        slot[1] = item
+        self.coalesced += 1
+        return True
+
+
+@dataclass(frozen=True)
+class MetisQueuePolicy:
+    """
+    Subscription queue policy.
+
+    The queue holds up to `size` messages (unlimited if 0, the default),
+    on overflow the `overflow` policy is applied:
+    - `block`: publisher waits for a free slot up to `block_timeout` seconds,
+      then the message is dropped;
+    - `drop_oldest`: the oldest waiting message is dropped;
+    - `drop_newest`: the new message is dropped;
+    - `coalesce`: a new message replaces a waiting one with the same
+      `coalesce_key` even if the queue is not full, otherwise
+      the oldest waiting message is dropped.
+    """
+
+    size: int = 0
+    overflow: MetisOverflowPolicy = "drop_newest"
+    block_timeout: float = 1
+    coalesce_key: CoalesceKeyCallable = default_coalesce_key
+
+    def create_queue(self) -> MetisSubscriptionQueue:
+        "Create an empty queue of the policy"
+        if self.overflow == "coalesce":
+            return MetisCoalescingQueue(self.size, self.coalesce_key)
+        return MetisSubscriptionQueue(self.size)
+
+
 class MetisSubscription(MetisBase):
-    "Message subscription"
+    """
+    Message subscription.
+
+    `types` declares event types routed by the hub to the subscription,
+    all types if omitted. `ids` limits listing events to the ones mentioning
+    any of the entity ids, errors and pongs are passed through.
+    `raw` subscription gets undecoded `MetisMessageEvent`s, `ids` are ignored.
+
+    The queue is unbounded unless a bounded `policy` is given,
+    subscriptions waiting for responses to their own requests
+    must keep the default to never miss them.
+    `queue_size` is a shorthand for `MetisQueuePolicy(size=queue_size)`.
+
+    A subscription failed by the hub, e.g. when the stream is lost,
+    raises the `error` instead of waiting for the next message.
+    """
+
     hub: "MetisHub"
-    queue: "Queue[MetisEventDTO]"
+    queue: MetisSubscriptionQueue
+    types: Optional[FrozenSet[str]]
+    ids: Optional[FrozenSet[int]]
+    raw: bool
+    policy: MetisQueuePolicy
+    error: Optional[BaseException] = None
+    _failed: "Optional[Future[None]]" = None
 
+    # pylint: disable=too-many-arguments
     def __init__(
         self,
         hub: "MetisHub",
         predicate: Optional[Callable[[MetisEventDTO], bool]] = None,
         queue_size: int = 0,
+        types: Optional[Collection[str]] = None,
+        ids: Optional[Collection[int]] = None,
+        raw: bool = False,
+        policy: Optional[MetisQueuePolicy] = None,
     ) -> None:
         self.hub = hub
-        self.queue = Queue(maxsize=queue_size)
+        self.types = None if types is None else frozenset(types)
+        self.ids = None if ids is None else frozenset(ids)
+        self.raw = raw
+        self.policy = policy or MetisQueuePolicy(size=queue_size)
+        self.queue = self.policy.create_queue()
         self._predicate = predicate
 
-    def put_nowait(self, message: MetisEventDTO) -> None:
-        "Put message to query without wait"
+    @property
+    def dropped(self) -> int:
+        "Count of messages dropped on overflow"
+        return self.queue.dropped
+
+    @property
+    def coalesced(self) -> int:
+        "Count of messages replaced by newer ones"
+        return self.queue.coalesced
+
+    def _drop(self, message: MetisSubscriptionItem) -> None:
+        self.queue.dropped += 1
+        self.hub.metrics.inc(
+            "metis_subscription_dropped_total", overflow=self.policy.overflow
+        )
+        self.logger.warning(
+            "Subscription's queue is full, %s event dropped",
+            (
+                message.event_type
+                if isinstance(message, MetisMessageEvent)
+                else message.get("type")
+            ),
+        )
+
+    def _put_nowait(self, message: MetisSubscriptionItem) -> None:
+        if isinstance(self.queue, MetisCoalescingQueue) and self.queue.coalesce(
+            message
+        ):
+            self.hub.metrics.inc("metis_subscription_coalesced_total")
+            return
         try:
-            if self._predicate is None or self._predicate(message):
-                self.queue.put_nowait(message)
+            self.queue.put_nowait(message)
         except QueueFull:
-            self.logger.warning("Subscription's queue is full")
+            if self.policy.overflow in ("drop_oldest", "coalesce"):
+                oldest = self.queue.get_nowait()
+                self.queue.task_done()
+                if isinstance(oldest, BaseException):
+                    # the failure wake-up is never dropped, the new message is
+                    oldest, message = message, oldest
+                self._drop(oldest)
+                self.queue.put_nowait(message)
+            else:
+                self._drop(message)
+
+    def _match(self, message: MetisSubscriptionItem) -> bool:
+        if (
+            self.ids is not None
+            and not isinstance(message, MetisMessageEvent)
+            and message["type"] != "errors"
+        ):
+            data: Any = message.get("data")
+            if isinstance(data, dict) and not any(
+                isinstance(x, dict) and x.get("id") in self.ids
+                for x in data.get("data", [])
+            ):
+                return False
+        if self._predicate is None:
+            return True
+        evt_type = (
+            message.event_type
+            if isinstance(message, MetisMessageEvent)
+            else message["type"]
+        )
+        with self.hub.watchdog.measure("predicate", evt_type):
+            return self._predicate(cast(Any, message))
+
+    def put_nowait(self, message: MetisSubscriptionItem) -> None:
+        "Put message to query without wait"
+        if self._match(message):
+            self._put_nowait(message)
+
+    async def put(self, message: MetisSubscriptionItem) -> None:
+        "Put message to query, wait for a free slot if overflow policy is `block`"
+        if not self._match(message):
+            return
+        if self.policy.overflow != "block" or not self.queue.full():
+            self._put_nowait(message)
+            return
+        try:
+            await wait_for(self.queue.put(message), self.policy.block_timeout)
+        except AsyncioTimeoutError:
+            self._drop(message)
+
+    def fail(self, exc: BaseException) -> None:
+        "Fail the subscription, waiting messages are still delivered"
+        if self.error is not None:
+            return
+        self.error = exc
+        if self._failed is not None and not self._failed.done():
+            self._failed.set_result(None)
+        if self.queue.empty():
+            # wake up the reader
+            self.queue.put_nowait(cast(Any, exc))
 
     async def close(self) -> None:
         "Close subscription and join message queue"
@@ -64,7 +337,16 @@ class MetisSubscription(MetisBase):
 
     async def __aenter__(self) -> "MetisSubscription":
         self.hub.subscribe(self)
-        await self.hub.wait_connected()
+        if not self.hub.connected and self.error is None:
+            self._failed = get_running_loop().create_future()
+            connected = ensure_future(self.hub.wait_connected())
+            try:
+                await wait((connected, self._failed), return_when=FIRST_COMPLETED)
+            finally:
+                connected.cancel()
+        if self.error is not None:
+            self.hub.unsubscribe(self)
+            raise self.error
         return self.__aiter__()
 
     async def __aexit__(
@@ -80,8 +362,15 @@ class MetisSubscription(MetisBase):
 
     @asynccontextmanager
     async def _cm(self):
-        yield await self.queue.get()
+        if self.error is not None and self.queue.empty():
+            raise self.error
+        msg = await self.queue.get()
+        if isinstance(msg, BaseException):
+            self.queue.task_done()
+            raise msg
+        yield msg
+        self.queue.task_done()
 
     async def __anext__(self) -> MetisEventDTO:
         async with self._cm() as msg:
-            return msg
+            return cast(MetisEventDTO, msg)
@@ -0,0 +1,162 @@
+"""Tracers"""
+
+from abc import abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, ContextManager, Deque, Iterator, List, Optional, Protocol
+
+from ..compat import Dict
+from .base import MetisBase
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover
+    otel_trace = None  # type: ignore[assignment]
+
+MetisSpanAttributes = Dict[str, Any]
+
+
+class MetisSpan(Protocol):  # pylint: disable=too-few-public-methods
+    """Span interface, a subset of the OpenTelemetry one"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        "Set span attribute"
+
+
+class BaseTracer(MetisBase):
+    """
+    Base tracer class.
+    Spans are context managers, ended when the context is left.
+    Attributes: `http.method`, `http.url`, `http.status_code`,
+    `metis.event_type` and `metis.req_id`, which correlates
+    the HTTP acknowledgement of a request with its stream event.
+    """
+
+    enabled: bool = True
+
+    @abstractmethod
+    def span(
+        self, name: str, attributes: Optional[MetisSpanAttributes] = None
+    ) -> ContextManager[MetisSpan]:
+        "Start span"
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        "Ignore attribute"
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetisNoopTracer(BaseTracer):
+    """Tracer doing nothing, the default"""
+
+    enabled = False
+
+    def span(
+        self, name: str, attributes: Optional[MetisSpanAttributes] = None
+    ) -> ContextManager[MetisSpan]:
+        return _NOOP_SPAN
+
+
+class MetisRecordedSpan(MetisBase):  # pylint: disable=too-few-public-methods
+    """Span kept by `MetisRecordingTracer`"""
+
+    name: str
+    attributes: MetisSpanAttributes
+    parent: Optional["MetisRecordedSpan"]
+    started: float
+    ended: Optional[float] = None
+    error: Optional[BaseException] = None
+
+    def __init__(
+        self,
+        name: str,
+        attributes: Optional[MetisSpanAttributes] = None,
+        parent: Optional["MetisRecordedSpan"] = None,
+    ) -> None:
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.started = monotonic()
+
+    def __repr__(self) -> str:
+        return f"<MetisRecordedSpan {self.name} {self.attributes}>"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        "Set span attribute"
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> Optional[float]:
+        "Seconds from start to end, None if not ended"
+        return None if self.ended is None else self.ended - self.started
+
+
+_current_span: ContextVar[Optional[MetisRecordedSpan]] = ContextVar(
+    "metis_current_span", default=None
+)
+
+
+class MetisRecordingTracer(BaseTracer):
+    """
+    In-memory tracer keeping the last `max_spans` spans,
+    e.g. for tests or quick phase timings without OpenTelemetry.
+    Spans are nested within a task.
+    """
+
+    spans: Deque[MetisRecordedSpan]
+
+    def __init__(self, max_spans: Optional[int] = 1000) -> None:
+        self.spans = deque(maxlen=max_spans)
+
+    @contextmanager
+    def span(
+        self, name: str, attributes: Optional[MetisSpanAttributes] = None
+    ) -> Iterator[MetisSpan]:
+        span = MetisRecordedSpan(name, attributes, _current_span.get())
+        self.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = exc
+            raise
+        finally:
+            span.ended = monotonic()
+            _current_span.reset(token)
+
+    def operation(self, req_id: str) -> List[MetisRecordedSpan]:
+        "Spans of a request: the operation, HTTP request, decoding and publishing"
+        return [x for x in self.spans if x.attributes.get("metis.req_id") == req_id]
+
+
+class MetisOpenTelemetryTracer(BaseTracer):
+    """
+    OpenTelemetry adapter, requires `opentelemetry-api`.
+    Uses the tracer of `metis_client` instrumentation by default.
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+        if tracer is None:
+            if otel_trace is None:
+                raise ImportError("opentelemetry-api is required for tracing")
+            tracer = otel_trace.get_tracer("metis_client")  # pragma: no cover
+        self._tracer = tracer
+
+    def span(
+        self, name: str, attributes: Optional[MetisSpanAttributes] = None
+    ) -> ContextManager[MetisSpan]:
+        span: ContextManager[MetisSpan] = self._tracer.start_as_current_span(
+            name, attributes=attributes
+        )
+        return span
@@ -0,0 +1,63 @@
+"""Transports of HTTP requests and event streams"""
+
+from abc import abstractmethod
+from typing import Any, AsyncContextManager, Optional
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout
+from yarl import URL
+
+from ..compat import Dict, Mapping
+from .base import MetisBase
+
+
+class BaseTransport(MetisBase):
+    """
+    Base transport class, used by `MetisClient` to send requests
+    and to connect to event streams. Responses mimic `aiohttp.ClientResponse`,
+    errors are `aiohttp` exceptions.
+    """
+
+    @abstractmethod
+    async def request(self, method: str, url: URL, **opts: Any) -> ClientResponse:
+        """
+        Send request with `aiohttp.ClientSession.request` options,
+        the response body is left unread
+        """
+
+    @abstractmethod
+    def sse(
+        self,
+        url: URL,
+        params: Optional[Dict[str, Any]],
+        headers: Mapping[str, str],
+        timeout: Optional[float],
+    ) -> AsyncContextManager[ClientResponse]:
+        "Connect to `text/event-stream`, raise `ClientResponseError` on error status"
+
+
+class MetisAiohttpTransport(BaseTransport):
+    """Transport over `aiohttp.ClientSession`, the default"""
+
+    session: ClientSession
+
+    def __init__(self, session: ClientSession) -> None:
+        self.session = session
+
+    async def request(self, method: str, url: URL, **opts: Any) -> ClientResponse:
+        return await self.session.request(method, url, **opts)
+
+    def sse(
+        self,
+        url: URL,
+        params: Optional[Dict[str, Any]],
+        headers: Mapping[str, str],
+        timeout: Optional[float],
+    ) -> AsyncContextManager[ClientResponse]:
+        return self.session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=ClientTimeout(total=timeout, sock_connect=600, sock_read=None),
+            read_bufsize=2**19,
+            raise_for_status=True,
+        )
@@ -0,0 +1,108 @@
+"""Event loop blocking watchdogs"""
+
+from asyncio import Task, get_running_loop, sleep
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import ContextManager, Iterator, Optional
+
+from ..const import DEFAULT_LOOP_LAG_INTERVAL, DEFAULT_SLOW_OPERATION_THRESHOLD
+from .base import MetisBase
+from .metrics import MetisMetrics
+
+
+class MetisLoopWatchdog(MetisBase):
+    """
+    Opt-in detector of event loop blocking.
+    Synchronous stages, i.e. event decoding, subscription predicates
+    and callbacks, taking at least `threshold` seconds are logged
+    and counted by stage and event type. A probe measures the loop lag
+    every `interval` seconds, a lag of at least `threshold` is logged too.
+    Reports to `metrics`, the registry of the client by default.
+    """
+
+    enabled: bool = True
+    threshold: float
+    interval: float
+    metrics: Optional[MetisMetrics]
+    lag: float = 0
+    _probe_task: Optional[Task] = None
+    _clients: int = 0
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SLOW_OPERATION_THRESHOLD,
+        interval: float = DEFAULT_LOOP_LAG_INTERVAL,
+        metrics: Optional[MetisMetrics] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.metrics = metrics
+
+    def report(self, stage: str, evt_type: Optional[str], elapsed: float) -> None:
+        "Report the stage if it took too long"
+        if elapsed < self.threshold:
+            return
+        self.logger.warning(
+            "Slow %s of %s event blocked the event loop for %.3f seconds",
+            stage,
+            evt_type or "any",
+            elapsed,
+        )
+        if self.metrics is not None:
+            self.metrics.inc(
+                "metis_slow_operations_total", stage=stage, type=evt_type or ""
+            )
+
+    @contextmanager
+    def measure(self, stage: str, evt_type: Optional[str] = None) -> Iterator[None]:
+        "Time synchronous stage"
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.report(stage, evt_type, perf_counter() - started)
+
+    async def _probe(self) -> None:
+        loop = get_running_loop()
+        while True:
+            started = loop.time()
+            await sleep(self.interval)
+            self.lag = max(loop.time() - started - self.interval, 0)
+            if self.metrics is not None:
+                self.metrics.observe("metis_loop_lag_seconds", self.lag)
+            if self.lag >= self.threshold:
+                self.logger.warning("Event loop was blocked for %.3f seconds", self.lag)
+
+    @property
+    def running(self) -> bool:
+        "Check if the loop lag probe is running"
+        return self._probe_task is not None
+
+    def start(self) -> None:
+        "Start loop lag probe, shared by clients"
+        self._clients += 1
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = get_running_loop().create_task(
+                self._probe(), name="LoopLagProbeTask"
+            )
+
+    def stop(self) -> None:
+        "Stop loop lag probe when the last client stops"
+        self._clients = max(self._clients - 1, 0)
+        if self._probe_task is not None and not self._clients:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+
+class MetisNoopWatchdog(MetisLoopWatchdog):
+    """Watchdog measuring nothing, the default"""
+
+    enabled = False
+
+    def measure(  # type: ignore[override]
+        self, stage: str, evt_type: Optional[str] = None
+    ) -> ContextManager[None]:
+        return nullcontext()
+
+    def start(self) -> None:
+        pass
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional, Tuple
 
 from yarl import URL
 
@@ -10,6 +10,7 @@ from ..client import MetisClient
 from ..models.base import MetisBase
 
 if TYPE_CHECKING:  # pragma: no cover
+    from ..models.subscription import MetisSubscription
     from .root import MetisRootNamespace
 
 
@@ -20,6 +21,7 @@ class BaseNamespace(MetisBase):  # pylint: disable=too-few-public-methods
     _client: MetisClient
     _auth_required: bool = True
     _root: MetisRootNamespace
+    _event_types: Optional[Tuple[str, ...]] = None
 
     def __init__(
         self,
@@ -37,3 +39,9 @@ class BaseNamespace(MetisBase):  # pylint: disable=too-few-public-methods
 
     def __post_init__(self) -> None:
         """Post initialisation."""
+
+    def _subscribe(self, raw: bool = False) -> MetisSubscription:
+        """Subscribe to the stream events of the namespace."""
+        # waiters of request results keep the default unbounded queue,
+        # a bounded one may drop the awaited event under a burst
+        return self._root.stream.subscribe(types=self._event_types, raw=raw)
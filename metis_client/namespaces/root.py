@@ -1,5 +1,7 @@
 """Root namespace"""
 
+from typing import Optional
+
 from yarl import URL
 
 from ..client import MetisClient
@@ -10,7 +12,7 @@ from .v0 import MetisV0Namespace
 
 
 class MetisRootNamespace(BaseNamespace):
-    """Root namespace"""
+    """Root namespace, the nested namespaces are created on first use"""
 
     def __init__(
         self,
@@ -22,26 +24,38 @@ class MetisRootNamespace(BaseNamespace):
         """Initialise the namespace."""
         super().__init__(client, base_url, root or self, auth_req)
 
-    def __post_init__(self) -> None:
-        self.__ns_calculations = MetisCalculationsNamespace(
-            self._client, self._base_url / "calculations", root=self
-        )
-        self.__ns_v0 = MetisV0Namespace(self._client, self._base_url / "v0", root=self)
-        self.__ns_stream = MetisStreamNamespace(
-            self._client, self._base_url / "stream", root=self
-        )
+    __ns_calculations: Optional[MetisCalculationsNamespace] = None
+    __ns_v0: Optional[MetisV0Namespace] = None
+    __ns_stream: Optional[MetisStreamNamespace] = None
 
     @property
     def calculations(self) -> "MetisCalculationsNamespace":
         """Property to access the calculations namespace."""
+        if self.__ns_calculations is None:
+            self.__ns_calculations = MetisCalculationsNamespace(
+                self._client, self._base_url / "calculations", root=self
+            )
         return self.__ns_calculations
 
     @property
     def v0(self) -> "MetisV0Namespace":  # pylint: disable=invalid-name
         """Property to access the v0 namespace."""
+        if self.__ns_v0 is None:
+            self.__ns_v0 = MetisV0Namespace(
+                self._client, self._base_url / "v0", root=self
+            )
         return self.__ns_v0
 
     @property
     def stream(self) -> "MetisStreamNamespace":
         """Property to access the stream namespace."""
+        if self.__ns_stream is None:
+            self.__ns_stream = MetisStreamNamespace(
+                self._client, self._base_url / "stream", root=self
+            )
         return self.__ns_stream
+
+    def close(self) -> None:
+        "Close the stream if it was used"
+        if self.__ns_stream is not None:
+            self.__ns_stream.close()
@@ -1,65 +1,414 @@
 """Stream endpoint namespace"""
 
 import asyncio
-from typing import Optional
+from concurrent.futures import Executor
+from contextlib import suppress
+from dataclasses import dataclass
+from random import uniform
+from time import monotonic
+from typing import Optional, Tuple, cast
 
-from aiohttp_sse_client.client import MessageEvent
-
-from ..compat import Callable
-from ..dtos import MetisEventDTO
+from ..compat import Callable, Unpack
+from ..const import (
+    DEFAULT_STREAM_BUFFER_SIZE,
+    DEFAULT_STREAM_DECODE_THRESHOLD,
+    DEFAULT_STREAM_MAX_RETRIES,
+    DEFAULT_STREAM_POLL_DURATION,
+    DEFAULT_STREAM_POLL_INTERVAL,
+    DEFAULT_STREAM_POLL_MAX_INTERVAL,
+    DEFAULT_STREAM_STALL_TIMEOUT,
+)
+from ..dtos import (
+    MetisEventDTO,
+    MetisRequestIdDTO,
+    MetisStreamHealthDTO,
+    MetisStreamTransport,
+)
+from ..exc import MetisConnectionException, MetisException
 from ..models import MetisHub, MetisMessageEvent, MetisSubscription
+from ..models.subscription import MetisSubscriptionKwargs, RequestIdCallable
 from .base import BaseNamespace
 
 
+def decode_event(msg: MetisMessageEvent) -> MetisEventDTO:
+    "Decode SSE event, module level to be picklable for process pools"
+    return msg.to_dto()
+
+
+@dataclass
+class MetisStreamState:
+    "Connection state and health counters of the stream"
+
+    transport: MetisStreamTransport = "sse"
+    last_event_id: str = ""
+    last_event_at: Optional[float] = None
+    connections: int = 0
+    stalls: int = 0
+    stalls_in_row: int = 0
+    reader_lag: float = 0
+    decoder_lag: float = 0
+
+
 class MetisStreamNamespace(BaseNamespace):
-    """Stream endpoints namespace"""
+    """
+    Stream endpoints namespace.
+
+    The SSE reader only enqueues raw events into a buffer of `buffer_size`,
+    a separate decoder task decodes them and publishes to the hub,
+    so slow decoding does not stall the socket.
+    Events with data of at least `decode_threshold` characters are decoded
+    in `decode_executor` if set, e.g. a thread or process pool.
+    A watchdog pings a quiet stream to provoke a pong and reconnects
+    after `stall_timeout` seconds without any event, `None` disables it.
+    Lost connections are retried up to `max_retries` times in a row,
+    then subscriptions and result waiters fail with the connection error.
+
+    With `polling_fallback` a lost or repeatedly stalled stream is replaced
+    by short polls of `poll_duration` seconds, e.g. behind proxies killing
+    long-lived connections. The interval between polls starts
+    at `poll_interval` and doubles up to `poll_max_interval` with jitter
+    while polls bring nothing. A poll is cut after `poll_duration`, so
+    events held back by a buffering proxy never reach the client, the next
+    poll resumes from the id of the last event taken (`Last-Event-ID`)
+    for the server to send them again. The stream returns to SSE once idle.
+
+    Background tasks are started by the first subscription, fired request
+    or result wait.
+    """
+
+    buffer_size: int = DEFAULT_STREAM_BUFFER_SIZE
+    decode_executor: Optional[Executor] = None
+    decode_threshold: int = DEFAULT_STREAM_DECODE_THRESHOLD
+    stall_timeout: Optional[float] = DEFAULT_STREAM_STALL_TIMEOUT
+    max_retries: Optional[int] = DEFAULT_STREAM_MAX_RETRIES
+    polling_fallback: bool = False
+    poll_interval: float = DEFAULT_STREAM_POLL_INTERVAL
+    poll_max_interval: float = DEFAULT_STREAM_POLL_MAX_INTERVAL
+    poll_duration: float = DEFAULT_STREAM_POLL_DURATION
 
     _hub: MetisHub
     _stream_task: Optional[asyncio.Task] = None
     _sse_client_task: Optional[asyncio.Task] = None
+    _decoder_task: Optional[asyncio.Task] = None
+    _watchdog_task: Optional[asyncio.Task] = None
     _subscribe_event: asyncio.Event
+    _buffer: "asyncio.Queue[Tuple[float, MetisMessageEvent]]"
+    _state: MetisStreamState
 
     def __post_init__(self) -> None:
-        self._hub = MetisHub()
+        self._state = MetisStreamState()
+        self._hub = MetisHub(
+            tracer=self._client.tracer,
+            metrics=self._client.metrics,
+            watchdog=self._client.watchdog,
+        )
+        self._client.metrics.register(self._hub.collect)
+        return super().__post_init__()
+
+    def _start(self) -> None:
+        if self._stream_task is not None:
+            return
+        self._client.watchdog.start()
+        self._buffer = asyncio.Queue(self.buffer_size)
+        self._subscribe_event = asyncio.Event()
         self._stream_task = asyncio.create_task(
             self._stream_consumer(), name="StreamConsumerTask"
         )
-        self._subscribe_event = asyncio.Event()
-        return super().__post_init__()
 
-    async def _stream_consumer(self):
-        def on_open():
-            self._hub.set_connected()
+    @property
+    def hub(self) -> MetisHub:
+        "Hub routing the decoded events to subscriptions and result waiters"
+        return self._hub
+
+    @property
+    def reader_lag(self) -> float:
+        "Seconds the SSE reader last waited for a free slot in the buffer"
+        return self._state.reader_lag
 
-        def on_message(evt: MessageEvent):
+    @property
+    def decoder_lag(self) -> float:
+        "Seconds the last decoded event waited in the buffer"
+        return self._state.decoder_lag
+
+    @property
+    def buffered(self) -> int:
+        "Number of events waiting for decoding"
+        return 0 if self._stream_task is None else self._buffer.qsize()
+
+    @property
+    def transport(self) -> MetisStreamTransport:
+        "Active transport of the stream events"
+        return self._state.transport
+
+    @property
+    def health(self) -> MetisStreamHealthDTO:
+        "Stream health report"
+        return {
+            "transport": self._state.transport,
+            "connected": self._hub.connected,
+            "last_event_age": (
+                None
+                if self._state.last_event_at is None
+                else monotonic() - self._state.last_event_at
+            ),
+            "reconnects": max(self._state.connections - 1, 0),
+            "stalls": self._state.stalls,
+            "buffered": self.buffered,
+            "reader_lag": self._state.reader_lag,
+            "decoder_lag": self._state.decoder_lag,
+        }
+
+    def _on_open(self) -> None:
+        self._state.connections += 1
+        self._state.last_event_at = monotonic()
+        self._hub.set_connected()
+
+    async def _on_message(self, msg: MetisMessageEvent) -> None:
+        evt_type = msg.event_type
+        with self._client.watchdog.measure("callback", evt_type):
+            self._state.last_event_at = monotonic()
+            self._state.stalls_in_row = 0
             self._hub.set_connected()
-            evt_dto = MetisMessageEvent.from_dto(evt).to_dto()
-            self._hub.publish(evt_dto)
-            # cancel streaming task if no subscribers
-            if self._sse_client_task and len(self._hub) == 0:
-                self._hub.set_disconnected()
-                self._sse_client_task.cancel()
+            self._client.metrics.inc("metis_stream_events_total", type=evt_type)
+            # decode only the events someone is waiting for, once for all
+            wanted = (
+                self._hub.wants(evt_type)
+                or self._hub.wants(evt_type, raw=True)
+                or self._hub.records(evt_type, msg.req_id)
+            )
+        if wanted:
+            if self._buffer.full():
+                started = monotonic()
+                await self._buffer.put((monotonic(), msg))
+                self._state.reader_lag = monotonic() - started
+            else:
+                self._state.reader_lag = 0
+                self._buffer.put_nowait((monotonic(), msg))
+        else:
+            self._disconnect_idle()
+        # resume from events taken only, a cut poll may wait on a full buffer
+        if msg.last_event_id:
+            self._state.last_event_id = msg.last_event_id
 
+    def _disconnect_idle(self) -> None:
+        # cancel streaming task if no subscribers, waiters or expected requests
+        if self._sse_client_task and self._hub.idle:
+            self._hub.set_disconnected()
+            self._sse_client_task.cancel()
+            self._state.transport = "sse"
+
+    async def _decode(self, msg: MetisMessageEvent) -> MetisEventDTO:
+        tracer = self._client.tracer
+        attributes = None
+        if tracer.enabled:
+            attributes = {
+                "metis.event_type": msg.event_type,
+                "metis.size": len(msg.data),
+            }
+            if msg.req_id:
+                attributes["metis.req_id"] = msg.req_id
+        started = monotonic()
+        with tracer.span("metis.decode", attributes):
+            if self.decode_executor is None or len(msg.data) < self.decode_threshold:
+                with self._client.watchdog.measure("decode", msg.event_type):
+                    dto = decode_event(msg)
+            else:
+                dto = await asyncio.get_running_loop().run_in_executor(
+                    self.decode_executor, decode_event, msg
+                )
+        self._client.metrics.observe(
+            "metis_stream_decode_seconds", monotonic() - started, type=msg.event_type
+        )
+        return dto
+
+    async def _stream_decoder(self) -> None:
+        while True:
+            queued_at, msg = await self._buffer.get()
+            self._state.decoder_lag = monotonic() - queued_at
+            try:
+                dto = None
+                if self._hub.wants(msg.event_type, raw=True):
+                    await self._hub.publish_async(msg)
+                if self._hub.wants(msg.event_type):
+                    dto = await self._decode(msg)
+                    await self._hub.publish_async(dto)
+                self._hub.record(msg, dto)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Stream event decoding failed")
+            finally:
+                self._buffer.task_done()
+            self._disconnect_idle()
+
+    def _fall_back(self) -> None:
+        self.logger.warning("Stream is unavailable, falling back to polling")
+        self._state.transport = "polling"
+        self._subscribe_event.set()
+
+    def _on_sse_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        exc = task.exception()
+        self._hub.set_disconnected()
+        if self.polling_fallback and self._state.transport == "sse":
+            self._fall_back()
+            return
+        self.logger.error("Stream is lost: %s", exc)
+        self._state.transport = "sse"
+        self._hub.fail(cast(BaseException, exc))
+
+    async def _poll(self) -> None:
+        # the SSE client ends quietly when cancelled, which `wait_for` swallows
+        # on Python 3.12+, so the poll gets a task of its own
+        poll = asyncio.create_task(
+            self._client.sse(
+                self._base_url,
+                self._on_message,
+                self._hub.set_connected,
+                max_retries=0,
+                last_event_id=self._state.last_event_id,
+            ),
+            name="StreamPollTask",
+        )
+        try:
+            await asyncio.wait([poll], timeout=self.poll_duration)
+        finally:
+            poll.cancel()
+            await asyncio.wait([poll])
+        if not poll.cancelled() and poll.exception() is not None:
+            raise cast(BaseException, poll.exception())
+
+    async def _stream_poller(self) -> None:
+        interval = self.poll_interval
+        failures = 0
+        while True:
+            last_event_at = self._state.last_event_at
+            try:
+                await self._poll()
+                failures = 0
+            except MetisConnectionException:
+                failures += 1
+                if self.max_retries is not None and failures > self.max_retries:
+                    raise
+            if self._state.last_event_at != last_event_at:
+                interval = self.poll_interval
+            else:
+                interval = min(interval * 2, self.poll_max_interval)
+            await asyncio.sleep(interval * uniform(0.5, 1.5))
+
+    async def _reconnect(self) -> None:
+        task = self._sse_client_task
+        self._hub.set_disconnected()
+        if task:
+            task.cancel()
+            await asyncio.wait([task])
+        self._subscribe_event.set()
+
+    async def _stream_watchdog(self) -> None:
+        while True:
+            timeout = self.stall_timeout
+            await asyncio.sleep((timeout or DEFAULT_STREAM_STALL_TIMEOUT) / 4)
+            task = self._sse_client_task
+            if not timeout or task is None or task.done():
+                continue
+            if self._hub.idle:
+                self._disconnect_idle()
+                continue
+            if self._state.transport == "polling":
+                # polls are scheduled by the poller
+                continue
+            silence = monotonic() - (self._state.last_event_at or 0)
+            if silence >= timeout:
+                self.logger.warning(
+                    "Stream stalled for %.1f seconds, reconnecting", silence
+                )
+                self._state.stalls += 1
+                self._state.stalls_in_row += 1
+                if self.polling_fallback and self._state.stalls_in_row > 1:
+                    self._fall_back()
+                await self._reconnect()
+            elif silence >= timeout / 2:
+                # a healthy stream answers with a pong
+                with suppress(Exception, MetisException):
+                    await asyncio.wait_for(self._root.v0.ping(), timeout / 4)
+
+    async def _stream_consumer(self):
+        self._decoder_task = asyncio.create_task(
+            self._stream_decoder(), name="StreamDecoderTask"
+        )
+        self._watchdog_task = asyncio.create_task(
+            self._stream_watchdog(), name="StreamWatchdogTask"
+        )
         while True:
             await self._subscribe_event.wait()
             if self._sse_client_task is None or self._sse_client_task.done():
+                self._state.last_event_at = monotonic()
                 self._sse_client_task = asyncio.create_task(
-                    self._client.sse(self._base_url, on_message, on_open),
+                    (
+                        self._stream_poller()
+                        if self._state.transport == "polling"
+                        else self._client.sse(
+                            self._base_url,
+                            self._on_message,
+                            self._on_open,
+                            max_retries=self.max_retries,
+                            last_event_id=self._state.last_event_id,
+                        )
+                    ),
                     name="SSEClientTask",
                 )
+                self._sse_client_task.add_done_callback(self._on_sse_done)
             self._subscribe_event.clear()
-            while not self._hub.connected:
+            # the task may be cancelled or fail meanwhile
+            while not self._hub.connected and not self._sse_client_task.done():
                 await asyncio.sleep(0.1)
-                await self._root.v0.ping()
+                with suppress(Exception, MetisException):
+                    await self._root.v0.ping()
 
     def close(self):
         "Close background stream consumer"
+        self._client.metrics.unregister(self._hub.collect)
         if self._stream_task:
+            self._client.watchdog.stop()
             self._stream_task.cancel()
+        if self._decoder_task:
+            self._decoder_task.cancel()
+        if self._watchdog_task:
+            self._watchdog_task.cancel()
         if self._sse_client_task:
             self._sse_client_task.cancel()
 
-    def subscribe(self, predicate: Optional[Callable[[MetisEventDTO], bool]] = None):
-        "Subscribe to stream"
+    async def fire(self, func: RequestIdCallable) -> MetisRequestIdDTO:
+        """
+        Do a request with the stream connected and expect its event,
+        to be collected later with `result()`. The stream is kept connected
+        until the event arrives or the hub history expires the request.
+        """
+        async with self.subscribe(types=()):
+            with self._hub.history.firing():
+                resp = await func()
+            self._hub.history.expect(resp["req_id"])
+        return resp
+
+    async def result(
+        self, req_id: str, timeout: Optional[float] = None
+    ) -> MetisEventDTO:
+        """
+        Get the first event of a request, even if it was published earlier
+        provided the request was done with `fire()`.
+        """
+        self._start()
+        self._subscribe_event.set()
+        return await self._hub.wait_result(req_id, timeout)
+
+    def subscribe(
+        self,
+        predicate: Optional[Callable[[MetisEventDTO], bool]] = None,
+        **opts: Unpack[MetisSubscriptionKwargs],
+    ):
+        """
+        Subscribe to stream.
+        Pass a `MetisQueuePolicy` as `policy` to bound the subscription queue.
+        """
+        self._start()
         self._subscribe_event.set()
-        return MetisSubscription(self._hub, predicate=predicate)
+        return MetisSubscription(self._hub, predicate=predicate, **opts)
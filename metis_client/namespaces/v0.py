@@ -1,5 +1,7 @@
 """v0 namespace"""
 
+from typing import Optional
+
 from .base import BaseNamespace
 from .v0_auth import MetisV0AuthNamespace
 from .v0_calculations import MetisV0CalculationsNamespace
@@ -8,21 +10,12 @@ from .v0_datasources import MetisV0DatasourcesNamespace
 
 
 class MetisV0Namespace(BaseNamespace):
-    """v0 namespace"""
-
-    def __post_init__(self) -> None:
-        self.__ns_auth = MetisV0AuthNamespace(
-            self._client, self._base_url / "auth", root=self._root
-        )
-        self.__ns_calculations = MetisV0CalculationsNamespace(
-            self._client, self._base_url / "calculations", root=self._root
-        )
-        self.__ns_collections = MetisV0CollectionsNamespace(
-            self._client, self._base_url / "collections", root=self._root
-        )
-        self.__ns_datasources = MetisV0DatasourcesNamespace(
-            self._client, self._base_url / "datasources", root=self._root
-        )
+    """v0 namespace, the nested namespaces are created on first use"""
+
+    __ns_auth: Optional[MetisV0AuthNamespace] = None
+    __ns_calculations: Optional[MetisV0CalculationsNamespace] = None
+    __ns_collections: Optional[MetisV0CollectionsNamespace] = None
+    __ns_datasources: Optional[MetisV0DatasourcesNamespace] = None
 
     async def ping(self) -> None:
         "Run ping pong game"
@@ -31,19 +24,35 @@ class MetisV0Namespace(BaseNamespace):
     @property
     def auth(self) -> MetisV0AuthNamespace:
         "Property to access the auth namespace."
+        if self.__ns_auth is None:
+            self.__ns_auth = MetisV0AuthNamespace(
+                self._client, self._base_url / "auth", root=self._root
+            )
         return self.__ns_auth
 
     @property
     def calculations(self) -> MetisV0CalculationsNamespace:
         "Property to access the calculations namespace."
+        if self.__ns_calculations is None:
+            self.__ns_calculations = MetisV0CalculationsNamespace(
+                self._client, self._base_url / "calculations", root=self._root
+            )
         return self.__ns_calculations
 
     @property
     def collections(self) -> MetisV0CollectionsNamespace:
         "Property to access the collections namespace."
+        if self.__ns_collections is None:
+            self.__ns_collections = MetisV0CollectionsNamespace(
+                self._client, self._base_url / "collections", root=self._root
+            )
         return self.__ns_collections
 
     @property
     def datasources(self) -> MetisV0DatasourcesNamespace:
         "Property to access the datasources namespace."
+        if self.__ns_datasources is None:
+            self.__ns_datasources = MetisV0DatasourcesNamespace(
+                self._client, self._base_url / "datasources", root=self._root
+            )
         return self.__ns_datasources
@@ -3,7 +3,7 @@
 from datetime import datetime
 from functools import partial
 from inspect import iscoroutinefunction
-from typing import Awaitable, Callable, Optional, Union, cast
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union, cast
 from warnings import warn
 
 from ..compat import Sequence
@@ -15,7 +15,7 @@ from ..dtos import (
 )
 from ..exc import MetisPayloadException
 from ..helpers import metis_json_decoder, raise_on_metis_error
-from ..models import act_and_get_result_from_stream
+from ..models import act_and_get_result_from_stream, act_and_iter_items_from_stream
 from .base import BaseNamespace
 
 DATA_SOURCE_CALC_RESULT_TYPES = [DataSourceType.PROPERTY, DataSourceType.PATTERN]
@@ -28,6 +28,8 @@ MetisCalculationOnProgressT = Callable[
 class MetisV0CalculationsNamespace(BaseNamespace):
     """Calculations endpoints namespace"""
 
+    _event_types = ("calculations", "errors")
+
     async def cancel_event(self, calc_id: int) -> MetisRequestIdDTO:
         "Cancel calculation"
         async with await self._client.request(
@@ -40,7 +42,7 @@ class MetisV0CalculationsNamespace(BaseNamespace):
     async def cancel(self, calc_id: int) -> None:
         "Cancel calculation and wait for result"
         await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.cancel_event, calc_id)
+            self._subscribe, partial(self.cancel_event, calc_id)
         )
 
     async def create_event(
@@ -69,7 +71,7 @@ class MetisV0CalculationsNamespace(BaseNamespace):
         if engine not in valid_engines:
             raise MetisPayloadException(message="unsupported engine", status=400)
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe,
+            self._subscribe,
             partial(self.create_event, data_id, engine, input),
         )
         if evt["type"] == "calculations":
@@ -79,6 +81,15 @@ class MetisV0CalculationsNamespace(BaseNamespace):
             )
             return data[-1] if data else None
 
+    async def _on_progress(
+        self, on_progress: MetisCalculationOnProgressT, calc: MetisCalculationDTO
+    ) -> Optional[bool]:
+        if iscoroutinefunction(on_progress):
+            return cast(Optional[bool], await on_progress(calc))
+        # sync callbacks block the event loop
+        with self._client.watchdog.measure("callback", "calculations"):
+            return cast(Optional[bool], on_progress(calc))
+
     async def _get_results(
         self,
         calc_getter: Callable[[], Awaitable[Optional[MetisCalculationDTO]]],
@@ -113,7 +124,9 @@ class MetisV0CalculationsNamespace(BaseNamespace):
                 and data_id in ds["parents"]
             ]
 
-        async with self._root.stream.subscribe() as sub:
+        async with self._root.stream.subscribe(
+            types=("calculations", "datasources")
+        ) as sub:
             target_calc = await calc_getter()
             if not target_calc:
                 return  # pragma: no cover
@@ -126,11 +139,7 @@ class MetisV0CalculationsNamespace(BaseNamespace):
 
                     # run callback if any and exit if needed
                     if target_calc and on_progress:
-                        if (
-                            await on_progress(target_calc)
-                            if iscoroutinefunction(on_progress)
-                            else on_progress(target_calc)
-                        ) is False:
+                        if await self._on_progress(on_progress, target_calc) is False:
                             return
 
                 # results
@@ -186,12 +195,19 @@ class MetisV0CalculationsNamespace(BaseNamespace):
     async def list(self) -> Sequence[MetisCalculationDTO]:
         "List all user's calculations and wait for result"
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.list_event)
+            self._subscribe, partial(self.list_event)
         )
         if evt["type"] == "calculations":
             return evt.get("data", {}).get("data", [])
         return []  # pragma: no cover
 
+    async def list_iter(self) -> AsyncIterator[MetisCalculationDTO]:
+        "List all user's calculations, yield them one by one as they are decoded"
+        async for item in act_and_iter_items_from_stream(
+            partial(self._subscribe, raw=True), self.list_event
+        ):
+            yield item
+
     async def get(self, calc_id: int) -> Optional[MetisCalculationDTO]:
         "Get calculation by id"
         data = list(filter(lambda x: x["id"] == calc_id, await self.list()))
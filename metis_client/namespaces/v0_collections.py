@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from functools import partial
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from ..compat import NotRequired, Sequence, TypedDict, Unpack
 from ..dtos import (
@@ -12,7 +12,7 @@ from ..dtos import (
     MetisRequestIdDTO,
 )
 from ..helpers import metis_json_decoder, raise_on_metis_error
-from ..models import act_and_get_result_from_stream
+from ..models import act_and_get_result_from_stream, act_and_iter_items_from_stream
 from .base import BaseNamespace
 
 
@@ -28,6 +28,8 @@ class MetisCollectionsCreateKwargs(TypedDict):
 class MetisV0CollectionsNamespace(BaseNamespace):
     """Collections endpoints namespace"""
 
+    _event_types = ("collections", "errors")
+
     async def create_event(
         self, type_id: int, title: str, **opts: Unpack[MetisCollectionsCreateKwargs]
     ) -> MetisRequestIdDTO:
@@ -57,7 +59,7 @@ class MetisV0CollectionsNamespace(BaseNamespace):
     ) -> Optional[MetisCollectionDTO]:
         "Create or edit the collection and wait for the result"
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe,
+            self._subscribe,
             partial(self.create_event, type_id, title, **opts),
         )
         if evt["type"] == "collections":
@@ -80,12 +82,19 @@ class MetisV0CollectionsNamespace(BaseNamespace):
     async def list(self) -> Sequence[MetisCollectionDTO]:
         "List user's collections by criteria and wait for result"
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.list_event)
+            self._subscribe, partial(self.list_event)
         )
         if evt["type"] == "collections":
             return evt.get("data", {}).get("data", [])
         return []  # pragma: no cover
 
+    async def list_iter(self) -> AsyncIterator[MetisCollectionDTO]:
+        "List user's collections, yield them one by one as they are decoded"
+        async for item in act_and_iter_items_from_stream(
+            partial(self._subscribe, raw=True), self.list_event
+        ):
+            yield item
+
     async def delete_event(self, collection_id: int) -> MetisRequestIdDTO:
         "Remove a collection"
         async with await self._client.request(
@@ -98,5 +107,5 @@ class MetisV0CollectionsNamespace(BaseNamespace):
     async def delete(self, collection_id: int) -> None:
         "Remove a collection by id and wait for result"
         await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.delete_event, collection_id)
+            self._subscribe, partial(self.delete_event, collection_id)
         )
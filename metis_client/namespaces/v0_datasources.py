@@ -1,19 +1,39 @@
 """Datasources endpoints namespace"""
 
+from asyncio import get_running_loop
 from datetime import datetime
 from functools import partial
-from typing import Optional
+from os import PathLike
+from typing import AsyncIterable, AsyncIterator, Dict, Optional, Union
 
-from ..compat import Sequence
-from ..dtos import MetisDataSourceContentOnlyDTO, MetisDataSourceDTO, MetisRequestIdDTO
-from ..helpers import metis_json_decoder, raise_on_metis_error
-from ..models import act_and_get_result_from_stream
+from aiohttp.hdrs import CONTENT_ENCODING, CONTENT_TYPE
+
+from ..compat import Callable, Sequence
+from ..dtos import (
+    MetisDataSourceContentOnlyDTO,
+    MetisDataSourceDTO,
+    MetisEventDTO,
+    MetisRequestIdDTO,
+)
+from ..exc import MetisError
+from ..helpers import (
+    gzip_stream_encoder,
+    metis_json_decoder,
+    metis_json_stream_decoder,
+    metis_json_stream_encoder,
+    raise_on_metis_error,
+)
+from ..models import act_and_get_result_from_stream, act_and_iter_items_from_stream
 from .base import BaseNamespace
 
 
 class MetisV0DatasourcesNamespace(BaseNamespace):
     """Datasources endpoints namespace"""
 
+    _event_types = ("datasources", "errors")
+
+    _upload_chunk_size = 2**16
+
     async def create_event(
         self, content: str, fmt: Optional[str] = None, name: Optional[str] = None
     ) -> MetisRequestIdDTO:
@@ -31,14 +51,126 @@ class MetisV0DatasourcesNamespace(BaseNamespace):
     ) -> Optional[MetisDataSourceDTO]:
         "Create data source and wait for the result"
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.create_event, content, fmt, name)
+            self._subscribe, partial(self.create_event, content, fmt, name)
         )
+        return self._get_created(evt)
+
+    async def _create_event_from_chunks(
+        self,
+        chunks_factory: Callable[[], AsyncIterable[Union[str, bytes]]],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+    ) -> MetisRequestIdDTO:
+        "Create data source from content chunks without assembling the body"
+
+        def body_factory() -> AsyncIterable[bytes]:
+            body = metis_json_stream_encoder(
+                "content", chunks_factory(), {"fmt": fmt, "name": name}
+            )
+            return gzip_stream_encoder(body) if compress else body
+
+        headers: Dict[str, str] = {CONTENT_TYPE: "application/json"}
+        if compress:
+            headers[CONTENT_ENCODING] = "gzip"
+        async with self._client.request(
+            method="POST",
+            url=self._base_url,
+            data=body_factory,
+            headers=headers,
+            auth_required=True,
+        ) as resp:
+            return await resp.json(loads=metis_json_decoder)
+
+    async def create_event_from_file(
+        self,
+        path: Union[str, "PathLike[str]"],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+    ) -> MetisRequestIdDTO:
+        """
+        Create data source from the file.
+        `compress` enables gzip request body, use only if the server accepts it.
+        """
+
+        async def read_file() -> AsyncIterator[bytes]:
+            # the file is read in the default executor, off the event loop
+            loop = get_running_loop()
+            in_file = await loop.run_in_executor(None, open, path, "rb")
+            try:
+                while chunk := await loop.run_in_executor(
+                    None, in_file.read, self._upload_chunk_size
+                ):
+                    yield chunk
+            finally:
+                await loop.run_in_executor(None, in_file.close)
+
+        return await self._create_event_from_chunks(read_file, fmt, name, compress)
+
+    async def create_from_file(
+        self,
+        path: Union[str, "PathLike[str]"],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+    ) -> Optional[MetisDataSourceDTO]:
+        "Create data source from the file and wait for the result"
+        evt = await act_and_get_result_from_stream(
+            self._subscribe,
+            partial(self.create_event_from_file, path, fmt, name, compress),
+        )
+        return self._get_created(evt)
+
+    async def create_event_from_stream(
+        self,
+        chunks: AsyncIterable[Union[str, bytes]],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+    ) -> MetisRequestIdDTO:
+        """
+        Create data source from async iterable of content chunks.
+        The stream is consumed once, so the request is not retried.
+        `compress` enables gzip request body, use only if the server accepts it.
+        """
+        consumed = False
+
+        def chunks_factory() -> AsyncIterable[Union[str, bytes]]:
+            nonlocal consumed
+            if consumed:
+                raise MetisError(
+                    status=None, message="content stream cannot be replayed"
+                )
+            consumed = True
+            return chunks
+
+        return await self._create_event_from_chunks(chunks_factory, fmt, name, compress)
+
+    async def create_from_stream(
+        self,
+        chunks: AsyncIterable[Union[str, bytes]],
+        fmt: Optional[str] = None,
+        name: Optional[str] = None,
+        compress: bool = False,
+    ) -> Optional[MetisDataSourceDTO]:
+        "Create data source from async iterable of content chunks and wait"
+        evt = await act_and_get_result_from_stream(
+            self._subscribe,
+            partial(self.create_event_from_stream, chunks, fmt, name, compress),
+        )
+        return self._get_created(evt)
+
+    @staticmethod
+    def _get_created(evt: MetisEventDTO) -> Optional[MetisDataSourceDTO]:
+        "Get the latest data source of the event"
         if evt["type"] == "datasources":
             data = sorted(
                 evt.get("data", {}).get("data", []),
                 key=lambda x: x.get("created_at", datetime.fromordinal(1)),
             )
             return data[-1] if data else None
+        return None  # pragma: no cover
 
     async def delete_event(self, data_id: int) -> MetisRequestIdDTO:
         "Delete data source by id"
@@ -52,7 +184,7 @@ class MetisV0DatasourcesNamespace(BaseNamespace):
     async def delete(self, data_id: int) -> None:
         "Delete data source by id and wait for the result"
         await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.delete_event, data_id)
+            self._subscribe, partial(self.delete_event, data_id)
         )
 
     async def list_event(self) -> MetisRequestIdDTO:
@@ -67,12 +199,19 @@ class MetisV0DatasourcesNamespace(BaseNamespace):
     async def list(self) -> Sequence[MetisDataSourceDTO]:
         "List data sources and wait for the result"
         evt = await act_and_get_result_from_stream(
-            self._root.stream.subscribe, partial(self.list_event)
+            self._subscribe, partial(self.list_event)
         )
         if evt["type"] == "datasources":
             return evt.get("data", {}).get("data", [])
         return []  # pragma: no cover
 
+    async def list_iter(self) -> AsyncIterator[MetisDataSourceDTO]:
+        "List data sources, yield them one by one as they are decoded"
+        async for item in act_and_iter_items_from_stream(
+            partial(self._subscribe, raw=True), self.list_event
+        ):
+            yield item
+
     async def get(self, data_id: int) -> Optional[MetisDataSourceDTO]:
         "Get data source by id"
         data = list(filter(lambda x: x["id"] == data_id, await self.list()))
@@ -99,3 +238,39 @@ class MetisV0DatasourcesNamespace(BaseNamespace):
             auth_required=True,
         ) as resp:
             return await resp.json(loads=metis_json_decoder)
+
+    async def get_content_stream(
+        self, data_id: int, chunk_size: int = 2**16
+    ) -> AsyncIterator[str]:
+        """
+        Get data source content by id as text chunks.
+        The content is unescaped from the response body as it arrives,
+        so memory usage is bounded by `chunk_size`.
+        """
+        async with self._client.request(
+            method="GET",
+            url=self._base_url / str(data_id),
+            auth_required=True,
+            stream=True,
+        ) as resp:
+            async for text in metis_json_stream_decoder(
+                "content", resp.content.iter_chunked(chunk_size)
+            ):
+                yield text
+
+    async def download_content(
+        self, data_id: int, path: Union[str, "PathLike[str]"]
+    ) -> int:
+        "Download data source content by id to the file, return number of bytes"
+        # the file is written in the default executor, off the event loop
+        loop = get_running_loop()
+        written = 0
+        out_file = await loop.run_in_executor(None, open, path, "wb")
+        try:
+            async for text in self.get_content_stream(data_id):
+                written += await loop.run_in_executor(
+                    None, out_file.write, text.encode()
+                )
+        finally:
+            await loop.run_in_executor(None, out_file.close)
+        return written
@@ -0,0 +1,80 @@
+"Shared fixtures"
+
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import pytest
+from aiohttp import web
+
+from metis_client.helpers import metis_json_encoder
+
+
+@pytest.fixture
+def datasource():
+    "Data source as sent by the BFF"
+    return {
+        "id": 1,
+        "parents": [],
+        "children": [],
+        "user_id": 1,
+        "user_first_name": "",
+        "user_last_name": "",
+        "user_email": "",
+        "name": "",
+        "content": "content",
+        "type": 1,
+        "collections": [],
+        "created_at": datetime.fromordinal(1),
+        "updated_at": datetime.fromordinal(1),
+    }
+
+
+@pytest.fixture
+def create_datasources_app(datasource):
+    "Factory of web applications with datasources endpoint and the stream"
+
+    def create_app(req_id: str) -> web.Application:
+        events: "asyncio.Queue[str]" = asyncio.Queue()
+
+        async def sse_handler(request):
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            await resp.write(b": connected\n\n")
+            while True:
+                await resp.write((await events.get()).encode())
+
+        async def create_handler(_):
+            data = {"req_id": req_id, "data": [datasource], "total": 1, "types": []}
+            events.put_nowait(
+                f"event: datasources\nid: 1\ndata: {metis_json_encoder(data)}\n\n"
+            )
+            return web.json_response({"reqId": req_id})
+
+        app = web.Application()
+        app.router.add_get("/stream", sse_handler)
+        app.router.add_post("/v0/datasources", create_handler)
+        return app
+
+    return create_app
+
+
+@pytest.fixture
+def create_stream_app():
+    "Factory of web applications with the given stream handler and the ping endpoint"
+
+    def create_app(
+        sse_handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+        counters: Optional[Dict[str, int]] = None,
+    ) -> web.Application:
+        async def ping_handler(_):
+            if counters is not None:
+                counters["pings"] = counters.get("pings", 0) + 1
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_head("/v0", ping_handler)
+        app.router.add_get("/stream", sse_handler)
+        return app
+
+    return create_app
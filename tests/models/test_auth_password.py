@@ -1,9 +1,13 @@
 "Test MetisLocalUserAuth"
+
+import threading
+from http.cookies import Morsel
 from itertools import count
 from json import JSONDecodeError
+from math import inf
 
 import pytest
-from aiohttp import CookieJar, web
+from aiohttp import ClientSession, CookieJar, web
 from aiohttp.test_utils import TestClient, TestServer
 from aiohttp.web_exceptions import (
     HTTPBadRequest,
@@ -13,7 +17,13 @@ from aiohttp.web_exceptions import (
 )
 from freezegun import freeze_time
 
-from metis_client import MetisLocalUserAuth
+from metis_client import (
+    MetisFileCredentialsStore,
+    MetisLocalUserAuth,
+    MetisMemoryCredentialsStore,
+)
+from metis_client.dtos import MetisStoredCredentialsDTO
+from metis_client.models import BaseCredentialsStore
 from tests.helpers import random_word
 
 EMAIL = random_word(10)
@@ -96,3 +106,108 @@ async def test_auth_not_ok(cli: TestClient):
     assert await authenticator.should_update(
         cli.session, base_url
     ), "Update is needed after failed authentication"
+
+
+@freeze_time("2000-01-01")
+@pytest.mark.parametrize(
+    "attrs, expected",
+    [
+        (None, inf),
+        ({}, inf),
+        ({"max-age": "60"}, 946684860),
+        ({"max-age": "oops"}, inf),
+        ({"expires": "Sat, 01 Jan 2000 00:01:00 GMT"}, 946684860),
+        ({"expires": "oops"}, inf),
+    ],
+)
+def test_cookie_expires_at(attrs, expected):
+    "Test session cookie expiration timestamp"
+    morsel = None
+    if attrs is not None:
+        morsel = Morsel()
+        morsel.set("_sid", "ok", "ok")
+        morsel.update(attrs)
+    # pylint: disable=protected-access
+    assert MetisLocalUserAuth._get_expires_at(morsel) == expected
+
+
+async def test_auth_existing_cookie(cli: TestClient):
+    "Test validity of existing session cookie"
+    authenticator = MetisLocalUserAuth(EMAIL, PASSWORD)
+    base_url = cli.make_url("")
+    cli.session.cookie_jar.update_cookies({"_sid": "ok"}, base_url)
+    assert not authenticator.is_valid(cli.session), "Unknown before check"
+    assert (
+        await authenticator.should_update(cli.session, base_url) is False
+    ), "Update is not needed with existing cookie"
+    assert authenticator.is_valid(cli.session), "Valid after check"
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path) -> BaseCredentialsStore:
+    "Create credentials store"
+    if request.param == "file":
+        return MetisFileCredentialsStore(tmp_path / "credentials.json")
+    return MetisMemoryCredentialsStore()
+
+
+@freeze_time("1970-01-01", auto_tick_seconds=10)
+async def test_auth_store(cli: TestClient, store: BaseCredentialsStore):
+    "Test session cookie reuse via credentials store"
+    authenticator = MetisLocalUserAuth(EMAIL, PASSWORD, store=store)
+    base_url = cli.make_url("")
+    assert await authenticator.authenticate(cli.session, base_url)
+    stored = store.load(f"{base_url}|{EMAIL}")
+    assert stored and stored["cookies"] == {"_sid": "ok"}, "Cookie is stored"
+
+    jar = CookieJar(unsafe=True, treat_as_secure_origin="http://127.0.0.1")
+    async with ClientSession(cookie_jar=jar) as session:
+        assert (
+            await authenticator.should_update(session, base_url) is False
+        ), "Stored cookie is reused by a fresh session"
+        assert authenticator.is_valid(session), "Stored cookie is valid"
+        assert await authenticator.authenticate(
+            session, base_url
+        ), "Login is successful"
+
+    async with ClientSession(cookie_jar=jar) as session:
+        session.cookie_jar.clear()
+        store.save(f"{base_url}|{EMAIL}", {"cookies": {"_sid": "ok"}, "expires_at": 1})
+        assert await authenticator.should_update(
+            session, base_url
+        ), "Expired stored cookie is ignored"
+
+    cli.session.cookie_jar.update_cookies({"_sid": "expired"}, base_url)
+    store.save(f"{base_url}|{EMAIL}", {"cookies": {"_sid": "ok"}, "expires_at": None})
+    assert await authenticator.authenticate(
+        cli.session, base_url
+    ), "Cookie renewed by another client is adopted"
+
+    authenticator = MetisLocalUserAuth(EMAIL, "", store=store)
+    assert (
+        await authenticator.authenticate(cli.session, base_url) is False
+    ), "Incorrect email-password pair should fail to authenticate"
+    assert store.load(f"{base_url}|{EMAIL}") is None, "Stored cookie is dropped"
+
+
+class ThreadRecordingStore(MetisFileCredentialsStore):
+    "File store recording threads it is accessed from"
+
+    threads: set
+
+    def load(self, key: str):
+        self.threads.add(threading.get_ident())
+        return super().load(key)
+
+    def save(self, key: str, credentials: MetisStoredCredentialsDTO) -> None:
+        self.threads.add(threading.get_ident())
+        super().save(key, credentials)
+
+
+async def test_auth_store_executor(cli: TestClient, tmp_path):
+    "Test blocking store is not accessed from the event loop thread"
+    store = ThreadRecordingStore(tmp_path / "credentials.json")
+    store.threads = set()
+    authenticator = MetisLocalUserAuth(EMAIL, PASSWORD, store=store)
+    assert await authenticator.authenticate(cli.session, cli.make_url(""))
+    assert store.threads and threading.get_ident() not in store.threads
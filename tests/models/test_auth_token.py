@@ -32,6 +32,12 @@ async def test_auth(cli: TestClient):
     assert (
         cli.session.headers.get("Authorization") == f"Bearer {TOKEN}"
     ), "There is the Authorization header with Bearer after authenticate"
+    assert (
+        await authenticator.should_update(cli.session, base_url) is False
+    ), "Update is not needed after authentication"
+    assert authenticator.is_valid(cli.session), "Credentials are valid"
+    assert not authenticator.needs_refresh(cli.session), "Token never expires"
+    authenticator.invalidate(cli.session)
     assert await authenticator.should_update(
         cli.session, base_url
-    ), "Update is needed after authentication"
+    ), "Update is needed after invalidation"
@@ -0,0 +1,48 @@
+"Test credentials stores"
+
+import pytest
+
+from metis_client import MetisFileCredentialsStore, MetisMemoryCredentialsStore
+from metis_client.dtos import MetisStoredCredentialsDTO
+from metis_client.models import BaseCredentialsStore
+
+CREDENTIALS: MetisStoredCredentialsDTO = {"cookies": {"_sid": "ok"}, "expires_at": 1}
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path) -> BaseCredentialsStore:
+    "Create credentials store"
+    if request.param == "file":
+        return MetisFileCredentialsStore(tmp_path / "credentials.json")
+    return MetisMemoryCredentialsStore()
+
+
+def test_store(store: BaseCredentialsStore):
+    "Test load(), save() and delete()"
+    assert store.load("key") is None, "Store is empty"
+    store.save("key", CREDENTIALS)
+    store.save("other", CREDENTIALS)
+    assert store.load("key") == CREDENTIALS, "Credentials are saved"
+    store.delete("key")
+    store.delete("key")
+    assert store.load("key") is None, "Credentials are deleted"
+    assert store.load("other") == CREDENTIALS, "Other credentials are kept"
+
+
+def test_file_store_shared(tmp_path):
+    "Test file store is shared between instances"
+    path = tmp_path / "credentials.json"
+    MetisFileCredentialsStore(path).save("key", CREDENTIALS)
+    assert MetisFileCredentialsStore(path).load("key") == CREDENTIALS
+    assert path.stat().st_mode & 0o777 == 0o600, "File is private"
+
+
+@pytest.mark.parametrize("content", ["", "oops", "[]"])
+def test_file_store_broken(tmp_path, content: str):
+    "Test broken file is treated as empty"
+    path = tmp_path / "credentials.json"
+    path.write_text(content, encoding="utf-8")
+    store = MetisFileCredentialsStore(path)
+    assert store.load("key") is None, "Store is empty"
+    store.save("key", CREDENTIALS)
+    assert store.load("key") == CREDENTIALS, "Store is rewritten"
@@ -2,7 +2,9 @@
 
 import json
 
-from metis_client.models import MetisMessageEvent
+import pytest
+
+from metis_client.models import MetisEventStreamParser, MetisMessageEvent
 
 
 def test_encoding_error():
@@ -25,3 +27,68 @@ def test_to_snake_case_conversion():
     result = evt.to_dto()
 
     assert result["data"] == expected
+
+
+@pytest.mark.parametrize(
+    "evt_type, message, data, expected",
+    [
+        (None, "", "pong", "pong"),
+        ("datasources", "", "{}", "datasources"),
+        ("", "calculations", "{}", "calculations"),
+        ("unknown", "", "", "errors"),
+    ],
+)
+def test_event_type(evt_type, message: str, data: str, expected: str):
+    "Test event type detection without decoding"
+    evt = MetisMessageEvent(evt_type, message, data, "", "")
+    assert evt.event_type == expected, "Event type matches"
+    assert evt.to_dto()["type"] == expected, "DTO type matches"
+
+
+STREAM = (
+    b": comment\n\n"
+    b'event: datasources\r\ndata: {"a": 1}\r\n\r\n'
+    b"data: pong\n\n"
+    b"id: 42\nretry: 300\nevent: errors\ndata: line1\ndata:line2\n\n"
+    b"id: \x00\nevent: other\nbroken\ndata\n\n"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_stream_parser(chunk_size: int):
+    "Test MetisEventStreamParser"
+    parser = MetisEventStreamParser("origin")
+    events = []
+    for pos in range(0, len(STREAM), chunk_size):
+        events += parser.feed(STREAM[pos : pos + chunk_size])
+    assert events == [
+        MetisMessageEvent("datasources", "datasources", b'{"a": 1}', "origin", ""),
+        MetisMessageEvent(None, "", b"pong", "origin", ""),
+        MetisMessageEvent("errors", "errors", b"line1\nline2", "origin", "42"),
+        MetisMessageEvent("other", "other", b"", "origin", "42"),
+    ]
+    assert parser.retry == 0.3
+    assert [x.event_type for x in events] == ["datasources", "pong", "errors", "errors"]
+    assert MetisMessageEvent.from_dto(events[0]) == events[0]
+
+
+def test_stream_parser_reset():
+    "Test incomplete event is dropped on reset"
+    parser = MetisEventStreamParser()
+    assert not parser.feed(b"data: incomplete")
+    parser.reset("new")
+    assert parser.feed(b"data: complete\n\n") == [
+        MetisMessageEvent(None, "", b"complete", "new", "")
+    ]
+
+
+def test_stream_parser_big_event():
+    "Test big single-line event"
+    data = json.dumps({"data": [{"id": x, "name": "x" * 100} for x in range(10**4)]})
+    parser = MetisEventStreamParser()
+    body = f"event: datasources\ndata: {data}\n\n".encode()
+    events = []
+    for pos in range(0, len(body), 2**16):
+        events += parser.feed(body[pos : pos + 2**16])
+    assert len(events) == 1 and events[0].data == data.encode()
+    assert len(events[0].to_dto()["data"]["data"]) == 10**4
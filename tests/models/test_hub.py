@@ -1,6 +1,16 @@
 "Test MetisHub"
 
-from metis_client.models import MetisHub, MetisSubscription
+import asyncio
+import json
+
+import pytest
+
+from metis_client.models import (
+    MetisHub,
+    MetisMessageEvent,
+    MetisQueuePolicy,
+    MetisSubscription,
+)
 
 
 async def test_close_hub():
@@ -8,3 +18,143 @@ async def test_close_hub():
     hub = MetisHub()
     hub.subscribe(MetisSubscription(hub))
     await hub.close()
+
+
+async def test_publish():
+    "Test publish()"
+    hub = MetisHub()
+    sub = MetisSubscription(hub)
+    hub.subscribe(sub)
+    hub.publish({"type": "pong", "data": None})
+    assert len(sub) == 1, "Message is published"
+    hub.unsubscribe_all()
+
+
+async def test_routing():
+    "Test events are routed by type"
+    hub = MetisHub()
+    calcs = MetisSubscription(hub, types=["calculations"])
+    dss = MetisSubscription(hub, types=["datasources", "errors"])
+    everything = MetisSubscription(hub)
+    for sub in (calcs, dss, everything):
+        hub.subscribe(sub)
+    assert set(hub.route("datasources")) == {dss, everything}
+    assert set(hub.route("pong")) == {everything}
+    assert hub.wants("pong")
+
+    hub.publish({"type": "datasources", "data": {"req_id": "1", "data": []}})
+    await hub.publish_async({"type": "errors", "data": {"req_id": "1", "data": []}})
+    assert (len(calcs), len(dss), len(everything)) == (0, 2, 2)
+
+    hub.unsubscribe(dss)
+    hub.unsubscribe(dss)
+    assert set(hub.route("datasources")) == {everything}
+    hub.unsubscribe(everything)
+    assert hub.wants("calculations")
+    assert not hub.wants("datasources"), "Empty routes are removed"
+    hub.unsubscribe_all()
+    assert not hub.route("calculations")
+
+
+def make_raw_event(req_id: str, evt_type: str = "datasources") -> MetisMessageEvent:
+    "Create raw event"
+    data = json.dumps({"reqId": req_id, "data": []}).encode()
+    return MetisMessageEvent(evt_type, "", data, "", "")
+
+
+async def test_history():
+    "Test history of events by request id"
+    hub = MetisHub(history_size=2)
+    hub.record(make_raw_event("0"))
+    assert hub.get_result("0") is None, "Unexpected requests are not kept"
+    for req_id in "1234":
+        hub.history.expect(req_id)
+    hub.record(make_raw_event("1"))
+    hub.record(make_raw_event("1", "errors"))
+    hub.record(MetisMessageEvent(None, "", "pong", "", ""))
+    assert hub.get_result("1")["type"] == "datasources", "First event is kept"
+
+    hub.record(make_raw_event("2"))
+    hub.record(make_raw_event("3"))
+    assert hub.get_result("1") is None and len(hub.history) == 2, "Size is limited"
+
+    hub.history.max_bytes = 0
+    assert hub.get_result("3") is None, "History bytes are limited"
+
+    hub.history.max_bytes = 2**20
+    hub.history.ttl = 0
+    hub.record(make_raw_event("4"))
+    assert hub.get_result("4") is None, "History events expire"
+
+    hub.history.ttl = 0.05
+    with hub.history.firing():
+        assert hub.history.pending == 1, "Fired request is pending"
+        hub.record(make_raw_event("5"))
+    hub.history.expect("5")
+    hub.history.expect("6")
+    assert hub.history.pending == 1, "Kept request is not expected"
+    await asyncio.sleep(0.1)
+    assert not hub.history.pending and not hub.history, "Expire on a timer"
+
+
+async def test_wait_result():
+    "Test waiting for a request result"
+    hub = MetisHub()
+    waiters = [asyncio.create_task(hub.wait_result("1")) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert hub.waiting == 1
+    waiters[1].cancel()
+    hub.record(make_raw_event("1"))
+    assert (await waiters[0])["type"] == "datasources"
+    assert (await hub.wait_result("1"))["type"] == "datasources"
+    with pytest.raises(asyncio.TimeoutError):
+        await hub.wait_result("2", timeout=0.01)
+    assert hub.waiting == 0
+
+
+async def test_empty_types():
+    "Test subscription with empty types gets nothing"
+    hub = MetisHub()
+    sub = MetisSubscription(hub, types=())
+    hub.subscribe(sub)
+    assert len(hub) == 1 and not hub.wants("datasources")
+    hub.unsubscribe(sub)
+
+
+async def test_fail():
+    "Test subscriptions and waiters are failed"
+    hub = MetisHub()
+    exc = ConnectionError("lost")
+    waiting = MetisSubscription(hub, policy=MetisQueuePolicy(overflow="coalesce"))
+    reading = MetisSubscription(hub)
+    hub.subscribe(waiting)
+    hub.subscribe(reading)
+    hub.publish({"type": "pong", "data": None})
+    hub.unsubscribe(reading)
+
+    async def enter():
+        async with reading:
+            pass  # pragma: no cover
+
+    connecting = asyncio.create_task(enter())
+    waiter = asyncio.create_task(hub.wait_result("1"))
+    await asyncio.sleep(0)
+    hub.fail(exc)
+    waiting.fail(ConnectionError("ignored"))
+    assert (await waiting.__anext__())["type"] == "pong", "Waiting events are kept"
+    for task in (waiting.__anext__(), connecting, waiter):
+        with pytest.raises(ConnectionError, match="lost"):
+            await task
+    assert len(hub) == 0, "Failed subscriptions are unsubscribed"
+    hub.publish({"type": "pong", "data": None})
+    assert len(waiting) == 0, "Failed subscription gets no events"
+    hub.set_connected()
+    async with MetisSubscription(
+        hub, policy=MetisQueuePolicy(overflow="coalesce")
+    ) as sub:
+        reader = asyncio.create_task(sub.__anext__())
+        await asyncio.sleep(0)
+        sub.fail(exc)
+        with pytest.raises(ConnectionError):
+            await reader
+    hub.unsubscribe_all()
@@ -0,0 +1,103 @@
+"Test in-process transport"
+
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, web
+from yarl import URL
+
+from metis_client import MetisAPIAsync, MetisMemoryTransport, MetisNoAuth
+from metis_client.exc import MetisNotFoundException
+from metis_client.helpers import metis_json_decoder
+
+BASE_URL = URL("http://localhost/")
+
+
+def create_transport(datasource) -> MetisMemoryTransport:
+    "Create transport with datasources endpoints"
+    transport = MetisMemoryTransport()
+
+    async def create_handler(request):
+        payload = await request.json()
+        return transport.respond("datasources", [{**datasource, **payload}])
+
+    async def get_handler(request):
+        if request.match_info["id"] != "1":
+            raise web.HTTPNotFound()
+        return web.json_response({"content": datasource["content"]})
+
+    transport.add_route("POST", "/v0/datasources", create_handler)
+    transport.add_route("GET", "/v0/datasources/{id}", get_handler)
+    return transport
+
+
+async def test_client(datasource):
+    "Test operations follow request ids to the stream without sockets"
+    transport = create_transport(datasource)
+    async with MetisAPIAsync(BASE_URL, auth=MetisNoAuth(), transport=transport) as api:
+        for content in ("one", "two"):
+            created = await api.v0.datasources.create(content)
+            assert created and created["content"] == content
+        assert (await api.v0.datasources.get_content(1))["content"] == "content"
+        chunks = [
+            x async for x in api.v0.datasources.get_content_stream(1, chunk_size=4)
+        ]
+        assert "".join(chunks) == "content"
+        with pytest.raises(MetisNotFoundException):
+            await api.v0.datasources.get_content(2)
+        with pytest.raises(MetisNotFoundException):
+            await api.v0.collections.list()
+        assert transport.streams, "Stream should be connected"
+    assert not transport.streams, "Stream should be disconnected"
+
+
+async def test_concurrent_creates(datasource):
+    "Test result waiters do not miss events of a burst of requests"
+    transport = create_transport(datasource)
+    async with MetisAPIAsync(BASE_URL, auth=MetisNoAuth(), transport=transport) as api:
+        created = await asyncio.wait_for(
+            asyncio.gather(*(api.v0.datasources.create(str(x)) for x in range(300))),
+            10,
+        )
+    assert [x and x["content"] for x in created] == [str(x) for x in range(300)]
+
+
+async def test_request_body():
+    "Test request bodies and query are passed to handlers"
+    transport = MetisMemoryTransport()
+
+    async def echo(request):
+        assert await request.read() == (await request.text()).encode()
+        return web.json_response(
+            {"body": await request.text(), "query": dict(request.query)}
+        )
+
+    async def chunks():
+        yield b"a"
+        yield b"b"
+
+    transport.add_route("put", "/{a}/{b}", echo)
+    for data, body in (("text", "text"), (b"bytes", "bytes"), (chunks(), "ab")):
+        resp = await transport.request("PUT", URL("/x/y"), data=data, params={"q": 1})
+        assert await resp.json(loads=metis_json_decoder) == {
+            "body": body,
+            "query": {"q": "1"},
+        }
+    async with await transport.request("PUT", URL("/x/y")) as resp:
+        assert await resp.read() == b'{"body": "", "query": {}}'
+    with pytest.raises(ClientResponseError):
+        await transport.request("PUT", URL("/x"), raise_for_status=True)
+
+
+async def test_stream():
+    "Test queued events are sent at once"
+    transport = MetisMemoryTransport()
+    async with transport.sse(BASE_URL / "stream", None, {}, None) as resp:
+        transport.publish("pong", None)
+        transport.publish("datasources", [], "1")
+        chunk = await resp.content.iter_any().__anext__()
+    assert chunk == (
+        b'event: pong\ndata: {"data": null}\n\n'
+        b"event: datasources\n"
+        b'data: {"data": [], "total": 0, "types": [], "reqId": "1"}\n\n'
+    )
@@ -0,0 +1,152 @@
+"Test metrics registry"
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from metis_client import MetisAPIAsync, MetisMetrics, MetisTokenAuth
+from metis_client.helpers import metis_json_encoder
+from metis_client.models import (
+    MetisHub,
+    MetisNoopMetrics,
+    MetisQueuePolicy,
+    MetisSubscription,
+)
+
+REQ_ID = "42"
+TOKEN = "token"
+
+
+def test_registry():
+    "Test counters, histograms and collectors"
+    metrics = MetisMetrics(buckets=(1, 0.1))
+    metrics.inc("metis_requests_total", method="GET", status=200)
+    metrics.inc("metis_requests_total", 2, method="GET", status=200)
+    metrics.inc("custom_total", label='a "quoted"\nvalue\\')
+    for value in (0.05, 0.1, 0.5, 5):
+        metrics.observe("metis_stream_decode_seconds", value, type="pong")
+
+    def collector():
+        return [("metis_hub_subscribers", {}, 2)]
+
+    metrics.register(collector)
+
+    assert metrics.value("metis_requests_total", status=200, method="GET") == 3
+    assert metrics.value("metis_stream_decode_seconds", type="pong") == 4
+    assert metrics.value("metis_hub_subscribers") == 2
+    assert metrics.value("metis_hub_subscribers", x=1) is None
+    assert metrics.to_prometheus() == (
+        "# HELP custom_total custom_total\n"
+        "# TYPE custom_total untyped\n"
+        'custom_total{label="a \\"quoted\\"\\nvalue\\\\"} 1\n'
+        "# HELP metis_hub_subscribers Stream hub subscriptions\n"
+        "# TYPE metis_hub_subscribers gauge\n"
+        "metis_hub_subscribers 2\n"
+        "# HELP metis_requests_total HTTP requests by method, endpoint, status\n"
+        "# TYPE metis_requests_total counter\n"
+        'metis_requests_total{method="GET",status="200"} 3\n'
+        "# HELP metis_stream_decode_seconds Seconds to decode events by type\n"
+        "# TYPE metis_stream_decode_seconds histogram\n"
+        'metis_stream_decode_seconds_bucket{type="pong",le="0.1"} 2\n'
+        'metis_stream_decode_seconds_bucket{type="pong",le="1"} 3\n'
+        'metis_stream_decode_seconds_bucket{type="pong",le="+Inf"} 4\n'
+        'metis_stream_decode_seconds_sum{type="pong"} 5.65\n'
+        'metis_stream_decode_seconds_count{type="pong"} 4\n'
+    )
+
+    metrics.unregister(collector)
+    assert metrics.value("metis_hub_subscribers") is None
+
+
+def test_noop():
+    "Test disabled registry records nothing"
+    metrics = MetisNoopMetrics()
+    assert not metrics.enabled
+    metrics.inc("metis_requests_total")
+    metrics.observe("metis_stream_decode_seconds", 1)
+    metrics.register(lambda: [("metis_hub_subscribers", {}, 1)])
+    assert metrics.to_prometheus() == ""
+
+
+async def test_subscriptions():
+    "Test hub collects subscriptions, subscriptions count drops"
+    metrics = MetisMetrics()
+    hub = MetisHub(metrics=metrics)
+    metrics.register(hub.collect)
+    subs = [
+        MetisSubscription(hub, policy=MetisQueuePolicy(size=1)),
+        MetisSubscription(hub, types=("pong",), policy=MetisQueuePolicy(size=1)),
+        MetisSubscription(
+            hub, types=("pong", "errors"), policy=MetisQueuePolicy(overflow="coalesce")
+        ),
+    ]
+    for sub in subs:
+        hub.subscribe(sub)
+    for _ in range(2):
+        hub.publish({"type": "pong", "data": None})
+
+    assert metrics.value("metis_hub_subscribers") == 3
+    assert metrics.value("metis_hub_waiters") == 0
+    assert metrics.value("metis_subscription_queue_depth", types="*") == 1
+    assert metrics.value("metis_subscription_queue_depth", types="errors,pong") == 1
+    assert (
+        metrics.value("metis_subscription_dropped_total", overflow="drop_newest") == 2
+    )
+    assert metrics.value("metis_subscription_coalesced_total") == 1
+
+
+def create_app() -> web.Application:
+    "Create web application with datasources endpoint and the stream"
+    events: "asyncio.Queue[str]" = asyncio.Queue()
+    unauthorized = [True]
+
+    async def sse_handler(request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b": connected\n\n")
+        while True:
+            await resp.write((await events.get()).encode())
+
+    async def create_handler(_):
+        # the first request is rejected as with expired credentials
+        if unauthorized:
+            unauthorized.pop()
+            raise web.HTTPUnauthorized()
+        data = {"req_id": REQ_ID, "data": [], "total": 0, "types": []}
+        events.put_nowait(f"event: datasources\ndata: {metis_json_encoder(data)}\n\n")
+        return web.json_response({"reqId": REQ_ID})
+
+    app = web.Application()
+    app.router.add_get("/stream", sse_handler)
+    app.router.add_post("/v0/datasources", create_handler)
+    return app
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+async def test_client(aiohttp_client, enabled: bool):
+    "Test client reports requests, retries, authentications and events"
+    client = await aiohttp_client(create_app())
+    metrics = MetisMetrics() if enabled else MetisNoopMetrics()
+    async with MetisAPIAsync(
+        client.make_url("/"),
+        session=client.session,
+        auth=MetisTokenAuth(TOKEN),
+        metrics=metrics,
+    ) as api:
+        await api.v0.datasources.create("content")
+        if not enabled:
+            assert metrics.to_prometheus() == ""
+            return
+        assert metrics.value("metis_hub_subscribers") == 0
+
+    assert metrics.value("metis_hub_subscribers") is None, "Collector should be gone"
+    labels = {"method": "POST", "endpoint": "/v0/datasources"}
+    assert metrics.value("metis_requests_total", status=401, **labels) == 1
+    assert metrics.value("metis_requests_total", status=200, **labels) == 1
+    assert metrics.value("metis_request_duration_seconds", **labels) == 2
+    assert metrics.value("metis_retries_total", reason="unauthorized") == 1
+    assert metrics.value("metis_auth_refreshes_total", reason="expired") == 1
+    assert metrics.value("metis_auth_refreshes_total", reason="unauthorized") == 1
+    assert metrics.value("metis_stream_events_total", type="datasources") == 1
+    assert metrics.value("metis_stream_decode_seconds", type="datasources") == 1
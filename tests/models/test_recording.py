@@ -0,0 +1,100 @@
+"Test recording and replay"
+
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError
+from yarl import URL
+
+from metis_client import MetisAPIAsync, MetisNoAuth, MetisRecorder, MetisReplayTransport
+from metis_client.exc import MetisNotFoundException
+from metis_client.models import MetisMessageEvent, load_recording
+
+REQ_ID = "42"
+BASE_URL = URL("http://localhost/")
+
+
+async def test_record_and_replay(aiohttp_client, create_datasources_app, tmp_path):
+    "Test recorded operation is replayed without network"
+    path = tmp_path / "recording.jsonl.gz"
+    client = await aiohttp_client(create_datasources_app(REQ_ID))
+    with MetisRecorder(path) as recorder:
+        async with MetisAPIAsync(
+            client.make_url("/"),
+            session=client.session,
+            auth=MetisNoAuth(),
+            recorder=recorder,
+        ) as api:
+            recorded = await api.v0.datasources.create("content")
+
+    entries = load_recording(path)
+    assert [(x["kind"], x["req_id"]) for x in entries] == [
+        ("http", REQ_ID),
+        ("sse", REQ_ID),
+    ]
+    assert entries[0]["url"] == "/v0/datasources"
+    assert entries[1]["event"] == "datasources" and entries[1]["id"] == "1"
+
+    transport = MetisReplayTransport(path, speed=None)
+    async with MetisAPIAsync(BASE_URL, auth=MetisNoAuth(), transport=transport) as api:
+        assert await api.v0.datasources.create("content") == recorded
+        with pytest.raises(MetisNotFoundException):
+            await api.v0.datasources.get(1)
+
+
+async def test_replay_speed():
+    "Test delays are replayed at speed"
+    entries = [
+        {
+            "t": 0,
+            "kind": "sse",
+            "event": None,
+            "data": "a\nb",
+            "id": "",
+            "req_id": None,
+        },
+        {"t": 0.2, "kind": "sse", "event": "x", "data": "c", "id": "", "req_id": None},
+        {
+            "t": 0.1,
+            "d": 0.2,
+            "kind": "http",
+            "method": "GET",
+            "url": "/v0/x?a=1",
+            "status": 500,
+            "type": "text/plain",
+            "body": "oops",
+            "req_id": None,
+        },
+    ]
+    transport = MetisReplayTransport(entries, speed=10)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    async with transport.sse(BASE_URL / "stream", None, {}, None) as resp:
+        chunks = resp.content.iter_any()
+        assert await chunks.__anext__() == b"data: a\ndata: b\n\n"
+        assert await chunks.__anext__() == b"event: x\ndata: c\n\n"
+        assert 0.015 <= loop.time() - started < 0.2, "Events should be accelerated"
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(chunks.__anext__(), 0.01)
+
+    resp = await transport.request("GET", BASE_URL / "v0/x", params={"a": 1})
+    assert resp.status == 500 and not resp.ok
+    assert await resp.text() == "oops"
+    with pytest.raises(ClientResponseError):
+        await transport.request("GET", URL("/v0/x?a=1"), raise_for_status=True)
+    resp = await transport.request("POST", URL("/v0/x"))
+    assert resp.status == 404
+
+
+async def test_recorder_encoding(tmp_path):
+    "Test recorder keeps undecodable bytes and closes lazily"
+    path = tmp_path / "recording.jsonl.gz"
+    recorder = MetisRecorder(path)
+    recorder.close()
+    assert not path.exists(), "File should be created on the first entry"
+    recorder.record_event(MetisMessageEvent("x", "x", b"\xff", "", ""))
+    recorder.close()
+    transport = MetisReplayTransport(str(path), speed=None)
+    async with transport.sse(BASE_URL, None, {}, None) as resp:
+        chunk = await resp.content.iter_any().__anext__()
+        assert chunk == b"event: x\ndata: \xff\n\n"
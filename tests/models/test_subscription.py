@@ -1,9 +1,22 @@
 "Test MetisSubscription"
 
+import asyncio
+import json
 import logging
+from typing import Dict, List, Tuple, cast
 
-from metis_client.dtos.event import MetisErrorEventDTO
-from metis_client.models import MetisHub, MetisSubscription
+import pytest
+
+from metis_client.dtos.event import MetisErrorEventDTO, MetisEventDTO
+from metis_client.models import (
+    MetisHub,
+    MetisMessageEvent,
+    MetisOverflowPolicy,
+    MetisQueuePolicy,
+    MetisSubscription,
+    act_and_iter_items_from_stream,
+)
+from metis_client.models.subscription import default_coalesce_key
 
 TEST_EVENT: MetisErrorEventDTO = {
     "type": "errors",
@@ -29,3 +42,151 @@ async def test_len():
     sub.put_nowait(TEST_EVENT)
     assert len(sub) == 1, "Internal queue size match"
     await hub.close()
+
+
+def make_event(req_id: str, entity_id: int, total: int = 0) -> MetisEventDTO:
+    "Create datasources event"
+    return cast(
+        MetisEventDTO,
+        {
+            "type": "datasources",
+            "data": {"req_id": req_id, "data": [{"id": entity_id}], "total": total},
+        },
+    )
+
+
+def get_all(sub: MetisSubscription) -> List[Tuple[str, int]]:
+    "Get all waiting messages as (req_id, total) pairs"
+    msgs = [cast(Dict, sub.queue.get_nowait())["data"] for _ in range(len(sub))]
+    return [(msg["req_id"], msg.get("total", 0)) for msg in msgs]
+
+
+@pytest.mark.parametrize(
+    "overflow, expected, dropped, coalesced",
+    [
+        ("drop_newest", [("1", 0), ("2", 0)], 2, 0),
+        ("drop_oldest", [("3", 1), ("4", 0)], 2, 0),
+        ("block", [("1", 0), ("2", 0)], 2, 0),
+        ("coalesce", [("2", 0), ("4", 0)], 1, 1),
+    ],
+)
+async def test_overflow(
+    overflow: MetisOverflowPolicy, expected, dropped: int, coalesced: int
+):
+    "Test overflow policies"
+    hub = MetisHub()
+    sub = MetisSubscription(hub, policy=MetisQueuePolicy(size=2, overflow=overflow))
+    for evt in (
+        make_event("1", 1),
+        make_event("2", 2),
+        make_event("1" if overflow == "coalesce" else "3", 1, 1),
+        make_event("4", 4),
+    ):
+        sub.put_nowait(evt)
+    assert get_all(sub) == expected, "Queue content matches"
+    assert sub.dropped == dropped, "Dropped counter matches"
+    assert sub.coalesced == coalesced, "Coalesced counter matches"
+    await hub.close()
+
+
+async def test_coalesce_not_full():
+    "Test coalescing replaces waiting message in place"
+    hub = MetisHub()
+    sub = MetisSubscription(hub, policy=MetisQueuePolicy(overflow="coalesce"))
+    sub.put_nowait(make_event("1", 1))
+    sub.put_nowait(make_event("2", 2))
+    sub.put_nowait(make_event("1", 1, 1))
+    sub.put_nowait(TEST_EVENT)
+    sub.put_nowait(TEST_EVENT)
+    assert len(sub) == 3, "Same messages are coalesced"
+    assert get_all(sub)[:2] == [("1", 1), ("2", 0)], "Order is kept"
+    sub.put_nowait(make_event("1", 1, 2))
+    assert get_all(sub) == [("1", 2)], "Consumed messages are not coalesced"
+    assert sub.coalesced == 2, "Coalesced counter matches"
+    assert default_coalesce_key(
+        cast(MetisEventDTO, {"type": "pong", "data": None})
+    ) == ("pong",), "Key of event without data"
+
+
+@pytest.mark.parametrize("overflow", ["drop_oldest", "coalesce"])
+async def test_overflow_failed(overflow: MetisOverflowPolicy):
+    "Test failure wake-up is kept on overflow"
+    hub = MetisHub()
+    sub = MetisSubscription(hub, policy=MetisQueuePolicy(size=1, overflow=overflow))
+    hub.subscribe(sub)
+    sub.fail(ConnectionError("lost"))
+    await hub.publish_async(make_event("1", 1))
+    assert sub.dropped == 1, "New message is dropped"
+    with pytest.raises(ConnectionError, match="lost"):
+        await sub.__anext__()
+    await hub.close()
+
+
+async def test_block():
+    "Test blocking publisher"
+    hub = MetisHub()
+    sub = MetisSubscription(
+        hub, policy=MetisQueuePolicy(size=1, overflow="block", block_timeout=0.01)
+    )
+    other = MetisSubscription(
+        hub, predicate=lambda _: False, policy=MetisQueuePolicy(size=1)
+    )
+    hub.subscribe(sub)
+    hub.subscribe(other)
+    await hub.publish_async(make_event("1", 1))
+    await hub.publish_async(make_event("2", 2))
+    assert sub.dropped == 1, "Message is dropped after timeout"
+
+    publishing = asyncio.create_task(hub.publish_async(make_event("3", 3)))
+    await asyncio.sleep(0)
+    assert get_all(sub) == [("1", 0)], "Publisher waits for free slot"
+    await publishing
+    assert get_all(sub) == [("3", 0)], "Message is published after wait"
+
+    sub.put_nowait(make_event("4", 4))
+    await MetisSubscription(
+        hub, predicate=lambda _: False, policy=MetisQueuePolicy(overflow="block")
+    ).put(TEST_EVENT)
+    await sub.put(TEST_EVENT)
+    assert sub.dropped == 2 and len(other) == 0, "Counters match"
+    hub.unsubscribe_all()
+
+
+async def test_ids():
+    "Test filtering by entity ids"
+    hub = MetisHub()
+    sub = MetisSubscription(hub, ids=[1])
+    sub.put_nowait(make_event("1", 2))
+    sub.put_nowait(make_event("2", 1))
+    sub.put_nowait(TEST_EVENT)
+    sub.put_nowait({"type": "pong", "data": None})
+    assert [x["type"] for x in (sub.queue.get_nowait() for _ in range(3))] == [
+        "datasources",
+        "errors",
+        "pong",
+    ]
+    assert len(sub) == 0
+    await sub.put(make_event("3", 2))
+    assert len(sub) == 0, "Unrelated ids are filtered out"
+    await hub.close()
+
+
+async def test_act_and_iter_items():
+    "Test items are yielded from raw events of the request"
+    hub = MetisHub()
+    hub.set_connected()
+
+    async def request():
+        for evt in (
+            # items of other requests are never decoded
+            '{"data": [1, not json], "reqId": "1"}',
+            # items go before the request id
+            json.dumps({"data": [2, 3], "reqId": "2"}),
+        ):
+            await hub.publish_async(MetisMessageEvent("datasources", "", evt, "", ""))
+        return {"req_id": "2"}
+
+    items = act_and_iter_items_from_stream(
+        lambda: MetisSubscription(hub, raw=True), request
+    )
+    assert [x async for x in items] == [2, 3], "Items of the request are yielded"
@@ -0,0 +1,132 @@
+"Test tracers"
+
+from contextlib import contextmanager
+
+import pytest
+
+from metis_client import MetisAPIAsync, MetisNoAuth
+from metis_client.helpers import metis_json_encoder
+from metis_client.models import (
+    MetisHub,
+    MetisMessageEvent,
+    MetisNoopTracer,
+    MetisOpenTelemetryTracer,
+    MetisRecordingTracer,
+)
+from metis_client.models.tracer import otel_trace
+
+REQ_ID = "42"
+
+
+def test_noop_tracer():
+    "Test noop tracer"
+    tracer = MetisNoopTracer()
+    assert not tracer.enabled
+    with tracer.span("test", {"a": 1}) as span:
+        span.set_attribute("b", 2)
+
+
+def test_recording_tracer():
+    "Test recording tracer nests spans and records errors"
+    tracer = MetisRecordingTracer(max_spans=3)
+    with tracer.span("outer", {"metis.req_id": REQ_ID}) as outer:
+        with pytest.raises(ValueError):
+            with tracer.span("inner") as inner:
+                inner.set_attribute("metis.req_id", REQ_ID)
+                raise ValueError("oops")
+        with tracer.span("other"):
+            pass
+    assert [x.name for x in tracer.spans] == ["outer", "inner", "other"]
+    outer_span, inner_span, other_span = tracer.spans
+    assert outer_span is outer and inner_span is inner
+    assert inner_span.parent is outer_span and other_span.parent is outer_span
+    assert outer_span.parent is None
+    assert isinstance(inner_span.error, ValueError) and outer_span.error is None
+    assert outer_span.duration is not None and outer_span.duration >= 0
+    assert tracer.operation(REQ_ID) == [outer_span, inner_span]
+    assert REQ_ID in repr(inner_span)
+
+    with tracer.span("last") as span:
+        assert span.duration is None
+    assert len(tracer.spans) == 3, "Oldest span should be dropped"
+
+
+def test_otel_tracer():
+    "Test OpenTelemetry adapter"
+    started = []
+
+    class FakeTracer:  # pylint: disable=too-few-public-methods
+        "OpenTelemetry tracer double"
+
+        @contextmanager
+        def start_as_current_span(self, name, attributes=None):
+            "Start span"
+            started.append((name, attributes))
+            yield MetisRecordingTracer().spans
+
+    tracer = MetisOpenTelemetryTracer(FakeTracer())
+    with tracer.span("test", {"a": 1}):
+        pass
+    assert started == [("test", {"a": 1})]
+
+    if otel_trace is None:
+        with pytest.raises(ImportError):
+            MetisOpenTelemetryTracer()
+
+
+async def test_hub_publish():
+    "Test hub traces published events"
+    tracer = MetisRecordingTracer()
+    hub = MetisHub(tracer=tracer)
+    hub.publish({"type": "pong", "data": None})
+    await hub.publish_async(
+        MetisMessageEvent(
+            "datasources", "", metis_json_encoder({"req_id": REQ_ID}), "", ""
+        )
+    )
+    hub.publish(
+        {
+            "type": "datasources",
+            "data": {"req_id": REQ_ID, "data": [], "total": 0, "types": []},
+        }
+    )
+    assert [x.attributes for x in tracer.spans] == [
+        {"metis.event_type": "pong", "metis.raw": False, "metis.subscribers": 0},
+        {
+            "metis.event_type": "datasources",
+            "metis.raw": True,
+            "metis.subscribers": 0,
+            "metis.req_id": REQ_ID,
+        },
+        {
+            "metis.event_type": "datasources",
+            "metis.raw": False,
+            "metis.subscribers": 0,
+            "metis.req_id": REQ_ID,
+        },
+    ]
+
+
+async def test_operation(aiohttp_client, create_datasources_app):
+    "Test operation phases are traced and correlated by req_id"
+    client = await aiohttp_client(create_datasources_app(REQ_ID))
+    tracer = MetisRecordingTracer()
+    async with MetisAPIAsync(
+        client.make_url("/"), session=client.session, auth=MetisNoAuth(), tracer=tracer
+    ) as api:
+        assert await api.v0.datasources.create("content")
+
+    spans = {x.name: x for x in tracer.spans}
+    operation = spans["metis.operation"]
+    for name in ("metis.subscribe", "metis.http", "metis.wait"):
+        assert spans[name].parent is operation, f"{name} should be a phase"
+    assert spans["metis.http"].attributes["http.status_code"] == 200
+    assert spans["metis.sse"].attributes["metis.connect_time"] >= 0
+    assert [x.name for x in tracer.operation(REQ_ID)] == [
+        "metis.operation",
+        "metis.http",
+        "metis.wait",
+        "metis.decode",
+        "metis.publish",
+    ], "Request and its stream event should be correlated"
+    assert operation.attributes == {"metis.req_id": REQ_ID}
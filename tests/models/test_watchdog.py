@@ -0,0 +1,164 @@
+"Test event loop blocking watchdogs"
+
+import asyncio
+import logging
+import time
+
+from aiohttp import ClientSession, web
+from yarl import URL
+
+from metis_client import (
+    MetisAPIAsync,
+    MetisLoopWatchdog,
+    MetisMemoryTransport,
+    MetisMetrics,
+    MetisNoAuth,
+)
+from metis_client.client import MetisClient
+from metis_client.helpers import metis_json_encoder
+from metis_client.models import MetisHub, MetisNoopWatchdog, MetisSubscription
+
+REQ_ID = "42"
+
+
+def test_measure(caplog):
+    "Test slow stages are logged and counted"
+    metrics = MetisMetrics()
+    watchdog = MetisLoopWatchdog(threshold=0.01, metrics=metrics)
+    with watchdog.measure("decode", "datasources"):
+        pass
+    assert not caplog.records
+    with caplog.at_level(logging.WARNING):
+        with watchdog.measure("decode", "datasources"):
+            time.sleep(0.02)
+        watchdog.report("callback", None, 1)
+    assert [x.getMessage().split(" blocked")[0] for x in caplog.records] == [
+        "Slow decode of datasources event",
+        "Slow callback of any event",
+    ]
+    assert (
+        metrics.value("metis_slow_operations_total", stage="decode", type="datasources")
+        == 1
+    )
+    assert metrics.value("metis_slow_operations_total", stage="callback", type="") == 1
+
+    MetisLoopWatchdog(threshold=0).report("decode", None, 1)
+
+
+async def test_probe(caplog):
+    "Test loop lag probe is shared and reports the lag"
+    metrics = MetisMetrics()
+    watchdog = MetisLoopWatchdog(threshold=0.02, interval=0.01, metrics=metrics)
+    watchdog.start()
+    watchdog.start()
+    await asyncio.sleep(0.02)
+    with caplog.at_level(logging.WARNING):
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+    assert watchdog.lag >= 0
+    assert "Event loop was blocked" in caplog.text
+    assert metrics.value("metis_loop_lag_seconds")
+
+    watchdog.stop()
+    assert watchdog.running, "Probe should run for another client"
+    watchdog.stop()
+    watchdog.stop()
+    assert not watchdog.running
+
+
+async def test_noop():
+    "Test disabled watchdog"
+    watchdog = MetisNoopWatchdog()
+    assert not watchdog.enabled
+    with watchdog.measure("decode"):
+        pass
+    watchdog.start()
+    watchdog.stop()
+    assert not watchdog.running
+
+
+def test_predicate():
+    "Test subscription predicates are timed"
+    metrics = MetisMetrics()
+    hub = MetisHub(watchdog=MetisLoopWatchdog(threshold=0, metrics=metrics))
+    for raw in (False, True):
+        hub.subscribe(MetisSubscription(hub, lambda _: True, raw=raw))
+    hub.publish({"type": "pong", "data": None})
+    assert metrics.value("metis_slow_operations_total", stage="predicate", type="pong")
+
+
+def create_app() -> web.Application:
+    "Create web application with datasources endpoint and the stream"
+    events: "asyncio.Queue[str]" = asyncio.Queue()
+
+    async def sse_handler(request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b": connected\n\n")
+        while True:
+            await resp.write((await events.get()).encode())
+
+    async def create_handler(_):
+        data = {"req_id": REQ_ID, "data": [], "total": 0, "types": []}
+        events.put_nowait(f"event: datasources\ndata: {metis_json_encoder(data)}\n\n")
+        return web.json_response({"reqId": REQ_ID})
+
+    app = web.Application()
+    app.router.add_get("/stream", sse_handler)
+    app.router.add_post("/v0/datasources", create_handler)
+    return app
+
+
+async def test_client(aiohttp_client):
+    "Test client times decoding and stream callbacks with the client metrics"
+    client = await aiohttp_client(create_app())
+    metrics = MetisMetrics()
+    watchdog = MetisLoopWatchdog(threshold=0)
+    async with MetisAPIAsync(
+        client.make_url("/"),
+        session=client.session,
+        auth=MetisNoAuth(),
+        metrics=metrics,
+        watchdog=watchdog,
+    ) as api:
+        assert not watchdog.running, "Probe should start with the stream"
+        await api.v0.datasources.create("content")
+        assert watchdog.running, "Probe should be started"
+
+    assert not watchdog.running, "Probe should be stopped"
+    for stage in ("decode", "callback"):
+        assert (
+            metrics.value(
+                "metis_slow_operations_total", stage=stage, type="datasources"
+            )
+            == 1
+        ), f"{stage} should be reported once"
+
+
+async def test_sse_callback():
+    "Test sync stream callbacks returning awaitables are timed by the client"
+    metrics = MetisMetrics()
+    transport = MetisMemoryTransport()
+    received = asyncio.Event()
+
+    def on_message(_):
+        time.sleep(0.02)
+        received.set()
+        return asyncio.sleep(0)
+
+    async with ClientSession() as session:
+        client = MetisClient(
+            session,
+            URL("http://localhost"),
+            watchdog=MetisLoopWatchdog(threshold=0.01, metrics=metrics),
+            transport=transport,
+        )
+        task = asyncio.create_task(client.sse(URL("/stream"), on_message))
+        while not transport.streams:
+            await asyncio.sleep(0)
+        transport.publish("datasources", [])
+        await received.wait()
+        task.cancel()
+    assert metrics.value(
+        "metis_slow_operations_total", stage="callback", type="datasources"
+    )
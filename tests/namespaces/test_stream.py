@@ -0,0 +1,355 @@
+"Test MetisStreamNamespace"
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from metis_client import MetisAPIAsync, MetisMemoryTransport, MetisMetrics, MetisNoAuth
+from metis_client.exc import MetisConnectionException
+from metis_client.models import MetisQueuePolicy
+
+BASE_URL = "http://localhost"
+
+SSEHandler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def publish(transport: MetisMemoryTransport, req_id: str, size: int = 0) -> None:
+    "Publish datasources event"
+    transport.publish("datasources", [{"id": 1, "name": "x" * size}], req_id)
+
+
+async def wait_until(condition: Callable[[], bool]) -> None:
+    "Wait for the condition to become true"
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+async def test_decoder_pipeline():
+    "Test wanted events are decoded and published by the decoder task"
+    transport = MetisMemoryTransport()
+    metrics = MetisMetrics()
+    async with MetisAPIAsync(
+        BASE_URL, auth=MetisNoAuth(), metrics=metrics, transport=transport
+    ) as client:
+        stream = client.stream
+        stream.hub.history.size = 0
+        async with stream.subscribe(types=["datasources"]) as sub:
+            transport.publish("calculations", [], "skipped")
+            publish(transport, "1")
+            msg = await asyncio.wait_for(sub.__anext__(), 1)
+        assert msg["data"]["req_id"] == "1", "Decoded event is published"
+        assert metrics.value("metis_stream_events_total", type="calculations") == 1
+        assert (
+            metrics.value("metis_stream_decode_seconds", type="calculations") is None
+        ), "Unwanted events are not decoded"
+        assert stream.buffered == 0
+        assert stream.decoder_lag >= 0 and stream.reader_lag == 0
+
+
+@pytest.mark.parametrize("executor_cls", [ThreadPoolExecutor, ProcessPoolExecutor])
+async def test_decode_executor(executor_cls):
+    "Test large events are decoded in executor"
+    transport = MetisMemoryTransport()
+    async with MetisAPIAsync(
+        BASE_URL, auth=MetisNoAuth(), transport=transport
+    ) as client:
+        with executor_cls(max_workers=1) as executor:
+            client.stream.decode_executor = executor
+            client.stream.decode_threshold = 100
+            async with client.stream.subscribe() as sub:
+                publish(transport, "1", 10)
+                publish(transport, "2", 1000)
+                msgs = [await asyncio.wait_for(sub.__anext__(), 10) for _ in "12"]
+    assert [x["data"]["req_id"] for x in msgs] == ["1", "2"], "Order is kept"
+    assert msgs[1]["data"]["data"][0]["name"] == "x" * 1000
+
+
+async def test_reader_lag():
+    "Test reader waits for the decoder when buffer is full"
+    transport = MetisMemoryTransport()
+    async with MetisAPIAsync(
+        BASE_URL, auth=MetisNoAuth(), transport=transport
+    ) as client:
+        stream = client.stream
+        stream.buffer_size = 1
+        # the decoder waits for the reader of a blocking subscription
+        policy = MetisQueuePolicy(size=1, overflow="block", block_timeout=5)
+        async with stream.subscribe(policy=policy) as sub:
+            for req_id in "1234":
+                publish(transport, req_id)
+            await asyncio.sleep(0.05)
+            msgs = [await asyncio.wait_for(sub.__anext__(), 1) for _ in "1234"]
+        assert [x["data"]["req_id"] for x in msgs] == list("1234"), "None is lost"
+        assert stream.reader_lag > 0, "Reader waited for a free slot"
+
+
+async def test_decoder_error(caplog):
+    "Test decoder survives failures"
+    transport = MetisMemoryTransport()
+    async with MetisAPIAsync(
+        BASE_URL, auth=MetisNoAuth(), transport=transport
+    ) as client:
+        stream = client.stream
+        stream.decode_executor = ThreadPoolExecutor(max_workers=1)
+        stream.decode_executor.shutdown()
+        stream.decode_threshold = 100
+        with caplog.at_level(logging.ERROR):
+            async with stream.subscribe() as sub:
+                publish(transport, "1", 1000)
+                publish(transport, "2")
+                msg = await asyncio.wait_for(sub.__anext__(), 1)
+        assert "decoding failed" in caplog.text
+        assert msg["data"]["req_id"] == "2", "Next event is decoded"
+
+
+async def test_result():
+    "Test result of a fired request is found in history"
+    transport = MetisMemoryTransport()
+
+    async def list_handler(_):
+        return transport.respond("datasources", [])
+
+    async def silent_handler(_):
+        return web.json_response({"reqId": "3"})
+
+    transport.add_route("GET", "/v0/datasources", list_handler)
+    transport.add_route("GET", "/v0/collections", silent_handler)
+    async with MetisAPIAsync(
+        BASE_URL, auth=MetisNoAuth(), transport=transport
+    ) as client:
+        stream = client.stream
+        stream.hub.history.ttl = 0.5
+        reqs = [await stream.fire(client.v0.datasources.list_event) for _ in "12"]
+        results = [await asyncio.wait_for(stream.result(x["req_id"]), 1) for x in reqs]
+        assert [x["data"]["req_id"] for x in results] == [x["req_id"] for x in reqs]
+
+        waiter = asyncio.create_task(stream.result("2", timeout=1))
+        await wait_until(lambda: stream.hub.waiting == 1 and stream.hub.connected)
+        transport.publish("calculations", [], "2")
+        assert (await waiter)["type"] == "calculations", "Waiter is resolved"
+        assert stream.hub.waiting == 0
+
+        await stream.fire(client.v0.collections.list_event)
+        transport.publish("pong", None)
+        await asyncio.sleep(0.1)
+        assert stream.health["connected"], "Expected request keeps the stream"
+        await asyncio.wait_for(wait_until(lambda: not stream.hub.history.pending), 1)
+        transport.publish("pong", None)
+        await asyncio.wait_for(wait_until(lambda: not stream.health["connected"]), 1)
+
+
+def create_stalled_stream(counters: Dict[str, int]) -> SSEHandler:
+    "Create stream handler which never sends events"
+
+    async def sse_handler(request: web.Request) -> web.StreamResponse:
+        counters["connections"] += 1
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b": connected\n\n")
+        await asyncio.sleep(10)
+        return resp
+
+    return sse_handler
+
+
+async def test_stall_watchdog(aiohttp_client, create_stream_app):
+    "Test silent stream is pinged and reconnected"
+    counters = {"connections": 0, "pings": 0}
+    app = create_stream_app(create_stalled_stream(counters), counters)
+    server: TestClient = await aiohttp_client(TestServer(app))
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.stall_timeout = 0.2
+        assert stream.health["last_event_age"] is None
+        async with stream.subscribe():
+            await wait_until(
+                lambda: stream.health["stalls"] >= 1 and stream.health["connected"]
+            )
+            health = stream.health
+        assert counters["pings"] >= 1, "Quiet stream is pinged"
+        assert counters["connections"] >= 2 and health["reconnects"] >= 1
+        assert health["connected"] and health["last_event_age"] is not None
+        # idle stream is disconnected
+        await asyncio.wait_for(wait_until(lambda: not stream.health["connected"]), 1)
+
+        stream.stall_timeout = None
+        async with stream.subscribe():
+            await asyncio.sleep(0.1)
+        assert stream.health["stalls"] == health["stalls"], "Watchdog is disabled"
+
+
+def create_faulty_stream(counters: Dict[str, int]) -> SSEHandler:
+    "Create stream handler which drops reconnects"
+
+    async def sse_handler(request: web.Request) -> web.Response:
+        counters["connections"] += 1
+        if counters["connections"] > 1 and request.transport:
+            request.transport.close()
+        return web.Response(body=": connected\n\n", content_type="text/event-stream")
+
+    return sse_handler
+
+
+async def test_stream_lost(aiohttp_client, create_stream_app, caplog):
+    "Test waiters fail when reconnects are exhausted"
+    counters = {"connections": 0}
+    server: TestClient = await aiohttp_client(
+        TestServer(create_stream_app(create_faulty_stream(counters)))
+    )
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.max_retries = 1
+        with caplog.at_level(logging.ERROR):
+            async with stream.subscribe() as sub:
+                waiter = asyncio.create_task(stream.result("1"))
+                with pytest.raises(MetisConnectionException):
+                    await asyncio.wait_for(sub.__anext__(), 5)
+                with pytest.raises(MetisConnectionException):
+                    await waiter
+        assert "Stream is lost" in caplog.text
+        assert counters["connections"] == 3, "Reconnect is retried once"
+
+        with pytest.raises(MetisConnectionException):
+            async with stream.subscribe():
+                pass  # pragma: no cover
+        assert counters["connections"] == 5, "New subscription reconnects"
+
+
+def create_scripted_stream(script: List[str], seen: List[str]) -> SSEHandler:
+    "Create stream handler answering connections by the script"
+
+    async def sse_handler(request: web.Request) -> web.Response:
+        seen.append(request.headers.get("Last-Event-ID", ""))
+        action = script[len(seen) - 1] if len(seen) <= len(script) else "drop"
+        if action == "drop" and request.transport:
+            request.transport.close()
+        body = ""
+        if action == "event":
+            data = json.dumps({"reqId": "1", "data": [], "total": 0})
+            body = f"id: 7\nevent: datasources\ndata: {data}\n\n"
+        return web.Response(body=body, content_type="text/event-stream")
+
+    return sse_handler
+
+
+async def test_polling_fallback(aiohttp_client, create_stream_app, caplog):
+    "Test lost stream falls back to polling"
+    seen: List[str] = []
+    script = ["drop", "drop", "event", "empty", "drop", "drop"]
+    server: TestClient = await aiohttp_client(
+        TestServer(create_stream_app(create_scripted_stream(script, seen)))
+    )
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.polling_fallback = True
+        stream.max_retries = 1
+        stream.poll_duration = 0.05
+        stream.poll_interval = 0.01
+        stream.poll_max_interval = 0.02
+        assert stream.transport == "sse"
+        with caplog.at_level(logging.WARNING):
+            async with stream.subscribe(types=["datasources"]) as sub:
+                msg = await asyncio.wait_for(sub.__anext__(), 5)
+                assert msg["data"]["req_id"] == "1", "Event is polled"
+                assert stream.health["transport"] == "polling"
+                with pytest.raises(MetisConnectionException):
+                    await asyncio.wait_for(sub.__anext__(), 5)
+        assert "falling back to polling" in caplog.text
+        assert seen[3:] == ["7", "7", "7"], "Polls resume from the last event"
+        assert stream.transport == "sse", "Failed polling is reset"
+
+
+def create_buffering_stream(seen: List[str]) -> SSEHandler:
+    """
+    Create stream handler behind a buffering proxy,
+    which holds back the end of the second event until the first poll is cut
+    """
+
+    def event(evt_id: int) -> bytes:
+        data = json.dumps({"reqId": str(evt_id), "data": [], "total": 0})
+        return f"id: {evt_id}\nevent: datasources\ndata: {data}\n\n".encode()
+
+    async def sse_handler(request: web.Request) -> web.StreamResponse:
+        seen.append(request.headers.get("Last-Event-ID", ""))
+        if len(seen) <= 2 and request.transport:
+            # fall back to polling
+            request.transport.close()
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        if len(seen) == 3:
+            await resp.write(event(1) + event(2)[:20])
+        elif seen[-1] == "1":
+            await resp.write(event(2))
+        await asyncio.sleep(10)
+        return resp  # pragma: no cover
+
+    return sse_handler
+
+
+async def test_polling_buffered(aiohttp_client, create_stream_app):
+    "Test events held back by a proxy survive a poll cycle"
+    seen: List[str] = []
+    server: TestClient = await aiohttp_client(
+        TestServer(create_stream_app(create_buffering_stream(seen)))
+    )
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.polling_fallback = True
+        stream.max_retries = 1
+        stream.poll_duration = 0.1
+        stream.poll_interval = 0.01
+        async with stream.subscribe(types=["datasources"]) as sub:
+            msgs = [await asyncio.wait_for(sub.__anext__(), 5) for _ in "12"]
+    assert [x["data"]["req_id"] for x in msgs] == ["1", "2"], "No event is lost"
+    assert seen[2:4] == ["", "1"], "Next poll resumes from the last event taken"
+
+
+async def test_stall_fallback(aiohttp_client, create_stream_app):
+    "Test stalled stream falls back to polling"
+    counters = {"connections": 0, "pings": 0}
+    server: TestClient = await aiohttp_client(
+        TestServer(create_stream_app(create_stalled_stream(counters), counters))
+    )
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.polling_fallback = True
+        stream.stall_timeout = 0.1
+        stream.poll_duration = 0.01
+        async with stream.subscribe():
+            while stream.transport == "sse":
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)
+            assert stream.health["stalls"] == 2, "Polls are not watched"
+        # idle stream returns to SSE
+        await wait_until(lambda: stream.transport == "sse")
+        assert not stream.health["connected"]
+
+
+async def test_poll_cancelled(aiohttp_client, create_stream_app):
+    "Test poller cancelled mid-poll stops polling"
+    counters = {"connections": 0, "pings": 0}
+    server: TestClient = await aiohttp_client(
+        TestServer(create_stream_app(create_stalled_stream(counters), counters))
+    )
+    async with MetisAPIAsync(server.make_url(""), auth=MetisNoAuth()) as client:
+        stream = client.stream
+        stream.polling_fallback = True
+        stream.stall_timeout = 0.1
+        stream.poll_duration = 10
+        stream.poll_interval = 0.01
+        async with stream.subscribe():
+            await wait_until(lambda: stream.transport == "polling")
+            polls = counters["connections"]
+            await wait_until(lambda: counters["connections"] > polls)
+        # idle stream cancels the hanging poll
+        await wait_until(lambda: stream.transport == "sse")
+        connections = counters["connections"]
+        await asyncio.sleep(0.3)
+        assert counters["connections"] == connections, "Poller is stopped"
+        assert not stream.health["connected"]
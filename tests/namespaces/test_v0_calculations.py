@@ -24,6 +24,7 @@ from metis_client import MetisAPI, MetisAPIAsync, MetisTokenAuth
 from metis_client.dtos import MetisCalculationDTO, MetisErrorDTO, MetisRequestIdDTO
 from metis_client.dtos.datasource import DataSourceType
 from metis_client.exc import MetisPayloadException, MetisQuotaException
+from metis_client.helpers import metis_json_decoder
 from metis_client.models import MetisMessageEvent
 from tests.helpers import random_word
 from tests.namespaces.test_calculations import (
@@ -333,6 +334,21 @@ async def test_list_calculations(base_url: URL, fail: bool, expected, raises):
         assert cal == expected, "Response matches"
 
 
+@pytest.mark.parametrize(
+    "fail, expected, raises",
+    [
+        (False, [PATH_C_GET_RESPONSE_PAYLOAD], does_not_raise()),
+        (True, None, pytest.raises(MetisQuotaException)),
+    ],
+)
+async def test_list_iter_calculations(base_url: URL, fail: bool, expected, raises):
+    "Test list_iter()"
+    with raises:
+        async with MetisAPIAsync(base_url, auth=MetisTokenAuth(str(fail))) as client:
+            cal = [x async for x in client.v0.calculations.list_iter()]
+        assert cal == expected, "Response matches"
+
+
 @pytest.mark.parametrize(
     "calc_id, fail, expected, raises",
     [
@@ -386,3 +402,25 @@ async def test_get_engines(client: MetisAPI, client_async: MetisAPIAsync):
         )
     assert en_async == en_sync, "Response matches"
     assert en_sync == PATH_C_GET_ENGINES_RESPONSE, "Response matches"
+
+
+async def test_skip_unwanted_events(base_url: URL, monkeypatch):
+    "Test events nobody subscribed to are not decoded"
+    decoded: List[str] = []
+
+    def decoder(data: str):
+        decoded.append(data)
+        return metis_json_decoder(data)
+
+    monkeypatch.setattr("metis_client.models.event.metis_json_decoder", decoder)
+    ds_dto = {
+        **PATH_DS_POST_RESPONSE_PAYLOAD,
+        "created_at": dt.isoformat(),
+        "updated_at": dt.isoformat(),
+    }
+    big_event = make_datasources_event("big", [ds_dto] * 1000)
+    event_stream.append(big_event)
+    async with MetisAPIAsync(base_url, auth=MetisTokenAuth("False")) as client:
+        await client.v0.calculations.list()
+    assert decoded, "Calculations are decoded"
+    assert big_event.data not in decoded, "Datasources are not decoded"
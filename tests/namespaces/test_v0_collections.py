@@ -252,6 +252,21 @@ async def test_list_collections(base_url: URL, fail: bool, expected, raises):
         assert cols == expected, "Response matches"
 
 
+@pytest.mark.parametrize(
+    "fail, expected, raises",
+    [
+        (False, [PATH_C_GET_RESPONSE_PAYLOAD], does_not_raise()),
+        (True, None, pytest.raises(MetisQuotaException)),
+    ],
+)
+async def test_list_iter_collections(base_url: URL, fail: bool, expected, raises):
+    "Test list_iter()"
+    with raises:
+        async with MetisAPIAsync(base_url, auth=MetisTokenAuth(str(fail))) as client:
+            cols = [x async for x in client.v0.collections.list_iter()]
+        assert cols == expected, "Response matches"
+
+
 @pytest.mark.parametrize(
     "col_id, raises",
     [
@@ -22,7 +22,13 @@ from aiohttp.web_exceptions import (
 from freezegun import freeze_time
 from yarl import URL
 
-from metis_client import MetisAPI, MetisAPIAsync, MetisTokenAuth
+from metis_client import (
+    MetisAPI,
+    MetisAPIAsync,
+    MetisMemoryTransport,
+    MetisNoAuth,
+    MetisTokenAuth,
+)
 from metis_client.dtos import (
     MetisDataSourceContentOnlyDTO,
     MetisDataSourceDTO,
@@ -30,6 +36,8 @@ from metis_client.dtos import (
     MetisRequestIdDTO,
 )
 from metis_client.exc import (
+    MetisError,
+    MetisException,
     MetisNotFoundException,
     MetisPayloadException,
     MetisQuotaException,
@@ -266,6 +274,21 @@ async def test_list_datasources(base_url: URL, fail: bool, expected, raises):
         assert src == expected, "Response matches"
 
 
+@pytest.mark.parametrize(
+    "fail, expected, raises",
+    [
+        (False, [PATH_DS_GET_RESPONSE_PAYLOAD], does_not_raise()),
+        (True, None, pytest.raises(MetisQuotaException)),
+    ],
+)
+async def test_list_iter_datasources(base_url: URL, fail: bool, expected, raises):
+    "Test list_iter()"
+    with raises:
+        async with MetisAPIAsync(base_url, auth=MetisTokenAuth(str(fail))) as client:
+            src = [x async for x in client.v0.datasources.list_iter()]
+        assert src == expected, "Response matches"
+
+
 @freeze_time("1970-01-01", auto_tick_seconds=10)
 async def test_timeout(base_url: URL, client: MetisAPI):
     "Test timeout"
@@ -359,3 +382,124 @@ async def test_get_datasource_contents(
             None, client.v0.datasources.get_content, ds_id
         )
         assert res == PATH_DS_ID_GET_RESPONSE, "Response matches"
+
+
+@pytest.mark.parametrize(
+    "ds_id, raises",
+    [
+        (1, does_not_raise()),
+        (2, pytest.raises(MetisNotFoundException)),
+        (3, pytest.raises(MetisNotFoundException)),
+    ],
+)
+async def test_download_datasource_contents(
+    client: MetisAPI, client_async: MetisAPIAsync, tmp_path, ds_id, raises
+):
+    "Test get_content_stream() and download_content()"
+    with raises:
+        chunks = [
+            chunk
+            async for chunk in client_async.v0.datasources.get_content_stream(
+                ds_id, chunk_size=4
+            )
+        ]
+        assert len(chunks) > 1, "Content is chunked"
+        assert "".join(chunks) == PATH_DS_ID_GET_RESPONSE["content"]
+    with raises:
+        path = tmp_path / "async.txt"
+        size = await client_async.v0.datasources.download_content(ds_id, path)
+        assert size == path.stat().st_size, "Size matches"
+        assert path.read_text() == PATH_DS_ID_GET_RESPONSE["content"]
+    with raises:
+        path = tmp_path / "sync.txt"
+        await asyncio.get_event_loop().run_in_executor(
+            None, client.v0.datasources.download_content, ds_id, path
+        )
+        assert path.read_text() == PATH_DS_ID_GET_RESPONSE["content"]
+
+
+@pytest.mark.parametrize(
+    "content, compress, expected, raises",
+    [
+        ("ok", False, PATH_DS_POST_RESPONSE_PAYLOAD, does_not_raise()),
+        ("ok", True, PATH_DS_POST_RESPONSE_PAYLOAD, does_not_raise()),
+        ("fail", True, None, pytest.raises(MetisPayloadException)),
+    ],
+)
+async def test_create_datasource_from_file(
+    client: MetisAPI,
+    client_async: MetisAPIAsync,
+    tmp_path,
+    content: str,
+    compress: bool,
+    expected,
+    raises,
+):
+    "Test create_from_file()"
+    path = tmp_path / "content.txt"
+    path.write_text(content, encoding="utf-8")
+    with raises:
+        src = await client_async.v0.datasources.create_from_file(
+            path, compress=compress
+        )
+        assert src == expected, "Response matches"
+    with raises:
+        src = await asyncio.get_event_loop().run_in_executor(
+            None,
+            partial(client.v0.datasources.create_from_file, path, compress=compress),
+        )
+        assert src == expected, "Response matches"
+
+
+@pytest.mark.parametrize("compress", [False, True])
+async def test_create_datasource_from_stream(
+    client_async: MetisAPIAsync, compress: bool
+):
+    "Test create_from_stream()"
+
+    async def chunks():
+        yield b"o"
+        yield "k"
+
+    src = await client_async.v0.datasources.create_from_stream(
+        chunks(), compress=compress
+    )
+    assert src == PATH_DS_POST_RESPONSE_PAYLOAD, "Response matches"
+
+
+async def test_create_datasource_from_stream_once():
+    "Test content stream cannot be sent twice"
+    transport = MetisMemoryTransport()
+    bodies: List[bytes] = []
+
+    async def unauthorized_handler(request):
+        bodies.append(await request.read())
+        raise web.HTTPUnauthorized()
+
+    async def chunks():
+        yield "ok"
+
+    transport.add_route("POST", PATH_DS, unauthorized_handler)
+    async with MetisAPIAsync(
+        URL("http://localhost"), auth=MetisNoAuth(), transport=transport
+    ) as client:
+        # the request is sent again after reauthentication
+        with pytest.raises(MetisException) as exc_info:
+            await client.v0.datasources.create_event_from_stream(chunks())
+    cause = exc_info.value.__cause__
+    assert isinstance(cause, MetisError) and not isinstance(
+        cause, MetisPayloadException
+    ), "Not a payload error"
+    assert not cause.status, "No HTTP status is faked"
+    assert len(bodies) == 1 and json.loads(bodies[0])["content"] == "ok"
+
+
+async def test_fire_then_collect(base_url: URL):
+    "Test results of requests are collected after firing them"
+    async with MetisAPIAsync(base_url, auth=MetisTokenAuth("False")) as client:
+        fire = client.stream.fire
+        reqs = [await fire(client.v0.datasources.list_event) for _ in range(3)]
+        results = await asyncio.gather(
+            *(client.stream.result(x["req_id"], timeout=5) for x in reqs)
+        )
+    assert [x["data"]["req_id"] for x in results] == [x["req_id"] for x in reqs]
@@ -1,12 +1,16 @@
 "Test MetisClient"
+
+import asyncio
 import json
+import logging
 from asyncio import Task
 from contextlib import suppress
 from itertools import count
+from time import time
 from typing import Dict, Optional, Type, Union
 
 import pytest
-from aiohttp import web
+from aiohttp import CookieJar, web
 from aiohttp.test_utils import TestClient, TestServer
 from aiohttp.web_exceptions import (
     HTTPBadRequest,
@@ -20,11 +24,10 @@ from aiohttp.web_exceptions import (
     HTTPTooManyRequests,
     HTTPUnauthorized,
 )
-from aiohttp_sse_client.client import MessageEvent, asyncio, logging
 from freezegun import freeze_time
 from yarl import URL
 
-from metis_client import MetisNoAuth, MetisTokenAuth
+from metis_client import MetisLocalUserAuth, MetisNoAuth, MetisTokenAuth
 from metis_client.client import MetisClient
 from metis_client.exc import (
     MetisAuthenticationException,
@@ -36,6 +39,7 @@ from metis_client.exc import (
     MetisQuotaException,
 )
 from metis_client.helpers import metis_json_decoder
+from metis_client.models import MetisMessageEvent
 from tests.helpers import random_word
 
 TOKEN = random_word(10)
@@ -48,6 +52,8 @@ PATH_PAYLOAD_ERROR = "/payload_error"
 PATH_ECHO_STATUS = "/echo_status"
 PATH_JSON_CASE_CHECK_STATUS = "/json_case_check"
 PATH_SSE_SIMPLE = "/sse"
+PATH_SSE_FAULTY = "/sse_faulty"
+SSE_FAULTY_COUNTERS: Dict[str, int] = {}
 
 
 async def check_token_auth_handler(request: web.Request) -> web.Response:
@@ -109,12 +115,25 @@ async def sse_simple_handler(request: web.Request) -> web.Response:
     event_type = request.query.get("event_type", "message")
     event_data = request.query.get("event_data", random_word(10))
     body = f"event: {event_type}\ndata: {event_data}\n\n"
+    if "event_id" in request.query:
+        last_event_id = request.headers.get("Last-Event-ID", "")
+        body = f"id: {request.query['event_id']}\ndata: {last_event_id}\n\n"
     resp = web.Response(status=status_code, body=body)
-    resp.content_type = "text/event-stream"
+    resp.content_type = request.query.get("content_type", "text/event-stream")
     resp.headers["Cache-Control"] = "no-store"
     return resp
 
 
+async def sse_faulty_handler(request: web.Request) -> web.Response:
+    "Request handler dropping the first `fail` connections of a `key`"
+    key = request.query["key"]
+    SSE_FAULTY_COUNTERS[key] = SSE_FAULTY_COUNTERS.get(key, 0) + 1
+    if SSE_FAULTY_COUNTERS[key] <= int(request.query["fail"]):
+        assert request.transport
+        request.transport.close()
+    return web.Response(body="data: ok\n\n", content_type="text/event-stream")
+
+
 async def create_app() -> web.Application:
     "Create web application"
     app = web.Application()
@@ -125,6 +144,7 @@ async def create_app() -> web.Application:
     app.router.add_get(PATH_ECHO_STATUS, echo_status_handler)
     app.router.add_post(PATH_JSON_CASE_CHECK_STATUS, json_case_check_status_handler)
     app.router.add_get(PATH_SSE_SIMPLE, sse_simple_handler)
+    app.router.add_get(PATH_SSE_FAULTY, sse_faulty_handler)
     return app
 
 
@@ -162,6 +182,91 @@ async def test_token_auth_forced(
     assert resp.ok, "Client should authenticate"
 
 
+class CountingTokenAuth(MetisTokenAuth):
+    "Token authenticator counting authentications"
+
+    calls = 0
+    fail = False
+
+    async def authenticate(self, session, *args) -> bool:
+        self.calls += 1
+        if self.fail:
+            raise MetisException("oops")
+        return await super().authenticate(session, *args)
+
+
+async def test_auth_fast_path(cli: TestClient):
+    "Test valid credentials are not updated on every request"
+    auth = CountingTokenAuth(TOKEN)
+    client = MetisClient(session=cli.session, base_url=cli.make_url(""), auth=auth)
+    for _ in range(5):
+        resp = await client.request(URL(PATH_CHECK_TOKEN_AUTH), auth_required=True)
+        assert resp.ok, "Client should authenticate"
+    assert auth.calls == 1, "Authentication should happen once"
+
+
+@pytest.mark.parametrize("fail", [False, True])
+async def test_auth_background_refresh(
+    cli: TestClient, caplog: pytest.LogCaptureFixture, fail: bool
+):
+    "Test credentials are refreshed in background before expiry"
+    auth = CountingTokenAuth(TOKEN)
+    client = MetisClient(session=cli.session, base_url=cli.make_url(""), auth=auth)
+    await auth.authenticate(cli.session)
+    auth.set_valid(cli.session, time() + auth.refresh_margin / 2)
+    auth.fail = fail
+
+    with caplog.at_level(logging.WARNING):
+        resp = await client.request(URL(PATH_CHECK_TOKEN_AUTH), auth_required=True)
+        assert resp.ok, "Request should not wait for refresh"
+        # pylint: disable=protected-access
+        assert client._auth_refresh_task, "Refresh task should be scheduled"
+        await client._auth_refresh_task
+
+    assert auth.calls == 2, "Credentials should be refreshed"
+    assert ("refresh failed" in caplog.text) is fail, "Failures should be logged"
+
+
+async def test_single_flight_reauth(aiohttp_client):
+    "Test one re-authentication per expired session under concurrent requests"
+    state = {"sid": 0, "logins": 0}
+
+    async def login_handler(_: web.Request) -> web.Response:
+        state["logins"] += 1
+        state["sid"] += 1
+        resp = web.Response(status=HTTPOk.status_code)
+        resp.set_cookie("_sid", str(state["sid"]))
+        return resp
+
+    async def protected_handler(request: web.Request) -> web.Response:
+        await asyncio.sleep(0.001)
+        if request.cookies.get("_sid") != str(state["sid"]):
+            return web.Response(status=HTTPUnauthorized.status_code)
+        return web.Response(status=HTTPOk.status_code)
+
+    app = web.Application()
+    app.router.add_post("/v0/auth", login_handler)
+    app.router.add_get("/protected", protected_handler)
+    jar = CookieJar(unsafe=True, treat_as_secure_origin="http://127.0.0.1")
+    cli = await aiohttp_client(TestServer(app), cookie_jar=jar)
+    client = MetisClient(
+        session=cli.session,
+        base_url=cli.make_url(""),
+        auth=MetisLocalUserAuth(random_word(10), random_word(10)),
+    )
+
+    resp = await client.request(URL("/protected"), auth_required=True)
+    assert resp.ok and state["logins"] == 1, "Client should authenticate"
+
+    # expire the session on the server side
+    state["sid"] += 1
+    resps = await asyncio.gather(
+        *(client.request(URL("/protected"), auth_required=True) for _ in range(500))
+    )
+    assert all(resp.ok for resp in resps), "All requests should be retried"
+    assert state["logins"] == 2, "Expired session should be renewed once"
+
+
 async def test_relative_target_url(
     client: MetisClient,
 ):  # pylint: disable=redefined-outer-name
@@ -277,9 +382,9 @@ async def test_sse_msg_receive(
     event_type = random_word(8)
     event_data = random_word(16)
 
-    def on_message(evt: MessageEvent):
+    def on_message(evt: MetisMessageEvent):
         assert (
-            evt.type == event_type and evt.data == event_data
+            evt.type == event_type and evt.data == event_data.encode()
         ), "Should receive same SSE event as requested"
         if task:
             task.cancel()
@@ -291,6 +396,35 @@ async def test_sse_msg_receive(
     await asyncio.wait_for(task, 1)
 
 
+async def test_sse_reconnect(
+    client: MetisClient,
+):  # pylint: disable=redefined-outer-name
+    "Test reconnect with last event id on end of stream"
+    task: Optional[Task] = None
+    received = []
+
+    def on_message(evt: MetisMessageEvent):
+        received.append(evt.data)
+        if len(received) == 2 and task:
+            task.cancel()
+
+    query = {"event_id": "42"}
+    task = asyncio.create_task(
+        client.sse(URL(PATH_SSE_SIMPLE).with_query(query), on_message)
+    )
+    await asyncio.wait_for(task, 1)
+    assert received == [b"", b"42"], "Last event id should be sent on reconnect"
+
+
+async def test_sse_content_type(
+    client: MetisClient,
+):  # pylint: disable=redefined-outer-name
+    "Test wrong content type of the stream"
+    query = {"content_type": "text/plain"}
+    with pytest.raises(MetisConnectionException):
+        await client.sse(URL(PATH_SSE_SIMPLE).with_query(query), print)
+
+
 async def test_sse_timeout(
     client: MetisClient,
     caplog: pytest.LogCaptureFixture,
@@ -298,7 +432,7 @@ async def test_sse_timeout(
     "Test reconnect on timeout"
     task: Optional[Task] = None
 
-    def on_message(_: MessageEvent):
+    def on_message(_: MetisMessageEvent):
         pass
 
     def timeouted_in_log() -> bool:
@@ -325,16 +459,47 @@ async def test_sse_connection_error(
 ):  # pylint: disable=redefined-outer-name
     "Test sse connection error"
 
-    def on_message(_: MessageEvent):
+    def on_message(_: MetisMessageEvent):
         pass
 
     with pytest.raises(MetisConnectionException) as exc_info:
-        await asyncio.create_task(client.sse(URL("http://0.0.0.0:1"), on_message))
+        await asyncio.create_task(
+            client.sse(URL("http://0.0.0.0:1"), on_message, max_retries=0)
+        )
     assert (
         "Connection error" in exc_info.value.args[0]
     ), "Client should throw exception on connection errors"
 
 
+@pytest.mark.parametrize("fail, max_retries, ok", [(2, 2, True), (2, 1, False)])
+async def test_sse_connection_retries(
+    client: MetisClient, fail: int, max_retries: int, ok: bool
+):  # pylint: disable=redefined-outer-name
+    "Test sse retries dropped connections within the budget"
+    task: Optional[Task] = None
+    received = []
+
+    def on_message(evt: MetisMessageEvent):
+        received.append(evt.data)
+        if task:
+            task.cancel()
+
+    query = {"key": random_word(10), "fail": fail}
+    task = asyncio.create_task(
+        client.sse(
+            URL(PATH_SSE_FAULTY).with_query(query), on_message, max_retries=max_retries
+        )
+    )
+    if ok:
+        await asyncio.wait_for(task, 5)
+        assert received == [b"ok"], "Stream should be reconnected"
+    else:
+        with pytest.raises(MetisConnectionException) as exc_info:
+            await asyncio.wait_for(task, 5)
+        assert "gave up after 1 retries" in exc_info.value.args[0]
+    assert SSE_FAULTY_COUNTERS[query["key"]] == max_retries + 1
+
+
 async def test_sse_response_errors(
     client: MetisClient,
 ):  # pylint: disable=redefined-outer-name
@@ -342,7 +507,7 @@ async def test_sse_response_errors(
 
     task: Optional[Task] = None
 
-    def on_message(_: MessageEvent):
+    def on_message(_: MetisMessageEvent):
         pass
 
     query = {"force_status": HTTPTooManyRequests.status_code}
@@ -1,14 +1,21 @@
 "Test helper encoders and decoders"
+
+import gzip
 import json
 from datetime import datetime
 
 import pytest
 
+from metis_client.exc import MetisNotFoundException, MetisPayloadException
 from metis_client.helpers import (
     convert_dict_values_from_dt,
     convert_dict_values_to_dt,
+    gzip_stream_encoder,
     metis_json_decoder,
     metis_json_encoder,
+    metis_json_iter_items,
+    metis_json_stream_decoder,
+    metis_json_stream_encoder,
     parse_rfc3339,
 )
 
@@ -83,3 +90,114 @@ def test_json_decoder(x: str, expected):
     "Test metis_json_decoder()"
     y = metis_json_decoder(x)
     assert y == expected, "Converted should match expected value"
+
+
+async def iter_chunks(*chunks):
+    "Async iterator over chunks"
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize(
+    "chunks, fields",
+    [
+        ([], {}),
+        (["plain ", "text"], {}),
+        (['quotes "', b"\n\\ and \xd0", b"\xba\xd0\xbe"], {"fmt": None}),
+        (["x" * 1000] * 10, {"name": "name", "type_id": 1}),
+    ],
+)
+async def test_json_stream_encoder(chunks, fields: dict):
+    "Test metis_json_stream_encoder()"
+    content = b"".join(
+        x if isinstance(x, bytes) else x.encode() for x in chunks
+    ).decode()
+    encoded = [
+        x
+        async for x in metis_json_stream_encoder(
+            "content", iter_chunks(*chunks), fields
+        )
+    ]
+    assert json.loads(b"".join(encoded)) == json.loads(
+        metis_json_encoder({"content": content, **fields})
+    ), "Streamed JSON should match"
+
+    compressed = [x async for x in gzip_stream_encoder(iter_chunks(*encoded))]
+    assert gzip.decompress(b"".join(compressed)) == b"".join(encoded)
+
+
+async def test_json_stream_encoder_truncated():
+    "Test metis_json_stream_encoder() with truncated UTF-8 sequence"
+    with pytest.raises(UnicodeDecodeError):
+        async for _ in metis_json_stream_encoder("content", iter_chunks(b"\xd0"), {}):
+            pass
+
+
+STREAM_CONTENT = 'quotes " back\\slash \\ud83d\nnew line \u044f \u2603 \U0001f600 end'
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 7, 4096])
+async def test_json_stream_decoder(ensure_ascii: bool, chunk_size: int):
+    "Test metis_json_stream_decoder() with escapes split by chunks"
+    body = json.dumps(
+        {"content": STREAM_CONTENT, "name": "x"}, ensure_ascii=ensure_ascii
+    ).encode()
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    decoded = [
+        x async for x in metis_json_stream_decoder("content", iter_chunks(*chunks))
+    ]
+    assert "".join(decoded) == STREAM_CONTENT, "Content should match"
+    if chunk_size < 10:
+        assert len(decoded) > 1, "Content should be streamed"
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        (b'{"name": "x", "content": "late"}', "late"),
+        (b'{"content": ""}', ""),
+        (b'{"error": "oops", "status": 404}', MetisNotFoundException),
+        (b'{"content": null}', MetisPayloadException),
+        (b"[]", MetisPayloadException),
+        (b'{"content": "unterminated', json.JSONDecodeError),
+        (b'{"content": "invalid \\x' + b" " * 20, json.JSONDecodeError),
+    ],
+)
+async def test_json_stream_decoder_payloads(body: bytes, expected):
+    "Test metis_json_stream_decoder() with other payloads"
+    chunks = [body[i : i + 3] for i in range(0, len(body), 3)]
+    if isinstance(expected, str):
+        decoded = metis_json_stream_decoder("content", iter_chunks(*chunks))
+        assert "".join([x async for x in decoded]) == expected
+        return
+    with pytest.raises(expected):
+        async for _ in metis_json_stream_decoder("content", iter_chunks(*chunks)):
+            pass
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        {},
+        {"data": []},
+        {"data": 1, "other": [{"dateTime": dt_now.isoformat()}]},
+        {"reqId": "1", "data": [{"testId": 1, "dateTime": dt_now.isoformat()}, 2]},
+    ],
+)
+def test_json_iter_items(doc: dict):
+    "Test metis_json_iter_items()"
+    items = list(metis_json_iter_items(json.dumps(doc, indent=1).encode()))
+    decoded = dict(x for x in items if x[0] is not None)
+    if isinstance(doc.get("data"), list):
+        decoded["data"] = [x[1] for x in items if x[0] is None]
+    assert decoded == metis_json_decoder(json.dumps(doc)), "Decoded should match"
+
+
+@pytest.mark.parametrize(
+    "doc", ["[]", '{"a" 1}', '{"data": [1 2]}', '{"a": 1', "{1: 2}", ""]
+)
+def test_json_iter_items_invalid(doc: str):
+    "Test metis_json_iter_items() with invalid JSON"
+    with pytest.raises(json.JSONDecodeError):
+        list(metis_json_iter_items(doc))
@@ -0,0 +1,42 @@
+"Test package imports"
+
+import subprocess
+import sys
+
+import pytest
+
+import metis_client
+from metis_client import models
+
+
+def loaded_modules(code: str) -> set:
+    "Modules loaded by code in a fresh interpreter"
+    proc = subprocess.run(
+        [sys.executable, "-c", f"{code}; import sys; print(*sys.modules)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return set(proc.stdout.split())
+
+
+def test_deferred_imports():
+    "Test heavy and server-side modules are imported on first use"
+    loaded = loaded_modules("import metis_client")
+    assert not {x for x in loaded if x.startswith(("aiohttp", "camel_converter"))}
+
+    loaded = loaded_modules("from metis_client import MetisAPI, MetisAPIAsync")
+    assert "aiohttp.client" in loaded
+    assert not {x for x in loaded if x.startswith("aiohttp.web")}
+    assert "metis_client.models.memory" not in loaded
+
+
+def test_lazy_attributes():
+    "Test public names resolve on access"
+    assert metis_client.MetisMemoryTransport is models.MetisMemoryTransport
+    assert dir(metis_client) == sorted(metis_client.__all__), "Names are listed"
+    for name in metis_client.__all__:
+        assert getattr(metis_client, name)
+    for module in (metis_client, models):
+        with pytest.raises(AttributeError):
+            module.MetisMissing  # pylint: disable=pointless-statement
@@ -1,11 +1,31 @@
 "Test MetisAPIAsync"
 
+import asyncio
+
 import pytest
 
-from metis_client import MetisAPIAsync, MetisNoAuth
+from metis_client import MetisAPIAsync, MetisMemoryTransport, MetisNoAuth
 
 
 async def test_relative_url():
     "Test relative url"
     with pytest.raises(TypeError):
         MetisAPIAsync("/relative", auth=MetisNoAuth())
+
+
+async def test_lazy_construction():
+    "Test namespaces and the stream are created on first use"
+    tasks = len(asyncio.all_tasks())
+    async with MetisAPIAsync(
+        "http://localhost", auth=MetisNoAuth(), transport=MetisMemoryTransport()
+    ) as client:
+        assert len(asyncio.all_tasks()) == tasks, "No background tasks"
+        datasources, calculations = client.v0.datasources, client.calculations
+        assert client.v0.datasources is datasources, "Namespace is cached"
+        assert client.calculations is calculations, "Namespace is cached"
+        assert client.stream.buffered == 0
+        assert len(asyncio.all_tasks()) == tasks, "Stream is not started"
+        client.stream.subscribe()
+        assert len(asyncio.all_tasks()) == tasks + 1, "Stream consumer is started"
+    await asyncio.sleep(0)
+    assert len(asyncio.all_tasks()) == tasks